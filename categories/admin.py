@@ -2,6 +2,9 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.formats import date_format
 from django import forms
+from events.counts import related_count
+from events.pagination import AnnotatedListPaginator
+from events.models import Event
 from .models import Category
 
 
@@ -23,10 +26,16 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display_links = ("card",)
     search_fields = ("name",)
     list_per_page = 30
+    paginator = AnnotatedListPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Число мероприятий считается в том же запросе, что и список
+        return super().get_queryset(request).annotate(events_count=related_count(Event.objects.all(), "category"))
 
     def card(self, obj: Category):
         desc = (getattr(obj, "description", "") or "—").replace("\n", "<br/>")
-        events_count = obj.event_set.count() if hasattr(obj, "event_set") else 0
+        events_count = getattr(obj, "events_count", 0)
 
         return format_html(
             '''
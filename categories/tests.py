@@ -1,3 +1,35 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
\ No newline at end of file
+from events.models import Event
+from mplan.testing import QueryBudgetMixin, seed_events, seed_reference
+
+from .admin import CategoryAdmin
+
+
+class CategoryAdminTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_reference()
+        seed_events()
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_changelist(self):
+        # Сессия, пользователь, COUNT и страница с числом мероприятий
+        with self.assertQueryBudget(4):
+            response = self.client.get(reverse('admin:categories_category_changelist'))
+        cards = response.context['cl'].result_list
+        self.assertEqual(len(cards), 30)
+        for category in cards[:5]:
+            self.assertEqual(category.events_count, Event.objects.filter(category=category).count())
+
+    def test_search(self):
+        with self.assertQueryBudget(4):
+            response = self.client.get(reverse('admin:categories_category_changelist'), {'q': 'Категория 1'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.assertChangelistQueriesConstant(CategoryAdmin, reverse('admin:categories_category_changelist'))
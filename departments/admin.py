@@ -2,6 +2,10 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.formats import date_format
 from django import forms
+from events.counts import related_count
+from events.pagination import AnnotatedListPaginator
+from events.models import Event
+from users.models import User
 from .models import Department
 
 class DepartmentForm(forms.ModelForm):
@@ -18,13 +22,22 @@ class DepartmentForm(forms.ModelForm):
 class DepartmentAdmin(admin.ModelAdmin):
     list_display = ("card",)
     list_display_links = ("card",)
-    search_fields = ("name", "description")
+    search_fields = ("name",)
     list_per_page = 30
+    paginator = AnnotatedListPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Оба счётчика — подзапросами в запросе списка
+        return super().get_queryset(request).annotate(
+            events_count=related_count(Event.objects.all(), "department"),
+            users_count=related_count(User.objects.all(), "department"),
+        )
 
     def card(self, obj: Department):
         desc = (getattr(obj, "description", "") or "—").replace("\n", "<br/>")
-        events_count = obj.event_set.count() if hasattr(obj, "event_set") else 0
-        users_count = obj.user_set.count() if hasattr(obj, "user_set") else 0
+        events_count = getattr(obj, "events_count", 0)
+        users_count = getattr(obj, "users_count", 0)
 
         return format_html(
             '''
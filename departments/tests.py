@@ -1,3 +1,37 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from events.models import Event
+from mplan.testing import QueryBudgetMixin, seed_events, seed_reference
+from users.models import User
+
+from .admin import DepartmentAdmin
+
+
+class DepartmentAdminTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_reference()
+        seed_events()
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_changelist(self):
+        # Сессия, пользователь, COUNT и страница с числом мероприятий и пользователей
+        with self.assertQueryBudget(4):
+            response = self.client.get(reverse('admin:departments_department_changelist'))
+        cards = response.context['cl'].result_list
+        self.assertEqual(len(cards), 30)
+        for department in cards[:5]:
+            self.assertEqual(department.events_count, Event.objects.filter(department=department).count())
+            self.assertEqual(department.users_count, User.objects.filter(department=department).count())
+
+    def test_search(self):
+        with self.assertQueryBudget(4):
+            response = self.client.get(reverse('admin:departments_department_changelist'), {'q': 'Институт 1'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.assertChangelistQueriesConstant(DepartmentAdmin, reverse('admin:departments_department_changelist'))
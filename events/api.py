@@ -0,0 +1,153 @@
+"""JSON API мероприятий только для чтения.
+
+Список принимает те же параметры фильтра, что и events_ui, и отдаёт
+страницы по курсору (KeysetPaginator). Параметр ``fields`` выбирает поля
+ответа; из базы читаются только нужные столбцы через ``.values()``,
+названия справочников берутся из ReferenceData, а даты EventDate
+подгружаются одним запросом на страницу и только если их запросили.
+
+ETag и Last-Modified строятся из версий кэша (версия данных, версия
+справочников и хэш параметров для списка, версия мероприятия для
+карточки), поэтому повторный запрос без изменений получает 304 без
+обращения к базе; для карточки проверяется только, что мероприятие есть.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .cache import get_data_version, get_event_version, params_digest
+from .models import EventDate
+from .reference import get_reference_data, get_reference_version
+
+
+# Поле ответа -> столбец для .values(); None — поле собирается отдельно
+API_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'date': 'date',
+    'end_date': 'end_date',
+    'place': 'place',
+    'responsible': 'responsible',
+    'comment': 'comment',
+    'category_id': 'category_id',
+    'category': 'category_id',
+    'department_id': 'department_id',
+    'department': 'department_id',
+    'user_id': 'user_id',
+    'user': 'user_id',
+    'dates': None,
+}
+
+DEFAULT_API_FIELDS = ['id', 'name', 'date', 'end_date', 'place', 'category', 'department', 'responsible']
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+
+def parse_fields(value):
+    """Список полей из параметра ``fields``; ValueError — неизвестное поле"""
+    if not value:
+        return list(DEFAULT_API_FIELDS)
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in API_FIELDS]
+    if unknown:
+        raise ValueError('Неизвестные поля: ' + ', '.join(unknown))
+    return fields
+
+
+def parse_page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return API_PAGE_SIZE
+    return min(max(size, 1), API_MAX_PAGE_SIZE)
+
+
+def value_columns(fields, ordering=()):
+    """Столбцы для .values(): поля ответа, ключ сортировки и id"""
+    columns = ['id']
+    columns += [API_FIELDS[name] for name in fields if API_FIELDS[name]]
+    columns += [name.lstrip('-') for name in ordering]
+    return list(dict.fromkeys(columns))
+
+
+def _dates_by_event(event_ids):
+    dates = {}
+    rows = EventDate.objects.filter(event_id__in=event_ids).order_by('start').values_list('event_id', 'start', 'end')
+    for event_id, start, end in rows:
+        dates.setdefault(event_id, []).append({'start': start, 'end': end})
+    return dates
+
+
+def serialize_rows(rows, fields):
+    """Строки .values() -> словари ответа с запрошенными полями"""
+    reference = get_reference_data()
+    names = {
+        'category': lambda row: reference.category_name(row['category_id'], None),
+        'department': lambda row: reference.department_name(row['department_id'], None),
+        'user': lambda row: reference.user_name(row['user_id'], None),
+    }
+    dates = _dates_by_event([row['id'] for row in rows]) if 'dates' in fields else {}
+
+    items = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            if name == 'dates':
+                item[name] = dates.get(row['id'], [])
+            elif name in names:
+                item[name] = names[name](row)
+            else:
+                item[name] = row[API_FIELDS[name]]
+        items.append(item)
+    return items
+
+
+def _version_time(*versions):
+    """Время последнего изменения по версиям кэша (time.time_ns())"""
+    return datetime.fromtimestamp(max(versions) / 1e9, tz=dt_timezone.utc)
+
+
+def list_validators(params):
+    """ETag и время изменения для списка мероприятий.
+
+    ``params`` — нормализованные параметры запроса (фильтр, поля, размер
+    страницы, курсор): другая страница или выборка получает другой ETag.
+    """
+    data_version, reference_version = get_data_version(), get_reference_version()
+    etag = f'{data_version}-{reference_version}-{params_digest(params)}'
+    return etag, _version_time(data_version, reference_version)
+
+
+def detail_validators(event_id):
+    """ETag и время изменения для одного мероприятия"""
+    event_version, reference_version = get_event_version(event_id), get_reference_version()
+    return f'{event_id}-{event_version}-{reference_version}', _version_time(event_version, reference_version)
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag in if_none_match or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(last_modified.timestamp()) <= if_modified_since
+
+
+def conditional_response(request, validators, build):
+    """Отвечает 304, если у клиента актуальная версия, иначе вызывает ``build``.
+
+    ``validators`` — пара (значение ETag, время изменения).
+    """
+    value, last_modified = validators
+    etag = quote_etag(value)
+    if _not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,474 @@
+"""Синтетические мероприятия и замеры горячих путей на N-кратном объёме.
+
+Распределения взяты из дампа mplan-20251017-1318.sql (6466 мероприятий):
+доли категорий, подразделений и пользователей, месяцы, годы и часы
+начала, децили длины текстовых полей, доля мероприятий с окончанием и
+без даты. В дампе у каждого мероприятия одна дата (старые поля
+date/end_date), поэтому и здесь у мероприятия с датой одна строка
+EventDate. Данные генерируются детерминированно от ``seed``: при одном
+масштабе и seed набор одинаков между коммитами.
+
+Замер проходит через тестовый клиент Django, как обычный запрос:
+время ответа (p50/p95), число SQL-запросов и пик памяти Python
+(tracemalloc, отдельным проходом, чтобы не искажать время).
+
+Для сравнения здесь же хранятся прежние реализации, заменённые при
+оптимизации: поиск цепочкой icontains, план и таблица в обычной книге
+openpyxl в памяти. Они замеряются на тех же данных, что и текущие.
+"""
+import math
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Border, Side, Font, PatternFill
+
+from categories.models import Category
+from departments.models import Department
+from users.models import User
+
+from .exports import EVENTS_TABLE_HEADERS, write_events_table, write_plan
+from .models import Event, EventDate
+from .occurrences import rebuild_all_event_days
+from .search import rebuild_index, search_events
+from .stats import rebuild_event_stats
+
+
+DUMP_EVENTS = 6466
+
+# Число мероприятий по id категории, подразделения и пользователя (по убыванию)
+CATEGORY_WEIGHTS = (2489, 741, 1721, 261, 913, 329, 12)
+DEPARTMENT_WEIGHTS = (
+    826, 632, 389, 371, 343, 313, 303, 298, 259, 251, 241, 205, 179, 179, 172, 155, 138, 130, 119, 106,
+    102, 69, 65, 62, 61, 56, 55, 47, 46, 45, 39, 38, 27, 20, 19, 15, 14, 14, 12, 11, 10, 10, 5, 4, 4, 3, 2, 2,
+)
+USER_WEIGHTS = (
+    1130, 791, 514, 346, 335, 330, 320, 280, 270, 269, 268, 235, 210, 210, 196, 131, 119, 102,
+    69, 62, 58, 44, 34, 34, 28, 18, 16, 14, 13, 12, 2, 2, 2, 1, 1,
+)
+
+# Годы 2019–2025, месяцы и часы начала; 0 часов — мероприятия без времени
+LAST_YEAR = 2025
+YEAR_WEIGHTS = (689, 814, 954, 1152, 1061, 927, 822)
+MONTH_WEIGHTS = (233, 675, 817, 764, 540, 320, 103, 97, 534, 809, 831, 730)
+HOUR_WEIGHTS = {0: 838, 8: 731, 9: 534, 10: 774, 11: 611, 12: 205, 13: 203, 14: 244, 15: 882, 16: 291,
+                17: 273, 18: 598, 19: 207, 20: 43}
+
+NO_DATE_SHARE = 13 / DUMP_EVENTS
+END_DATE_SHARE = 61 / DUMP_EVENTS
+COMMENT_SHARE = 25 / DUMP_EVENTS
+EMPTY_COMMENT_SHARE = 203 / DUMP_EVENTS
+
+# Децили (минимум, 10 %, …, 90 %, максимум): длина полей в символах и
+# длительность в часах
+NAME_LENGTH_DECILES = (7, 25, 33, 43, 54, 66, 79, 91, 108, 138, 555)
+PLACE_LENGTH_DECILES = (1, 12, 20, 31, 35, 40, 44, 46, 48, 54, 214)
+RESPONSIBLE_LENGTH_DECILES = (5, 11, 12, 13, 16, 23, 26, 27, 29, 40, 228)
+COMMENT_LENGTH_DECILES = (15, 17, 22, 33, 45, 56, 63, 93, 106, 110, 168)
+DURATION_HOURS_DECILES = (1.0, 1.0, 1.4, 1.5, 1.5, 1.5, 1.7, 2.0, 5.6, 7.9, 10.0)
+
+NAME_WORDS = (
+    'конференция', 'семинар', 'олимпиада', 'выставка', 'лекция', 'мастер-класс', 'совещание', 'заседание',
+    'конкурс', 'фестиваль', 'форум', 'круглый', 'стол', 'студентов', 'школьников', 'преподавателей',
+    'университета', 'научная', 'международная', 'всероссийская', 'региональная', 'день', 'открытых',
+    'дверей', 'встреча', 'выпускников', 'совета', 'ученого', 'кафедры', 'института', 'спортивный',
+    'турнир', 'экскурсия', 'презентация', 'проекта', 'по', 'для', 'и', 'в', 'рамках', 'программы',
+)
+PLACE_WORDS = (
+    'Учебный', 'корпус', '№', '1', '2', '3', '5', 'ул.', 'Ленина,', '15,', 'Орлова', '6,', 'Галкинская,',
+    '3,', 'аудитория', 'каб.', '240', '326', 'зал', 'Ученого', 'совета', 'актовый', 'онлайн',
+)
+RESPONSIBLE_WORDS = (
+    'Иванов', 'Петров', 'Сидорова', 'Смирнова', 'Кузнецов', 'И.И.', 'П.П.', 'А.В.', 'Е.С.', 'директор',
+    'института,', 'начальник', 'управления,', 'доцент', 'кафедры',
+)
+COMMENT_WORDS = (
+    'В', 'рамках', 'плана', 'работы', 'ВоГУ', 'на', '2024-2025', 'учебный', 'год', 'проект', 'реализуется',
+    'при', 'поддержке', 'гранта', 'дата', 'по', 'согласованию', 'со', 'школами',
+)
+
+GENERATE_BATCH_SIZE = 2000
+
+
+def _decile_value(rng, deciles):
+    """Значение из кусочно-равномерного распределения по децилям"""
+    slot = rng.randrange(len(deciles) - 1)
+    return rng.uniform(deciles[slot], deciles[slot + 1])
+
+
+def _text(rng, words, deciles):
+    length = max(1, round(_decile_value(rng, deciles)))
+    parts = []
+    size = -1
+    while size < length:
+        word = rng.choice(words)
+        parts.append(word)
+        size += len(word) + 1
+    return ' '.join(parts)[:length].strip()
+
+
+def _start(rng):
+    year = LAST_YEAR - len(YEAR_WEIGHTS) + 1 + rng.choices(range(len(YEAR_WEIGHTS)), YEAR_WEIGHTS)[0]
+    month = rng.choices(range(1, 13), MONTH_WEIGHTS)[0]
+    day = rng.randint(1, 28)
+    hour = rng.choices(list(HOUR_WEIGHTS), list(HOUR_WEIGHTS.values()))[0]
+    minute = 0 if hour == 0 else rng.choice((0, 0, 0, 30))
+    return timezone.make_aware(datetime(year, month, day, hour, minute))
+
+
+def _event(rng, categories, departments, users):
+    start = None if rng.random() < NO_DATE_SHARE else _start(rng)
+    end = None
+    if start and rng.random() < END_DATE_SHARE:
+        end = start + timedelta(hours=_decile_value(rng, DURATION_HOURS_DECILES))
+
+    comment = None
+    draw = rng.random()
+    if draw < COMMENT_SHARE:
+        comment = _text(rng, COMMENT_WORDS, COMMENT_LENGTH_DECILES)
+    elif draw < COMMENT_SHARE + EMPTY_COMMENT_SHARE:
+        comment = ''
+
+    return Event(
+        name=_text(rng, NAME_WORDS, NAME_LENGTH_DECILES),
+        date=start,
+        end_date=end,
+        place=_text(rng, PLACE_WORDS, PLACE_LENGTH_DECILES),
+        category_id=rng.choices(categories, CATEGORY_WEIGHTS)[0],
+        department_id=rng.choices(departments, DEPARTMENT_WEIGHTS)[0],
+        user_id=rng.choices(users, USER_WEIGHTS)[0],
+        responsible=_text(rng, RESPONSIBLE_WORDS, RESPONSIBLE_LENGTH_DECILES),
+        comment=comment,
+    )
+
+
+def create_reference():
+    """Категории, подразделения и пользователи по числу строк дампа"""
+    Category.objects.bulk_create([
+        Category(id=number, name=f'Категория {number}') for number in range(1, len(CATEGORY_WEIGHTS) + 1)
+    ])
+    Department.objects.bulk_create([
+        Department(id=number, name=f'Подразделение {number}') for number in range(1, len(DEPARTMENT_WEIGHTS) + 1)
+    ])
+    User.objects.bulk_create([
+        User(id=number, name=f'user{number}', displayname=f'Сотрудник {number}', role='editor', password='-',
+             department_id=number % len(DEPARTMENT_WEIGHTS) + 1)
+        for number in range(1, len(USER_WEIGHTS) + 1)
+    ])
+    return (list(range(1, len(CATEGORY_WEIGHTS) + 1)), list(range(1, len(DEPARTMENT_WEIGHTS) + 1)),
+            list(range(1, len(USER_WEIGHTS) + 1)))
+
+
+def generate_events(scale=1.0, seed=0, progress=None):
+    """Создаёт ``DUMP_EVENTS * scale`` мероприятий в пустой базе.
+
+    Даты EventDate строятся по строкам, прочитанным после вставки пачки:
+    MySQL не возвращает id из bulk_create. Затем перестраиваются поисковый
+    индекс, дни и сводка — как после импорта.
+    """
+    rng = random.Random(seed)
+    categories, departments, users = create_reference()
+    total = round(DUMP_EVENTS * scale)
+
+    created = 0
+    last_id = 0
+    while created < total:
+        size = min(GENERATE_BATCH_SIZE, total - created)
+        Event.objects.bulk_create([_event(rng, categories, departments, users) for _ in range(size)])
+        rows = list(Event.objects.filter(id__gt=last_id).exclude(date=None)
+                    .order_by('id').values_list('id', 'date', 'end_date'))
+        EventDate.objects.bulk_create(
+            [EventDate(event_id=event_id, start=start, end=end) for event_id, start, end in rows],
+            batch_size=GENERATE_BATCH_SIZE,
+        )
+        last_id = Event.objects.order_by('-id').values_list('id', flat=True).first()
+        created += size
+        if progress:
+            progress(created, total)
+
+    rebuild_index()
+    rebuild_all_event_days()
+    rebuild_event_stats()
+    return total
+
+
+# Горячий путь: имя в отчёте, метод, имя URL и параметры запроса
+BenchmarkPath = namedtuple('BenchmarkPath', ['name', 'method', 'url', 'params'])
+
+
+def hot_paths():
+    """Основные пути: список, поиск, выборка id и выгрузки в Excel"""
+    month = {'month': 3, 'year': LAST_YEAR}
+    selected = list(Event.objects.order_by('-date', 'id').values_list('id', flat=True)[:200])
+    return [
+        BenchmarkPath('events_ui', 'get', 'events_ui', {}),
+        BenchmarkPath('events_ui: категория и месяц', 'get', 'events_ui', {'category': 1, **month}),
+        BenchmarkPath('events_ui: подразделение', 'get', 'events_ui', {'department': 2}),
+        BenchmarkPath('events_ui: поиск', 'get', 'events_ui', {'search': 'конференция студентов'}),
+        BenchmarkPath('events_ui: поиск по релевантности', 'get', 'events_ui',
+                      {'search': 'конференция студентов', 'sort_order': 'relevance'}),
+        BenchmarkPath('get_filtered_event_ids: категория', 'get', 'get_filtered_event_ids', {'category': 1}),
+        BenchmarkPath('get_filtered_event_ids: поиск', 'get', 'get_filtered_event_ids', {'search': 'семинар'}),
+        BenchmarkPath('export_selected_events: 200', 'post', 'export_selected_events',
+                      {'selected_events': selected}),
+        BenchmarkPath('export_events_to_excel: месяц', 'get', 'export_events_to_excel', month),
+    ]
+
+
+def _request(client, path):
+    response = getattr(client, path.method)(reverse(path.url), path.params)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    if response.status_code != 200:
+        raise ValueError(f'{path.name}: ответ {response.status_code}')
+    return size
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+def _measure(call, repeat, before=None):
+    """Время (p50/p95), число запросов и пик памяти ``call``.
+
+    ``before`` вызывается перед каждым запуском (например, очистка кэша).
+    Возвращает (замер, результат последнего вызова).
+    """
+    timings = []
+    queries = []
+    result = None
+    for _ in range(repeat):
+        if before:
+            before()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            result = call()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context))
+
+    if before:
+        before()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'min_ms': round(min(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': max(queries),
+        'peak_memory_kb': round(peak / 1024),
+    }, result
+
+
+def measure_path(client, path, repeat=10, warm=False):
+    """Замер пути: ``repeat`` запросов и отдельный запрос под tracemalloc.
+
+    Без ``warm`` кэш очищается перед каждым запросом — замеряется полное
+    построение ответа, а не попадание в кэш.
+    """
+    if warm:
+        _request(client, path)
+    result, size = _measure(lambda: _request(client, path), repeat, None if warm else cache.clear)
+    result['response_kb'] = round(size / 1024, 1)
+    return result
+
+
+# ---------- Прежние реализации ----------
+
+SEARCH_QUERIES = ('конференция', 'студенческая олимпиада', 'выставка', 'день открытых дверей', 'Иванов', 'спорт')
+
+
+def legacy_search(events, query):
+    """Прежний поиск: цепочка icontains по всем текстовым полям"""
+    search_q = Q()
+    for term in query.split():
+        search_q |= (
+            Q(name__icontains=term) |
+            Q(place__icontains=term) |
+            Q(comment__icontains=term) |
+            Q(responsible__icontains=term) |
+            Q(category__name__icontains=term) |
+            Q(department__name__icontains=term)
+        )
+    return events.filter(search_q)
+
+
+def in_memory_table(queryset, file):
+    """Прежняя таблица: обычная книга в памяти и копия файла в BytesIO"""
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append(EVENTS_TABLE_HEADERS)
+    for event in list(queryset):
+        worksheet.append([
+            event.id, event.name or "", str(event.date or ""), str(event.end_date or ""),
+            event.category_id, event.department_id, event.responsible or "",
+            event.place or "", event.user_id, event.comment or "",
+        ])
+    output = BytesIO()
+    workbook.save(output)
+    file.write(output.getvalue())
+
+
+def legacy_plan(queryset, file):
+    """Прежняя выгрузка плана: обычная книга, стили на каждую ячейку и
+    второй проход по всем ячейкам для высоты строк"""
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "План мероприятий"
+
+    for col, width in {'A': 15, 'C': 40, 'D': 35, 'E': 30}.items():
+        worksheet.column_dimensions[col].width = width
+
+    header_font = Font(bold=True, size=12)
+    center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    left_alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
+    thin_border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+
+    current_row = 4
+    worksheet.merge_cells(f'D{current_row}:E{current_row}')
+    worksheet.cell(row=current_row, column=4, value='УТВЕРЖДАЮ').alignment = center_alignment
+    worksheet.cell(row=current_row, column=4).font = Font(bold=True)
+    current_row += 1
+    worksheet.merge_cells(f'D{current_row}:E{current_row}')
+    worksheet.cell(row=current_row, column=4, value='Ректор ВоГУ').alignment = center_alignment
+    current_row += 1
+    worksheet.merge_cells(f'D{current_row}:E{current_row}')
+    worksheet.cell(row=current_row, column=4, value='').alignment = center_alignment
+    current_row += 1
+    worksheet.cell(row=current_row, column=4, value='').alignment = center_alignment
+    worksheet.cell(row=current_row, column=5, value='Д. В. Дворников').alignment = center_alignment
+    current_row += 1
+    worksheet.cell(row=current_row, column=4, value='').alignment = center_alignment
+    worksheet.cell(row=current_row, column=5, value='2025 года').alignment = center_alignment
+    current_row += 2
+    worksheet.merge_cells(f'A{current_row}:E{current_row}')
+    worksheet.cell(row=current_row, column=1, value='ПЛАН МЕРОПРИЯТИЙ УНИВЕРСИТЕТА')
+    worksheet.cell(row=current_row, column=1).alignment = center_alignment
+    worksheet.cell(row=current_row, column=1).font = Font(bold=True, size=14)
+    current_row += 2
+
+    headers = [
+        "Дата, время",
+        "Наименование мероприятия",
+        "Место проведения мероприятия",
+        "Структурное подразделение",
+        "Ответственный работник"
+    ]
+    header_row = current_row
+    for col_num, header in enumerate(headers, 1):
+        cell = worksheet.cell(row=header_row, column=col_num, value=header)
+        cell.font = header_font
+        cell.alignment = center_alignment
+        cell.border = thin_border
+        cell.fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+    current_row += 1
+
+    events_by_category = defaultdict(list)
+    for event in queryset.select_related('category', 'department').order_by('category__name', 'date'):
+        if event.category:
+            events_by_category[event.category.name].append(event)
+        else:
+            events_by_category['Без категории'].append(event)
+
+    for category_name, events in events_by_category.items():
+        if category_name and events:
+            worksheet.merge_cells(f'A{current_row}:E{current_row}')
+            category_cell = worksheet.cell(row=current_row, column=1, value=category_name.upper())
+            category_cell.font = Font(bold=True, size=11)
+            category_cell.alignment = left_alignment
+            current_row += 1
+
+            for event in events:
+                date_str = ""
+                if event.date:
+                    date_str = event.date.strftime('%Y.%m.%d %H:%M')
+                    if event.end_date:
+                        date_str += f" - {event.end_date.strftime('%H:%M' if event.date.date() == event.end_date.date() else '%Y.%m.%d %H:%M')}"
+
+                worksheet.cell(row=current_row, column=1, value=date_str).alignment = left_alignment
+                worksheet.cell(row=current_row, column=2, value=event.name).alignment = left_alignment
+                worksheet.cell(row=current_row, column=3, value=event.place or "").alignment = left_alignment
+                worksheet.cell(row=current_row, column=4,
+                               value=event.department.name if event.department else "").alignment = left_alignment
+                worksheet.cell(row=current_row, column=5, value=event.responsible or "").alignment = left_alignment
+
+                for col_num in range(1, 6):
+                    cell = worksheet.cell(row=current_row, column=col_num)
+                    cell.border = thin_border
+                    cell.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
+
+                current_row += 1
+
+    for row in worksheet.iter_rows(min_row=header_row, max_row=current_row - 1, max_col=5):
+        for cell in row:
+            if cell.value:
+                lines = str(cell.value).count('\n') + 1
+                char_count = len(str(cell.value))
+                estimated_height = min(100, max(15, lines * 15 + (char_count // 100) * 5))
+                worksheet.row_dimensions[cell.row].height = estimated_height
+
+    output = BytesIO()
+    workbook.save(output)
+    file.write(output.getvalue())
+
+
+def _search_all(search):
+    # Число найденных по всем запросам — для сверки с прежним поиском
+    return sum(len(set(search(Event.objects.all(), query).values_list('id', flat=True)))
+               for query in SEARCH_QUERIES)
+
+
+def _writer(write):
+    def run():
+        with tempfile.TemporaryFile() as file:
+            write(Event.objects.all(), file)
+            return file.tell()
+    return run
+
+
+# Сравнение с прежней реализацией: имя в отчёте, текущий и прежний вызов;
+# вызов возвращает размер результата (найдено мероприятий или байт файла)
+LegacyComparison = namedtuple('LegacyComparison', ['name', 'current', 'legacy'])
+
+
+def legacy_comparisons():
+    return [
+        LegacyComparison('поиск', lambda: _search_all(search_events), lambda: _search_all(legacy_search)),
+        LegacyComparison('план', _writer(write_plan), _writer(legacy_plan)),
+        LegacyComparison('таблица', _writer(write_events_table), _writer(in_memory_table)),
+    ]
+
+
+def measure_legacy(comparison, repeat=10):
+    """Замер текущей и прежней реализации на одних данных"""
+    result = {}
+    for name in ('current', 'legacy'):
+        result[name], size = _measure(getattr(comparison, name), repeat, cache.clear)
+        result[name]['result_size'] = size
+    return result
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .reference import get_reference_version
+
+
+DATA_VERSION_KEY = 'events:data-version'
+EVENT_VERSION_KEY = 'events:event-version:%s'
+EVENT_DETAILS_KEY = 'events:event-details:%s:%s:%s'
+
+# Результаты выборок привязаны к версии данных и после записи просто
+# перестают запрашиваться; таймаут ограничивает время жизни сирот.
+RESULT_CACHE_TIMEOUT = 60 * 10
+
+# Детали мероприятия живут в кэше, пока не изменится версия мероприятия,
+# поэтому таймаут нужен только для уборки устаревших записей.
+EVENT_DETAILS_TIMEOUT = 60 * 60 * 24
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def get_data_version():
+    """Версия всех данных мероприятий; меняется при любой записи."""
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not cache.add(DATA_VERSION_KEY, version, None):
+            version = cache.get(DATA_VERSION_KEY, version)
+    return version
+
+
+def bump_data_version():
+    """Меняет версию данных после фиксации текущей транзакции.
+
+    Если сменить версию до COMMIT, другой воркер успеет закэшировать под
+    новой версией ещё старые данные, а при откате версия сменится зря.
+    """
+    transaction.on_commit(lambda: cache.set(DATA_VERSION_KEY, _new_version(), None))
+
+
+def params_digest(params):
+    """Хэш параметров выборки (ключи кэша, ETag)."""
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def versioned_key(prefix, params):
+    """Ключ кэша для выборки: префикс, версия данных и хэш параметров."""
+    return f'events:{prefix}:{get_data_version()}:{params_digest(params)}'
+
+
+def get_or_build(prefix, params, build, timeout=RESULT_CACHE_TIMEOUT):
+    """Возвращает результат из кэша текущей версии данных или строит его."""
+    key = versioned_key(prefix, params)
+    result = cache.get(key)
+    if result is None:
+        result = build()
+        cache.set(key, result, timeout)
+    return result
+
+
+def get_event_versions(event_ids):
+    """Возвращает словарь {id мероприятия: версия данных}.
+
+    Если версия ещё не заведена (или была вытеснена из кэша), создаётся
+    новая, так что старые закэшированные данные никогда не будут отданы.
+    """
+    keys = {EVENT_VERSION_KEY % event_id: event_id for event_id in event_ids}
+    found = cache.get_many(keys.keys())
+
+    missing = {key: _new_version() for key in keys if key not in found}
+    for key, version in missing.items():
+        # add() не перезапишет версию, если другой воркер успел её создать
+        if not cache.add(key, version, None):
+            found[key] = cache.get(key, version)
+        else:
+            found[key] = version
+
+    return {keys[key]: version for key, version in found.items()}
+
+
+def get_event_version(event_id):
+    return get_event_versions([event_id])[event_id]
+
+
+def bump_event_versions(event_ids):
+    """Помечает данные мероприятий как изменённые во всех воркерах.
+
+    Как и bump_data_version, срабатывает после фиксации транзакции.
+    """
+    keys = [EVENT_VERSION_KEY % event_id for event_id in event_ids]
+
+    def bump():
+        version = _new_version()
+        cache.set_many(dict.fromkeys(keys, version), None)
+
+    transaction.on_commit(bump)
+
+
+def bump_event_version(event_id):
+    bump_event_versions([event_id])
+
+
+def get_cached_event_details(event_ids, build):
+    """Возвращает детали мероприятий из кэша, достраивая недостающие.
+
+    ``build`` получает список id, которых нет в кэше, и должен вернуть
+    словарь {id: данные}. Ключ кэша включает версию мероприятия и версию
+    справочников (в деталях есть названия категории и подразделения),
+    поэтому после любого изменения данные собираются заново.
+    """
+    reference_version = get_reference_version()
+    versions = get_event_versions(event_ids)
+    keys = {
+        EVENT_DETAILS_KEY % (event_id, version, reference_version): event_id
+        for event_id, version in versions.items()
+    }
+    cached = cache.get_many(keys.keys())
+
+    details = {keys[key]: value for key, value in cached.items()}
+    missing = [event_id for event_id in event_ids if event_id not in details]
+    if missing:
+        built = build(missing)
+        cache.set_many(
+            {EVENT_DETAILS_KEY % (event_id, versions[event_id], reference_version): value for event_id, value in built.items()},
+            EVENT_DETAILS_TIMEOUT,
+        )
+        details.update(built)
+
+    return details
@@ -0,0 +1,114 @@
+"""Календарь мероприятий на месяц или неделю.
+
+Все даты EventDate, пересекающиеся с окном, выбираются одним запросом по
+индексу дней (EventDate.objects.overlapping), мероприятия без дат
+EventDate — вторым запросом по тому же индексу. Каждый интервал
+раскладывается на местные дни (TIME_ZONE), так что мероприятие на
+несколько дней попадает в каждый из них с отметками начала и окончания.
+"""
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Event, EventDate
+from .occurrences import interval_days
+from .reference import get_reference_data
+
+
+VIEW_MONTH = 'month'
+VIEW_WEEK = 'week'
+CALENDAR_VIEWS = (VIEW_MONTH, VIEW_WEEK)
+
+EVENT_FIELDS = ('name', 'place', 'comment', 'category_id', 'department_id')
+
+
+def calendar_window(view, day):
+    """Первый и последний день окна, содержащего ``day``"""
+    if view == VIEW_WEEK:
+        first = day - timedelta(days=day.weekday())
+        return first, first + timedelta(days=6)
+    first = day.replace(day=1)
+    next_month = (first + timedelta(days=32)).replace(day=1)
+    return first, next_month - timedelta(days=1)
+
+
+def parse_calendar_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return timezone.localdate()
+
+
+def _entry(event, start, end, day, reference):
+    first_day = timezone.localdate(start)
+    last_day = timezone.localdate(end) if end else first_day
+    return {
+        'id': event.id,
+        'name': event.name or '',
+        'place': event.place or '',
+        'category': reference.category_name(event.category_id),
+        'department': reference.department_name(event.department_id),
+        'status': event.get_status(),
+        'start': timezone.localtime(start).strftime('%Y-%m-%d %H:%M'),
+        'end': timezone.localtime(end).strftime('%Y-%m-%d %H:%M') if end else '',
+        # Для интервалов на несколько дней: продолжение и завершение
+        'continues_from_previous': day > first_day,
+        'continues_to_next': day < last_day,
+    }
+
+
+def calendar_days(first_day, last_day, events=None):
+    """{день: [мероприятия]} для окна [first_day, last_day].
+
+    ``events`` — queryset мероприятий (например, с фильтром списка);
+    по умолчанию все.
+    """
+    reference = get_reference_data()
+    window_start = timezone.make_aware(datetime.combine(first_day, time.min))
+    window_end = timezone.make_aware(datetime.combine(last_day, time.max))
+
+    days = OrderedDict()
+    day = first_day
+    while day <= last_day:
+        days[day] = []
+        day += timedelta(days=1)
+
+    def add(event, start, end):
+        for day in interval_days(start, end):
+            if first_day <= day <= last_day:
+                days[day].append(_entry(event, start, end, day, reference))
+
+    occurrences = EventDate.objects.overlapping(window_start, window_end)
+    if events is not None:
+        occurrences = occurrences.filter(event__in=events.values('id'))
+    occurrences = (occurrences.select_related('event')
+                   .only('start', 'end', 'event', *(f'event__{field}' for field in EVENT_FIELDS))
+                   .order_by('start', 'id'))
+    for occurrence in occurrences:
+        add(occurrence.event, occurrence.start, occurrence.end)
+
+    # Мероприятия без дат EventDate — по полям date/end_date
+    legacy = events if events is not None else Event.objects.all()
+    legacy = (legacy.active_between(first_day, last_day)
+              .filter(~Exists(EventDate.objects.filter(event_id=OuterRef('pk'))))
+              .only('date', 'end_date', *EVENT_FIELDS)
+              .order_by('date', 'id'))
+    for event in legacy:
+        add(event, event.date, event.end_date)
+
+    for entries in days.values():
+        entries.sort(key=lambda entry: (entry['start'], entry['id']))
+    return days
+
+
+def calendar_payload(view, day, events=None):
+    first_day, last_day = calendar_window(view, day)
+    days = calendar_days(first_day, last_day, events)
+    return {
+        'view': view,
+        'first_day': first_day.isoformat(),
+        'last_day': last_day.isoformat(),
+        'days': {day.isoformat(): entries for day, entries in days.items()},
+    }
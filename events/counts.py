@@ -0,0 +1,101 @@
+"""Подсчёт мероприятий для списка.
+
+Общее число мероприятий хранится в кэше и поддерживается сигналами
+создания/удаления, поэтому COUNT по всей таблице выполняется только после
+вытеснения счётчика. Для отфильтрованной выборки считается один COUNT,
+который затем передаётся в пагинатор. Для очень широких фильтров на MySQL
+можно включить оценку по EXPLAIN (настройка EVENTS_COUNT_ESTIMATE_THRESHOLD).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Event
+
+
+TOTAL_COUNT_KEY = 'events:total-count'
+
+# Счётчик периодически пересчитывается, чтобы случайный рассинхрон
+# (например, запись в обход ORM) не жил дольше часа
+TOTAL_COUNT_TIMEOUT = 60 * 60
+
+
+def get_total_events():
+    """Общее число мероприятий"""
+    total = cache.get(TOTAL_COUNT_KEY)
+    if total is None:
+        total = Event.objects.count()
+        cache.add(TOTAL_COUNT_KEY, total, TOTAL_COUNT_TIMEOUT)
+    return total
+
+
+def adjust_total_events(delta):
+    """Изменяет счётчик после создания/удаления мероприятия.
+
+    Счётчик меняется после фиксации транзакции: при откате записи он не
+    должен разойтись с таблицей.
+    """
+    def adjust():
+        try:
+            cache.incr(TOTAL_COUNT_KEY, delta)
+        except ValueError:
+            # Счётчика нет в кэше — он будет посчитан при следующем обращении
+            pass
+
+    transaction.on_commit(adjust)
+
+
+def _explain_rows(queryset):
+    """Оценка числа строк по плану запроса MySQL/MariaDB (или None)"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'mysql':
+        return None
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN ' + sql, params)
+        columns = [column[0] for column in cursor.description]
+        row = cursor.fetchone()
+    if row is None:
+        return None
+
+    plan = dict(zip(columns, row))
+    rows = plan.get('rows')
+    if rows is None:
+        return None
+    filtered = plan.get('filtered')
+    if filtered is not None:
+        rows = rows * float(filtered) / 100
+    return int(rows)
+
+
+def count_events(event_filter, events):
+    """Возвращает (число мероприятий, признак оценки) для выборки фильтра.
+
+    Без фильтров используется поддерживаемый счётчик. Если задан порог
+    EVENTS_COUNT_ESTIMATE_THRESHOLD и план запроса обещает больше строк,
+    возвращается оценка планировщика вместо точного COUNT.
+    """
+    if event_filter.is_empty():
+        return get_total_events(), False
+
+    threshold = getattr(settings, 'EVENTS_COUNT_ESTIMATE_THRESHOLD', None)
+    if threshold:
+        estimate = _explain_rows(events)
+        if estimate is not None and estimate >= threshold:
+            return min(estimate, get_total_events()), True
+
+    return events.count(), False
+
+
+def related_count(queryset, field):
+    """Число строк ``queryset``, ссылающихся полем ``field`` на внешнюю строку.
+
+    Коррелированный подзапрос для annotate(): в отличие от Count по
+    обратной связи не размножает строки при нескольких счётчиках сразу.
+    """
+    counts = (queryset.filter(**{field: OuterRef('pk')}).order_by()
+              .values(field).annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
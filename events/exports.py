@@ -0,0 +1,344 @@
+"""Выгрузка мероприятий в Excel.
+
+Книги строятся в режиме openpyxl write-only: строки пишутся сразу в
+файл, мероприятия читаются из базы порциями через iterator(), а ответ
+отдаётся из файла через FileResponse. Память не растёт с числом
+мероприятий — в ней держится только текущая порция строк.
+
+Готовые книги хранятся в кэше на диске под хэшем состава выгрузки
+(id мероприятий, версия данных, версия справочников и макета), так что
+повторная выгрузка тех же данных не строится заново.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Side, Font, NamedStyle, PatternFill
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+from .cache import get_data_version
+from .profiling import profile_span
+from .reference import get_reference_data, get_reference_version
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Сколько мероприятий читать из базы за один запрос
+EXPORT_CHUNK_SIZE = 500
+
+# Версия оформления выгрузок: входит в ключ кэша книг, поэтому её нужно
+# увеличивать при любой правке макета
+REPORT_LAYOUT_VERSION = 2
+
+# Ограничения кэша книг (переопределяются настройками с теми же именами)
+EXPORT_CACHE_MAX_AGE = timedelta(days=7)
+EXPORT_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+EVENTS_TABLE_HEADERS = [
+    "ID", "Название", "Дата начала", "Дата окончания", "Категория",
+    "Подразделение", "Ответственный", "Место", "Создатель", "Комментарий"
+]
+
+PLAN_HEADERS = [
+    "Дата, время",
+    "Наименование мероприятия",
+    "Место проведения мероприятия",
+    "Структурное подразделение",
+    "Ответственный работник"
+]
+
+PLAN_COLUMN_WIDTHS = {
+    'A': 15,
+    'C': 40,
+    'D': 35,
+    'E': 30,
+}
+
+thin_border = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+left_alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
+
+# Стили плана регистрируются в книге один раз; ячейки ссылаются на них
+# по имени, а не создают собственные Font/Alignment/Border
+def plan_styles():
+    # NamedStyle привязывается к книге, поэтому для каждой книги — свои объекты
+    return [
+        NamedStyle(name='plan_approval', font=Font(bold=True), alignment=center_alignment, border=DEFAULT_BORDER),
+        NamedStyle(name='plan_center', font=DEFAULT_FONT, alignment=center_alignment, border=DEFAULT_BORDER),
+        NamedStyle(name='plan_title', font=Font(bold=True, size=14), alignment=center_alignment,
+                   border=DEFAULT_BORDER),
+        NamedStyle(name='plan_header', font=Font(bold=True, size=12), alignment=center_alignment,
+                   border=thin_border, fill=PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")),
+        NamedStyle(name='plan_category', font=Font(bold=True, size=11), alignment=left_alignment,
+                   border=DEFAULT_BORDER),
+        NamedStyle(name='plan_cell', font=DEFAULT_FONT, alignment=left_alignment, border=thin_border),
+    ]
+
+
+def _iter_events(queryset, progress=None):
+    """Мероприятия порциями; ``progress(n)`` вызывается после каждой порции"""
+    done = 0
+    for done, event in enumerate(queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE), 1):
+        yield event
+        if progress is not None and done % EXPORT_CHUNK_SIZE == 0:
+            progress(done)
+    if progress is not None:
+        progress(done)
+
+
+def _estimate_row_height(values):
+    """Высота строки по её последней непустой ячейке (как в прежней выгрузке)"""
+    height = None
+    for value in values:
+        if value:
+            lines = str(value).count('\n') + 1
+            char_count = len(str(value))
+            height = min(100, max(15, lines * 15 + (char_count // 100) * 5))
+    return height
+
+
+def format_plan_dates(event):
+    if not event.date:
+        return ""
+    date_str = event.date.strftime('%Y.%m.%d %H:%M')
+    if event.end_date:
+        date_str += f" - {event.end_date.strftime('%H:%M' if event.date.date() == event.end_date.date() else '%Y.%m.%d %H:%M')}"
+    return date_str
+
+
+def _local_time(value):
+    # Таблица читается обратно импортом, который считает время местным
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M') if value else ""
+
+
+def write_events_table(queryset, file, progress=None):
+    """Плоская таблица мероприятий со всеми полями"""
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Мероприятия")
+    worksheet.append(EVENTS_TABLE_HEADERS)
+
+    reference = get_reference_data()
+    for event in _iter_events(queryset, progress):
+        worksheet.append([
+            event.id,
+            event.name or "",
+            _local_time(event.date),
+            _local_time(event.end_date),
+            reference.category_name(event.category_id),
+            reference.department_name(event.department_id),
+            event.responsible or "",
+            event.place or "",
+            reference.user_name(event.user_id),
+            event.comment or "",
+        ])
+
+    workbook.save(file)
+
+
+@lru_cache(maxsize=None)
+def plan_header_template():
+    """Неизменная шапка плана: строки (ячейки, объединение, высота).
+
+    Ячейка — пара (значение, имя стиля); None — пустая ячейка.
+    """
+    approval = [None, None, None]
+    return (
+        ((), None, None),
+        ((), None, None),
+        ((), None, None),
+        ((*approval, ('УТВЕРЖДАЮ', 'plan_approval')), 'D%(row)s:E%(row)s', None),
+        ((*approval, ('Ректор ВоГУ', 'plan_center')), 'D%(row)s:E%(row)s', None),
+        ((*approval, ('', 'plan_center')), 'D%(row)s:E%(row)s', None),
+        ((*approval, ('', 'plan_center'), ('Д. В. Дворников', 'plan_center')), None, None),
+        ((*approval, ('', 'plan_center'), ('2025 года', 'plan_center')), None, None),
+        ((), None, None),
+        ((('ПЛАН МЕРОПРИЯТИЙ УНИВЕРСИТЕТА', 'plan_title'),), 'A%(row)s:E%(row)s', None),
+        ((), None, None),
+        (tuple((header, 'plan_header') for header in PLAN_HEADERS), None, _estimate_row_height(PLAN_HEADERS)),
+    )
+
+
+class PlanReport:
+    """«План мероприятий университета» в write-only книге.
+
+    Строки пишутся за один проход: высота строки считается до её записи,
+    размеры уже записанных строк сразу отбрасываются.
+    """
+
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+        for style in plan_styles():
+            self.workbook.add_named_style(style)
+        self.worksheet = self.workbook.create_sheet("План мероприятий")
+        for col, width in PLAN_COLUMN_WIDTHS.items():
+            self.worksheet.column_dimensions[col].width = width
+        self.row = 0
+
+    def _cell(self, value, style):
+        cell = WriteOnlyCell(self.worksheet, value=value)
+        cell.style = style
+        return cell
+
+    def append(self, cells, merge=None, height=None):
+        """Пишет строку; ``cells`` — пары (значение, имя стиля) или None"""
+        self.row += 1
+        # Размер строки в write-only режиме должен быть задан до её записи
+        if height:
+            self.worksheet.row_dimensions[self.row].height = height
+        if merge:
+            self.worksheet.merged_cells.add(merge % {'row': self.row})
+        self.worksheet.append([cell and self._cell(*cell) for cell in cells])
+        # Строка уже записана в файл, её размеры больше не нужны — не копим их
+        self.worksheet.row_dimensions.pop(self.row, None)
+
+    def write_header(self):
+        for cells, merge, height in plan_header_template():
+            self.append(cells, merge, height)
+
+    def write_category(self, name):
+        title = name.upper()
+        self.append([(title, 'plan_category')], 'A%(row)s:E%(row)s', _estimate_row_height([title]))
+
+    def write_event(self, event, reference):
+        values = [
+            format_plan_dates(event),
+            event.name,
+            event.place or "",
+            reference.department_name(event.department_id),
+            event.responsible or "",
+        ]
+        self.append([(value, 'plan_cell') for value in values], height=_estimate_row_height(values))
+
+    def save(self, file):
+        self.workbook.save(file)
+
+
+def write_plan(queryset, file, progress=None):
+    """План мероприятий, сгруппированный по категориям"""
+    report = PlanReport()
+    report.write_header()
+
+    reference = get_reference_data()
+    current_category = None
+    # Сортировка по названию категории: мероприятия одной категории идут
+    # подряд, и заголовок группы пишется при смене категории
+    for event in _iter_events(queryset.order_by('category__name', 'date'), progress):
+        category_name = reference.category_name(event.category_id) or 'Без категории'
+        if category_name != current_category:
+            current_category = category_name
+            report.write_category(category_name)
+        report.write_event(event, reference)
+
+    report.save(file)
+
+
+def _export_cache_dir():
+    path = getattr(settings, 'EXPORT_CACHE_DIR', settings.BASE_DIR / 'export_cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def workbook_digest(write, event_ids):
+    """Адрес книги в кэше: вид выгрузки, мероприятия и версия данных.
+
+    Версии отдельных мероприятий не читаются: на файловом кэше каждая
+    заведённая версия — отдельный файл и просмотр всего каталога, и на
+    тысячах id хэш считался бы дольше самой книги. Версия данных меняется
+    при любой записи, так что книга строится заново чаще, но не устаревает.
+    """
+    ids = hashlib.sha256(','.join(map(str, sorted(set(event_ids)))).encode('ascii')).hexdigest()
+    key = {
+        'writer': write.__name__,
+        'layout': REPORT_LAYOUT_VERSION,
+        'reference': get_reference_version(),
+        'data': get_data_version(),
+        'events': ids,
+    }
+    return hashlib.sha256(json.dumps(key, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def evict_export_cache():
+    """Удаляет старые книги и держит размер кэша в пределах настройки"""
+    max_age = getattr(settings, 'EXPORT_CACHE_MAX_AGE', EXPORT_CACHE_MAX_AGE)
+    max_bytes = getattr(settings, 'EXPORT_CACHE_MAX_BYTES', EXPORT_CACHE_MAX_BYTES)
+
+    entries = []
+    with os.scandir(_export_cache_dir()) as scan:
+        for entry in scan:
+            if entry.is_file() and entry.name.endswith('.xlsx'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    # Сначала самые давно использованные: при попадании файл «трогается»
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    expired_before = time.time() - max_age.total_seconds()
+    for mtime, size, path in entries:
+        if mtime >= expired_before and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def cached_workbook(write, queryset, digest=None, progress=None):
+    """Возвращает (путь, хэш) книги, строя её только при промахе кэша"""
+    if digest is None:
+        digest = workbook_digest(write, queryset.values_list('id', flat=True))
+    path = os.path.join(_export_cache_dir(), f'{digest}.xlsx')
+
+    if os.path.exists(path):
+        os.utime(path)
+        return path, digest
+
+    # Пишем во временный файл рядом и переименовываем: другой процесс
+    # никогда не увидит недописанную книгу
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as file, profile_span('xlsx'):
+            write(queryset, file, progress=progress)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    evict_export_cache()
+    return path, digest
+
+
+def xlsx_response(request, write, queryset, filename):
+    """Отдаёт книгу из кэша выгрузок (или строит её) с ETag.
+
+    Если у клиента уже есть эта версия файла, возвращается 304.
+    """
+    digest = workbook_digest(write, queryset.values_list('id', flat=True))
+    etag = f'"{digest}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    path, digest = cached_workbook(write, queryset, digest)
+    response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename,
+                            content_type=XLSX_CONTENT_TYPE)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,125 @@
+from datetime import MAXYEAR, MINYEAR, date, datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Event
+from .search import search_events
+
+
+SORT_ORDERS = ('asc', 'desc', 'relevance')
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+class EventFilter:
+    """Фильтр списка мероприятий, общий для списка, выборки id и экспорта.
+
+    GET-параметры разбираются один раз в конструкторе; некорректные значения
+    игнорируются так же, как раньше в представлениях. Фильтры по месяцу и
+    году превращаются в полуоткрытые интервалы дат, чтобы СУБД могла
+    использовать индексы по ``date``/``end_date`` вместо функций MONTH()/YEAR().
+    """
+
+    def __init__(self, params):
+        self.category = _parse_int(params.get('category'))
+        self.department = _parse_int(params.get('department'))
+        self.responsible = (params.get('responsible') or '').strip()
+        self.search = (params.get('search') or '').strip()
+        self.start_date = _parse_date(params.get('start_date'))
+        self.end_date = _parse_date(params.get('end_date'))
+
+        self.month = _parse_int(params.get('month'))
+        if self.month is not None and not 1 <= self.month <= 12:
+            self.month = None
+        # Граница периода — полночь следующего года по местному времени,
+        # переведённая в UTC: крайние годы datetime дают ошибку
+        self.year = _parse_int(params.get('year'))
+        if self.year is not None and not MINYEAR < self.year < MAXYEAR:
+            self.year = None
+        if self.month and not self.year:
+            self.year = datetime.now().year
+
+        sort_order = params.get('sort_order')
+        self.sort_order = sort_order if sort_order in SORT_ORDERS else 'desc'
+        if self.sort_order == 'relevance' and not self.search:
+            self.sort_order = 'desc'
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(request.GET)
+
+    def as_dict(self):
+        """Нормализованные параметры фильтра (без сортировки)"""
+        return {
+            'category': self.category,
+            'department': self.department,
+            'responsible': self.responsible,
+            'search': self.search,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'month': self.month,
+            'year': self.year,
+        }
+
+    def is_empty(self):
+        return not any(self.as_dict().values())
+
+    def period(self):
+        """Полуоткрытый интервал [начало, конец) для фильтра по месяцу/году"""
+        if not self.year:
+            return None
+        if self.month:
+            first = date(self.year, self.month, 1)
+            last = date(self.year + 1, 1, 1) if self.month == 12 else date(self.year, self.month + 1, 1)
+        else:
+            first, last = date(self.year, 1, 1), date(self.year + 1, 1, 1)
+        return _local_midnight(first), _local_midnight(last)
+
+    def filter(self, events=None):
+        """Применяет фильтр к queryset (по умолчанию ко всем мероприятиям)"""
+        if events is None:
+            events = Event.objects.all()
+
+        if self.category is not None:
+            events = events.filter(category_id=self.category)
+
+        if self.department is not None:
+            events = events.filter(department_id=self.department)
+
+        if self.responsible:
+            events = events.filter(responsible__icontains=self.responsible)
+
+        period = self.period()
+        if period:
+            start, end = period
+            events = events.filter(
+                Q(date__gte=start, date__lt=end) |
+                Q(end_date__gte=start, end_date__lt=end)
+            )
+
+        # Мероприятие попадает в интервал, если хотя бы один его день
+        # (с учётом всех дат EventDate) лежит между start_date и end_date
+        if self.start_date or self.end_date:
+            events = events.active_between(self.start_date, self.end_date)
+
+        if self.search:
+            events = search_events(events, self.search, ranked=self.sort_order == 'relevance')
+
+        return events
@@ -0,0 +1,179 @@
+"""Календарные ленты iCalendar (RFC 5545) для подписки из календарей.
+
+Лента — все мероприятия, мероприятия подразделения или категории. Каждая
+дата EventDate становится отдельным VEVENT; мероприятия без дат EventDate
+выгружаются по старым полям date/end_date. Лента отдаётся потоком: строки
+читаются через ``.iterator()`` и пишутся в ответ по мере готовности, а
+собранный текст сохраняется в кэш под версией данных. Пока данные не
+менялись, следующие запросы получают ленту из кэша, а клиенты с
+актуальным ETag — 304 без обращения к базе и кэшу ленты.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from .cache import get_data_version
+from .models import Event, EventDate
+from .reference import get_reference_data, get_reference_version
+
+
+ICS_CONTENT_TYPE = 'text/calendar; charset=utf-8'
+ICS_CACHE_KEY = 'events:ics:%s:%s:%s'
+ICS_CACHE_TIMEOUT = 60 * 60 * 24
+ICS_CHUNK_SIZE = 1000
+ICS_PRODID = '-//mplan//План мероприятий//RU'
+
+# Сколько VEVENT собирать в один кусок потока
+ICS_EVENTS_PER_CHUNK = 200
+
+FEED_ALL = 'all'
+FEED_DEPARTMENT = 'department'
+FEED_CATEGORY = 'category'
+
+
+def feed_id(scope, object_id=None):
+    return scope if object_id is None else f'{scope}-{object_id}'
+
+
+def feed_versions():
+    return get_data_version(), get_reference_version()
+
+
+def feed_validators(scope, object_id=None):
+    """ETag и время изменения ленты"""
+    data_version, reference_version = feed_versions()
+    raw = f'{feed_id(scope, object_id)}:{data_version}:{reference_version}'
+    last_modified = datetime.fromtimestamp(max(data_version, reference_version) / 1e9, tz=dt_timezone.utc)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest(), last_modified
+
+
+def feed_name(scope, object_id=None):
+    reference = get_reference_data()
+    if scope == FEED_DEPARTMENT:
+        return f'Мероприятия: {reference.department_name(object_id)}'
+    if scope == FEED_CATEGORY:
+        return f'Мероприятия: {reference.category_name(object_id)}'
+    return 'План мероприятий'
+
+
+def _feed_filter(scope, object_id):
+    if scope == FEED_DEPARTMENT:
+        return {'department_id': object_id}
+    if scope == FEED_CATEGORY:
+        return {'category_id': object_id}
+    return {}
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Разбивает строку длиннее 75 октетов (RFC 5545, 3.1)"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    current = ''
+    limit = 75
+    for char in line:
+        if len((current + char).encode('utf-8')) > limit:
+            parts.append(current)
+            current = char
+            # Продолжение начинается с пробела
+            limit = 74
+        else:
+            current += char
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _timestamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _vevent(uid, event, start, end, stamp, reference):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{_timestamp(start)}',
+    ]
+    if end is not None and end > start:
+        lines.append(f'DTEND:{_timestamp(end)}')
+    lines.append(f'SUMMARY:{_escape(event.name or "")}')
+    if event.place:
+        lines.append(f'LOCATION:{_escape(event.place)}')
+    description = []
+    if event.responsible:
+        description.append(f'Ответственный: {event.responsible}')
+    department = reference.department_name(event.department_id, None)
+    if department:
+        description.append(f'Подразделение: {department}')
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(chr(10).join(description))}')
+    category = reference.category_name(event.category_id, None)
+    if category:
+        lines.append(f'CATEGORIES:{_escape(category)}')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def _iter_vevents(scope, object_id, stamp):
+    reference = get_reference_data()
+    filters = _feed_filter(scope, object_id)
+    event_fields = ('event__name', 'event__place', 'event__responsible', 'event__category_id', 'event__department_id')
+
+    dates = (EventDate.objects.filter(**{f'event__{key}': value for key, value in filters.items()})
+             .select_related('event').only('start', 'end', 'event', *event_fields).order_by('start', 'id'))
+    for event_date in dates.iterator(chunk_size=ICS_CHUNK_SIZE):
+        yield _vevent(f'event-{event_date.event_id}-date-{event_date.id}@mplan', event_date.event,
+                      event_date.start, event_date.end, stamp, reference)
+
+    # Мероприятия, у которых ещё нет дат EventDate
+    legacy = (Event.objects.filter(date__isnull=False, **filters)
+              .filter(~Exists(EventDate.objects.filter(event_id=OuterRef('pk'))))
+              .only('name', 'place', 'responsible', 'category_id', 'department_id', 'date', 'end_date')
+              .order_by('date', 'id'))
+    for event in legacy.iterator(chunk_size=ICS_CHUNK_SIZE):
+        yield _vevent(f'event-{event.id}@mplan', event, event.date, event.end_date, stamp, reference)
+
+
+def iter_feed(scope, object_id=None):
+    """Текст ленты кусками; после последнего куска лента кладётся в кэш"""
+    data_version, reference_version = feed_versions()
+    key = ICS_CACHE_KEY % (feed_id(scope, object_id), data_version, reference_version)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    stamp = _timestamp(datetime.fromtimestamp(data_version / 1e9, tz=dt_timezone.utc))
+    header = ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{ICS_PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(feed_name(scope, object_id))}',
+        f'X-WR-TIMEZONE:{settings.TIME_ZONE}',
+    ])
+    parts = [header]
+    yield header
+
+    chunk = []
+    for vevent in _iter_vevents(scope, object_id, stamp):
+        chunk.append(vevent)
+        if len(chunk) >= ICS_EVENTS_PER_CHUNK:
+            parts.append(''.join(chunk))
+            yield parts[-1]
+            chunk = []
+    chunk.append('END:VCALENDAR\r\n')
+    parts.append(''.join(chunk))
+    yield parts[-1]
+
+    cache.set(key, ''.join(parts), ICS_CACHE_TIMEOUT)
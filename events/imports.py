@@ -0,0 +1,267 @@
+"""Массовая загрузка мероприятий из Excel/CSV.
+
+Файл читается потоково (openpyxl в режиме read_only, csv построчно) в
+формате выгрузки ``export_events_to_excel``: те же заголовки, столбец ID
+не учитывается. Названия категорий, подразделений и пользователей
+сопоставляются по справочнику ReferenceData без запросов на строку.
+Строки пишутся пачками: на пачку одна транзакция, по одному bulk_create
+для Event и EventDate, после чего поиск, дни и версии кэша обновляются
+сразу для всей пачки. Ошибочные строки пропускаются и попадают в отчёт
+с номером строки файла.
+"""
+import csv
+import io
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from .cache import bump_data_version, bump_event_versions
+from .counts import adjust_total_events
+from .models import Event, EventDate
+from .occurrences import rebuild_event_days
+from .reference import get_reference_data
+from .search import index_events
+from .signals import deferred_event_signals
+from .stats import apply_stat_changes, event_stat_key
+
+
+IMPORT_BATCH_SIZE = 500
+
+# Заголовок столбца -> поле строки. Столбец ID не читается: новые
+# мероприятия получают свои id
+IMPORT_COLUMNS = {
+    "Название": 'name',
+    "Дата начала": 'date',
+    "Дата окончания": 'end_date',
+    "Категория": 'category',
+    "Подразделение": 'department',
+    "Ответственный": 'responsible',
+    "Место": 'place',
+    "Создатель": 'user',
+    "Комментарий": 'comment',
+}
+REQUIRED_COLUMNS = ["Название", "Дата начала"]
+
+IMPORT_DATE_FORMATS = ['%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%d.%m.%Y %H:%M', '%Y-%m-%d', '%d.%m.%Y']
+
+
+class ImportFileError(ValueError):
+    """Файл целиком не подходит для загрузки (формат, заголовки) или
+    загрузку пришлось прервать"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    def add_error(self, row, message):
+        self.errors.append((row, message))
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _xlsx_rows(file):
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    delimiter = ';' if sample.count(';') > sample.count(',') else ','
+    yield from csv.reader(text, delimiter=delimiter)
+
+
+def iter_file_rows(file, filename):
+    """Строки файла в виде кортежей значений, первая — заголовки"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.xlsx':
+        return _xlsx_rows(file)
+    if extension == '.csv':
+        return _csv_rows(file)
+    raise ImportFileError('Поддерживаются только файлы .xlsx и .csv')
+
+
+def _column_map(header):
+    header = [str(title).strip() if title is not None else '' for title in header]
+    missing = [title for title in REQUIRED_COLUMNS if title not in header]
+    if missing:
+        raise ImportFileError('Нет обязательных столбцов: ' + ', '.join(missing))
+    return {IMPORT_COLUMNS[title]: index for index, title in enumerate(header) if title in IMPORT_COLUMNS}
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        value = _text(value)
+        if not value:
+            return None
+        for date_format in IMPORT_DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, date_format)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f'неверный формат даты «{value}»')
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def _lookup(find, value, label):
+    name = _text(value)
+    if not name:
+        return None
+    pk = find(name)
+    if pk is None:
+        raise ValueError(f'{label} «{name}» не найден(а) в справочнике')
+    return pk
+
+
+def build_event(values, columns, reference, user_id=None):
+    """Мероприятие из строки файла; ValueError — строка с ошибкой"""
+    def get(field):
+        index = columns.get(field)
+        return values[index] if index is not None and index < len(values) else None
+
+    name = _text(get('name'))
+    if not name:
+        raise ValueError('не заполнено название')
+    start = _parse_date(get('date'))
+    if start is None:
+        raise ValueError('не заполнена дата начала')
+    end = _parse_date(get('end_date'))
+    if end is not None and end < start:
+        raise ValueError('окончание раньше начала')
+
+    creator = _lookup(reference.find_user, get('user'), 'Пользователь')
+    return Event(
+        name=name,
+        date=start,
+        end_date=end,
+        category_id=_lookup(reference.find_category, get('category'), 'Категория'),
+        department_id=_lookup(reference.find_department, get('department'), 'Подразделение'),
+        responsible=_text(get('responsible')) or None,
+        place=_text(get('place')) or None,
+        user_id=creator if creator is not None else user_id,
+        comment=_text(get('comment')) or None,
+    )
+
+
+def _bulk_create_events(events):
+    """bulk_create, после которого у всех мероприятий заполнен id.
+
+    Без RETURNING (MySQL) строки пачки вставляются с меткой вместо
+    названия: ``<метка пачки>:<номер строки>``. По метке id читаются
+    обратно (среди id больше последнего, чтобы не просматривать всю
+    таблицу), затем названия возвращаются одним bulk_update. Строки
+    других транзакций метку не содержат, а до COMMIT пачка никому не
+    видна, так что уровень изоляции не важен.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        Event.objects.bulk_create(events)
+        return
+
+    marker = uuid.uuid4().hex
+    names = [event.name for event in events]
+    for number, event in enumerate(events):
+        event.name = f'{marker}:{number}'
+
+    last_id = Event.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    Event.objects.bulk_create(events)
+    rows = Event.objects.filter(id__gt=last_id, name__startswith=marker + ':').values_list('id', 'name')
+    ids = {int(name.rsplit(':', 1)[1]): event_id for event_id, name in rows}
+    if len(ids) != len(events):
+        raise ImportFileError('Не удалось записать пачку строк, повторите загрузку')
+
+    for number, event in enumerate(events):
+        event.pk = ids[number]
+        event.name = names[number]
+    Event.objects.bulk_update(events, ['name'], batch_size=IMPORT_BATCH_SIZE)
+
+
+def _insert_batch(events):
+    """Записывает пачку мероприятий с датами и обновляет зависимые данные"""
+    with transaction.atomic(), deferred_event_signals():
+        _bulk_create_events(events)
+        EventDate.objects.bulk_create(
+            [EventDate(event_id=event.pk, start=event.date, end=event.end_date) for event in events]
+        )
+
+        event_ids = [event.pk for event in events]
+        index_events(Event.objects.filter(id__in=event_ids).select_related('category', 'department'))
+        rebuild_event_days(event_ids)
+        apply_stat_changes(Counter(event_stat_key(event) for event in events))
+
+    bump_event_versions(event_ids)
+    bump_data_version()
+    adjust_total_events(len(events))
+
+
+def import_events(rows, user_id=None, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """Загружает мероприятия из строк ``rows`` (первая — заголовки).
+
+    ``user_id`` — создатель для строк без столбца «Создатель».
+    При ``dry_run`` строки только проверяются.
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+
+    rows = iter(rows)
+    columns = _column_map(next(rows, None) or ())
+    reference = get_reference_data()
+
+    def insert(batch):
+        if not dry_run:
+            try:
+                _insert_batch(batch)
+            except ImportFileError as exc:
+                # Предыдущие пачки уже записаны
+                raise ImportFileError(f'{exc}; уже загружено мероприятий: {result.created}') from exc
+        result.created += len(batch)
+
+    batch = []
+    # Первая строка файла — заголовки
+    for number, values in enumerate(rows, 2):
+        if not any(_text(value) for value in values):
+            continue
+        result.rows += 1
+        try:
+            batch.append(build_event(values, columns, reference, user_id))
+        except ValueError as exc:
+            result.add_error(number, str(exc))
+            continue
+        if len(batch) >= batch_size:
+            insert(batch)
+            batch = []
+
+    if batch:
+        insert(batch)
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def import_events_file(file, filename, user_id=None, dry_run=False):
+    return import_events(iter_file_rows(file, filename), user_id=user_id, dry_run=dry_run)
@@ -0,0 +1,127 @@
+"""Фоновые выгрузки в Excel.
+
+Веб-процесс только создаёт запись ExportJob и сразу отвечает; книгу
+строит команда ``export_worker`` в пуле процессов. Задание захватывается
+атомарным UPDATE по статусу, поэтому несколько воркеров (и несколько
+серверов с общей базой) не возьмут одно задание дважды.
+"""
+import os
+import shutil
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .exports import cached_workbook, write_events_table, write_plan
+from .filters import EventFilter
+from .models import Event, ExportJob
+from .selection import get_selection, selection_events
+
+
+EXPORT_WRITERS = {
+    ExportJob.KIND_PLAN: write_plan,
+    ExportJob.KIND_TABLE: write_events_table,
+}
+
+# Задание, которое выполняется дольше, считается потерянным
+EXPORT_JOB_TIMEOUT = timedelta(hours=1)
+
+# Сколько хранить готовые файлы
+EXPORT_JOB_MAX_AGE = timedelta(days=1)
+
+EXPORT_FILENAMES = {
+    ExportJob.KIND_PLAN: "План мероприятий.xlsx",
+    ExportJob.KIND_TABLE: "events_export.xlsx",
+}
+
+
+def _exports_dir():
+    path = getattr(settings, 'EXPORT_JOBS_DIR', settings.BASE_DIR / 'exports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def submit_export(kind, event_ids=None, filter_params=None, selection=None):
+    """Ставит выгрузку в очередь; нужен токен выбора, список id или
+    параметры фильтра"""
+    if selection is not None:
+        params = {'selection': selection}
+    elif event_ids is not None:
+        params = {'event_ids': [int(event_id) for event_id in event_ids]}
+    else:
+        params = {'filter': dict(filter_params or {})}
+    return ExportJob.objects.create(kind=kind, params=params)
+
+
+def job_queryset(job):
+    """Мероприятия, которые выгружает задание"""
+    if 'selection' in job.params:
+        snapshot = get_selection(job.params['selection'])
+        events = selection_events(snapshot) if snapshot else Event.objects.none()
+    elif 'event_ids' in job.params:
+        events = Event.objects.filter(id__in=job.params['event_ids'])
+    else:
+        events = EventFilter(job.params.get('filter', {})).filter()
+    return events.order_by('date', 'id')
+
+
+def claim_pending_jobs(limit):
+    """Захватывает до ``limit`` заданий из очереди и возвращает их id"""
+    claimed = []
+    candidates = (ExportJob.objects.filter(status=ExportJob.STATUS_PENDING)
+                  .order_by('created_at').values_list('id', flat=True)[:limit])
+    for job_id in candidates:
+        updated = ExportJob.objects.filter(id=job_id, status=ExportJob.STATUS_PENDING).update(
+            status=ExportJob.STATUS_RUNNING, started_at=timezone.now(),
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def run_export_job(job_id):
+    """Строит книгу задания; выполняется в процессе пула"""
+    close_old_connections()
+    job = ExportJob.objects.get(id=job_id)
+    jobs = ExportJob.objects.filter(id=job_id)
+
+    path = os.path.join(_exports_dir(), f'{job.id}.xlsx')
+    try:
+        events = job_queryset(job)
+        jobs.update(total=events.count())
+        cached_path, _ = cached_workbook(EXPORT_WRITERS[job.kind], events,
+                                         progress=lambda done: jobs.update(progress=done))
+        jobs.update(progress=F('total'))
+        # Жёсткая ссылка: файл задания живёт отдельно от вытеснения кэша
+        try:
+            os.link(cached_path, path)
+        except OSError:
+            shutil.copyfile(cached_path, path)
+    except Exception as exc:
+        if os.path.exists(path):
+            os.remove(path)
+        jobs.update(status=ExportJob.STATUS_FAILED, error=repr(exc), finished_at=timezone.now())
+        raise
+    jobs.update(status=ExportJob.STATUS_DONE, file_path=path, finished_at=timezone.now())
+    return str(job_id)
+
+
+def fail_stale_jobs(timeout):
+    """Помечает ошибкой задания, которые выполняются дольше ``timeout``
+    (например, после падения воркера)"""
+    return ExportJob.objects.filter(
+        status=ExportJob.STATUS_RUNNING, started_at__lt=timezone.now() - timeout,
+    ).update(status=ExportJob.STATUS_FAILED, error='Превышено время выполнения', finished_at=timezone.now())
+
+
+def delete_expired_jobs(max_age):
+    """Удаляет старые задания вместе с файлами"""
+    expired = ExportJob.objects.filter(created_at__lt=timezone.now() - max_age).exclude(
+        status=ExportJob.STATUS_RUNNING,
+    )
+    for path in expired.exclude(file_path='').values_list('file_path', flat=True):
+        if os.path.exists(path):
+            os.remove(path)
+    return expired.delete()[0]
@@ -0,0 +1,138 @@
+import json
+import platform
+import subprocess
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from events.benchmark import generate_events, hot_paths, legacy_comparisons, measure_legacy, measure_path
+from mplan.testing import PROJECT_APPS, ProjectTestRunner
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Замеряет список, поиск, выборку id и выгрузки на синтетических данных в N раз больше дампа. '
+            'Данные создаются в отдельной тестовой базе, которая удаляется после замера; '
+            'результат — JSON для сравнения между коммитами. С --legacy поиск, план и таблица '
+            'сравниваются с прежними реализациями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, action='append',
+                            help='Во сколько раз больше мероприятий, чем в дампе (можно несколько; по умолчанию 1)')
+        parser.add_argument('--repeat', type=int, default=10, help='Сколько раз выполнять каждый запрос')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора данных')
+        parser.add_argument('--path', action='append', help='Замерять только пути с таким именем (можно несколько)')
+        parser.add_argument('--warm', action='store_true', help='Не очищать кэш между запросами')
+        parser.add_argument('--output', help='Записать JSON в файл (по умолчанию — в stdout)')
+        parser.add_argument('--baseline', help='JSON прошлого замера: вывести изменение p50/p95 и числа запросов')
+        parser.add_argument('--legacy', action='store_true',
+                            help='Сравнить поиск, план и таблицу с прежними реализациями на тех же данных')
+
+    def _run_scale(self, scale, options):
+        started = time.perf_counter()
+        events = generate_events(scale, options['seed'], progress=lambda done, total: self.stderr.write(
+            f'\rМероприятий: {done}/{total}', ending=''))
+        self.stderr.write(f'\nДанные для ×{scale:g} созданы за {time.perf_counter() - started:.1f} с')
+
+        paths = hot_paths()
+        if options['path']:
+            paths = [path for path in paths if path.name in options['path']]
+            if not paths:
+                raise CommandError('Нет путей с такими именами')
+
+        client = Client()
+        results = {}
+        for path in paths:
+            results[path.name] = measure_path(client, path, options['repeat'], options['warm'])
+            self.stderr.write(f'{path.name}: p50 {results[path.name]["p50_ms"]} мс, '
+                              f'запросов {results[path.name]["queries"]}')
+        run = {'scale': scale, 'events': events, 'paths': results}
+
+        if options['legacy']:
+            run['legacy'] = {}
+            for comparison in legacy_comparisons():
+                result = run['legacy'][comparison.name] = measure_legacy(comparison, options['repeat'])
+                self.stderr.write(f'{comparison.name}: p50 {result["legacy"]["p50_ms"]} мс прежде, '
+                                  f'{result["current"]["p50_ms"]} мс сейчас; пик памяти '
+                                  f'{result["legacy"]["peak_memory_kb"]} → {result["current"]["peak_memory_kb"]} КБ')
+        return run
+
+    def _compare(self, report, baseline):
+        previous = {run['scale']: run['paths'] for run in baseline['runs']}
+        for run in report['runs']:
+            for name, current in run['paths'].items():
+                before = previous.get(run['scale'], {}).get(name)
+                if not before:
+                    continue
+                self.stderr.write(
+                    f'×{run["scale"]:g} {name}: p50 {before["p50_ms"]} → {current["p50_ms"]} мс, '
+                    f'p95 {before["p95_ms"]} → {current["p95_ms"]} мс, '
+                    f'запросов {before["queries"]} → {current["queries"]}'
+                )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть положительным')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        report = {
+            'commit': _git_commit(),
+            'created': timezone.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'seed': options['seed'],
+            'repeat': options['repeat'],
+            'cache': 'warm' if options['warm'] else 'cold',
+            'runs': [],
+        }
+
+        # Отдельная база и локальный кэш: рабочие данные и общий файловый
+        # кэш воркеров не затрагиваются. Таблицы старой базы создаются по
+        # моделям, как в тестах (см. mplan.testing)
+        with tempfile.TemporaryDirectory(prefix='mplan-benchmark-') as directory, override_settings(
+            MIGRATION_MODULES={app: None for app in PROJECT_APPS},
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                'OPTIONS': {'MAX_ENTRIES': 50000}}},
+            EXPORT_CACHE_DIR=directory,
+            EXPORT_JOBS_DIR=directory,
+        ):
+            runner = ProjectTestRunner(verbosity=0, interactive=False)
+            runner.setup_test_environment()
+            old_config = runner.setup_databases()
+            try:
+                for number, scale in enumerate(options['scale'] or [1.0]):
+                    if number:
+                        call_command('flush', interactive=False, verbosity=0)
+                    report['runs'].append(self._run_scale(scale, options))
+            finally:
+                runner.teardown_databases(old_config)
+                runner.teardown_test_environment()
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Результат записан в {options["output"]}'))
+        else:
+            self.stdout.write(output)
+        if baseline:
+            self._compare(report, baseline)
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from events.schema import canonical_queries, create_index, create_index_sql, full_scans, missing_indexes
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие индексы для основных запросов мероприятий (MySQL/MariaDB, SQLite) '
+            'и проверяет их планы через EXPLAIN')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать недостающие индексы и SQL')
+        parser.add_argument('--skip-explain', action='store_true', help='Не проверять планы запросов')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('mysql', 'sqlite'):
+            raise CommandError(f'СУБД {connection.vendor} не поддерживается')
+
+        missing = missing_indexes()
+        if not missing:
+            self.stdout.write('Все нужные индексы уже есть')
+        for spec in missing:
+            sql = create_index_sql(spec)
+            if options['dry_run']:
+                self.stdout.write(f'Нет индекса {spec.name}: {sql}')
+                continue
+            started = time.perf_counter()
+            create_index(spec)
+            self.stdout.write(self.style.SUCCESS(
+                f'Создан индекс {spec.name} за {time.perf_counter() - started:.1f} с'
+            ))
+
+        if options['skip_explain'] or (options['dry_run'] and missing):
+            return
+
+        regressions = []
+        for description, queryset in canonical_queries():
+            tables = full_scans(queryset)
+            if tables:
+                regressions.append(f'{description}: полный проход по {", ".join(tables)}')
+                self.stderr.write(f'{description}: полный проход по {", ".join(tables)}')
+            else:
+                self.stdout.write(f'{description}: индекс используется')
+
+        if regressions:
+            raise CommandError(f'Запросов с полным проходом по таблице: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Планы всех запросов используют индексы'))
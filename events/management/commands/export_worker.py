@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from events.jobs import (
+    EXPORT_JOB_MAX_AGE, EXPORT_JOB_TIMEOUT, claim_pending_jobs, delete_expired_jobs,
+    fail_stale_jobs, run_export_job,
+)
+
+
+# Как часто убирать старые и зависшие задания, секунд
+CLEANUP_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые выгрузки в Excel из очереди ExportJob в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                            help='Число процессов для построения книг')
+        parser.add_argument('--poll', type=float, default=1.0, help='Пауза между проверками очереди, секунд')
+        parser.add_argument('--once', action='store_true', help='Выполнить задания из очереди и завершиться')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        running = set()
+        last_cleanup = 0
+
+        # fork: дочерним процессам достаются загруженные настройки Django
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            while True:
+                running = {future for future in running if not future.done()}
+
+                if time.monotonic() - last_cleanup > CLEANUP_INTERVAL:
+                    fail_stale_jobs(EXPORT_JOB_TIMEOUT)
+                    delete_expired_jobs(EXPORT_JOB_MAX_AGE)
+                    last_cleanup = time.monotonic()
+
+                job_ids = claim_pending_jobs(workers - len(running))
+                if job_ids:
+                    # Соединение с базой нельзя делить с дочерними процессами
+                    connections.close_all()
+                for job_id in job_ids:
+                    self.stdout.write(f'Выгрузка {job_id} запущена')
+                    future = pool.submit(run_export_job, job_id)
+                    future.add_done_callback(self._report)
+                    running.add(future)
+
+                if options['once'] and not job_ids and not running:
+                    break
+                time.sleep(options['poll'])
+
+    def _report(self, future):
+        exc = future.exception()
+        if exc is not None:
+            self.stderr.write(f'Выгрузка завершилась ошибкой: {exc!r}')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Выгрузка {future.result()} готова'))
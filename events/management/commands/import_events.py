@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events.imports import ImportFileError, import_events_file
+
+
+# Сколько ошибочных строк выводить
+MAX_REPORTED_ERRORS = 50
+
+
+class Command(BaseCommand):
+    help = 'Загружает мероприятия из файла .xlsx или .csv в формате выгрузки в Excel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .xlsx или .csv')
+        parser.add_argument('--user-id', type=int, default=None,
+                            help='Создатель для строк без столбца «Создатель»')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить строки, ничего не записывая')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                result = import_events_file(file, path, user_id=options['user_id'], dry_run=options['dry_run'])
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(exc)
+
+        for row, message in result.errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f'Строка {row}: {message}')
+        if len(result.errors) > MAX_REPORTED_ERRORS:
+            self.stderr.write(f'… и ещё {len(result.errors) - MAX_REPORTED_ERRORS} ошибок')
+
+        action = 'Проверено' if options['dry_run'] else 'Загружено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} мероприятий: {result.created} из {result.rows}, ошибок: {len(result.errors)}, '
+            f'{result.seconds:.1f} с ({result.rows_per_second:.0f} строк/с)'
+        ))
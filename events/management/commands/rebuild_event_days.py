@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.occurrences import rebuild_all_event_days
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает интервальный индекс дней мероприятий (таблица event_day)'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_all_event_days()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано мероприятий: {count} за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.stats import rebuild_event_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводную таблицу статистики мероприятий (event_stat)'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_event_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Учтено мероприятий: {count} за {time.perf_counter() - started:.1f} с'
+        ))
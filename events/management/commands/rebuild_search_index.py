@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс мероприятий (таблица event_search_token)'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано мероприятий: {count} за {time.perf_counter() - started:.1f} с'
+        ))
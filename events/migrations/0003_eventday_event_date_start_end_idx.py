@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_eventsearchtoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventdate',
+            index=models.Index(fields=['start', 'end'], name='event_date_start_end_idx'),
+        ),
+        migrations.CreateModel(
+            name='EventDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('event', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='days', to='events.event')),
+            ],
+            options={
+                'db_table': 'event_day',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eventday',
+            constraint=models.UniqueConstraint(fields=('day', 'event'), name='event_day_day_event_uniq'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SelectionSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, unique=True)),
+                ('all_filtered', models.BooleanField(default=False)),
+                ('filter_params', models.JSONField(default=dict)),
+                ('include_ids', models.JSONField(default=list)),
+                ('exclude_ids', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Выбор мероприятий',
+                'verbose_name_plural': 'Выборы мероприятий',
+                'db_table': 'selection_snapshot',
+            },
+        ),
+    ]
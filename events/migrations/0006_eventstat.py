@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        ('departments', '0001_initial'),
+        ('events', '0005_selectionsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(null=True)),
+                ('events', models.IntegerField(default=0)),
+                ('events_with_end_date', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='categories.category')),
+                ('department', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='departments.department')),
+            ],
+            options={
+                'db_table': 'event_stat',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eventstat',
+            constraint=models.UniqueConstraint(fields=('month', 'category', 'department'), name='event_stat_key_uniq'),
+        ),
+    ]
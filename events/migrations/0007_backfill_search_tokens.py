@@ -0,0 +1,179 @@
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Замороженная копия нормализации из events/search.py на момент миграции:
+# индекс заполняется так же, как при сохранении мероприятия, но миграция не
+# зависит от будущих правок модуля. После изменения стеммера индекс всё
+# равно пересобирается командой rebuild_search_index
+
+# Вес совпадения в зависимости от поля
+FIELD_WEIGHTS = (
+    ('name', 4),
+    ('place', 2),
+    ('responsible', 2),
+    ('comment', 1),
+)
+TAXONOMY_WEIGHT = 1
+
+TOKEN_MAX_LENGTH = 64
+REINDEX_BATCH_SIZE = 500
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# ---------- Русский стеммер (Snowball) ----------
+
+_VOWELS = 'аеиоуыэюя'
+
+_PERFECTIVE_GERUND = (('вшись', 'вши', 'в'), ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'))
+_ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+_PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+_REFLEXIVE = ('ся', 'сь')
+_VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+     'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+_NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+    'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+_DERIVATIONAL = ('ост', 'ость')
+_SUPERLATIVE = ('ейш', 'ейше')
+
+
+def _region_after_vowel_consonant(word, start):
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, limit, endings, after_a_ya=()):
+    """Удаляет самое длинное окончание, лежащее в регионе ``word[limit:]``.
+
+    Окончания из ``after_a_ya`` засчитываются, только если перед ними стоит
+    «а» или «я». Возвращает новое слово или None, если окончание не найдено.
+    """
+    candidates = [(e, False) for e in endings] + [(e, True) for e in after_a_ya]
+    candidates.sort(key=lambda item: len(item[0]), reverse=True)
+    for ending, needs_a_ya in candidates:
+        cut = len(word) - len(ending)
+        if cut < limit or not word.endswith(ending):
+            continue
+        if needs_a_ya and (cut - 1 < limit or word[cut - 1] not in 'ая'):
+            return None
+        return word[:cut]
+    return None
+
+
+def stem(word):
+    """Возвращает основу русского слова; прочие слова возвращаются как есть."""
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+    if rv >= len(word):
+        return word
+    r2 = _region_after_vowel_consonant(word, _region_after_vowel_consonant(word, 0))
+
+    # Шаг 1
+    result = _strip(word, rv, _PERFECTIVE_GERUND[1], _PERFECTIVE_GERUND[0])
+    if result is None:
+        word = _strip(word, rv, _REFLEXIVE) or word
+        result = _strip(word, rv, _ADJECTIVE)
+        if result is not None:
+            result = _strip(result, rv, _PARTICIPLE[1], _PARTICIPLE[0]) or result
+        else:
+            result = _strip(word, rv, _VERB[1], _VERB[0])
+            if result is None:
+                result = _strip(word, rv, _NOUN)
+    word = result if result is not None else word
+
+    # Шаг 2
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3
+    word = _strip(word, r2, _DERIVATIONAL) or word
+
+    # Шаг 4
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        return word[:-1]
+    superlative = _strip(word, rv, _SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+        return word[:-1] if word.endswith('нн') else word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+def normalize(text):
+    """Разбивает текст на нормализованные основы слов."""
+    if not text:
+        return []
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return [stem(word)[:TOKEN_MAX_LENGTH] for word in words]
+
+
+def _event_tokens(event):
+    tokens = {}
+    for field, weight in FIELD_WEIGHTS:
+        for token in normalize(getattr(event, field)):
+            tokens[token] = max(tokens.get(token, 0), weight)
+
+    for related in (event.category, event.department):
+        for token in normalize(getattr(related, 'name', None)):
+            tokens[token] = max(tokens.get(token, 0), TAXONOMY_WEIGHT)
+    return tokens
+
+
+def backfill_search_tokens(apps, schema_editor):
+    # Таблицы event нет только в новой пустой базе — индексировать там нечего
+    if 'event' not in schema_editor.connection.introspection.table_names():
+        return
+    Event = apps.get_model('events', 'Event')
+    EventSearchToken = apps.get_model('events', 'EventSearchToken')
+
+    EventSearchToken.objects.all().delete()
+    events = Event.objects.select_related('category', 'department').order_by('id')
+    rows = []
+    for event in events.iterator(chunk_size=REINDEX_BATCH_SIZE):
+        rows.extend(EventSearchToken(event_id=event.pk, token=token, weight=weight)
+                    for token, weight in _event_tokens(event).items())
+        if len(rows) >= 1000:
+            EventSearchToken.objects.bulk_create(rows)
+            rows = []
+    EventSearchToken.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        ('departments', '0001_initial'),
+        ('events', '0006_eventstat'),
+    ]
+
+    operations = [
+        # Связи старой таблицы event нужны заполнению индекса и сводки.
+        # Модель неуправляемая: меняется только состояние миграций, столбцы
+        # в базе уже есть
+        migrations.AddField(
+            model_name='event',
+            name='category',
+            field=models.ForeignKey(blank=True, db_column='category_id', null=True,
+                                    on_delete=django.db.models.deletion.DO_NOTHING, to='categories.category'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='department',
+            field=models.ForeignKey(blank=True, db_column='departament_id', null=True,
+                                    on_delete=django.db.models.deletion.DO_NOTHING, to='departments.department'),
+        ),
+        migrations.RunPython(backfill_search_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+
+# Замороженная копия events/occurrences.py на момент миграции
+MAX_SPAN_DAYS = 366
+REBUILD_BATCH_SIZE = 500
+
+
+def _interval_days(start, end):
+    first = timezone.localdate(start)
+    last = timezone.localdate(end) if end else first
+    if last < first:
+        last = first
+    last = min(last, first + timedelta(days=MAX_SPAN_DAYS))
+
+    day = first
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def backfill_event_days(apps, schema_editor):
+    # Таблицы event нет только в новой пустой базе
+    if 'event' not in schema_editor.connection.introspection.table_names():
+        return
+    Event = apps.get_model('events', 'Event')
+    EventDate = apps.get_model('events', 'EventDate')
+    EventDay = apps.get_model('events', 'EventDay')
+
+    EventDay.objects.all().delete()
+    events = list(Event.objects.order_by('id').values_list('id', 'date', 'end_date'))
+    for i in range(0, len(events), REBUILD_BATCH_SIZE):
+        batch = events[i:i + REBUILD_BATCH_SIZE]
+        intervals = {}
+        dates = EventDate.objects.filter(event_id__in=[event_id for event_id, _, _ in batch])
+        for event_id, start, end in dates.values_list('event_id', 'start', 'end'):
+            intervals.setdefault(event_id, []).append((start, end))
+
+        rows = []
+        for event_id, date, end_date in batch:
+            # Без дат EventDate — старые поля date/end_date
+            event_intervals = intervals.get(event_id) or ([(date, end_date)] if date else [])
+            days = set()
+            for start, end in event_intervals:
+                days.update(_interval_days(start, end))
+            rows.extend(EventDay(event_id=event_id, day=day) for day in days)
+        EventDay.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_backfill_search_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_event_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+from collections import Counter
+
+from django.db import migrations
+from django.utils import timezone
+
+
+# Замороженная копия пересчёта из events/stats.py на момент миграции
+REBUILD_BATCH_SIZE = 2000
+
+
+def _month(value):
+    if value is None:
+        return None
+    local = timezone.localtime(value) if timezone.is_aware(value) else value
+    return local.date().replace(day=1)
+
+
+def backfill_event_stat(apps, schema_editor):
+    # Таблицы event нет только в новой пустой базе
+    if 'event' not in schema_editor.connection.introspection.table_names():
+        return
+    Event = apps.get_model('events', 'Event')
+    EventStat = apps.get_model('events', 'EventStat')
+
+    events = Counter()
+    with_end = Counter()
+    rows = Event.objects.values_list('category_id', 'department_id', 'date', 'end_date')
+    for category_id, department_id, date, end_date in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        key = (category_id, department_id, _month(date))
+        events[key] += 1
+        if end_date is not None:
+            with_end[key] += 1
+
+    EventStat.objects.all().delete()
+    EventStat.objects.bulk_create([
+        EventStat(category_id=category_id, department_id=department_id, month=month,
+                  events=count, events_with_end_date=with_end[(category_id, department_id, month)])
+        for (category_id, department_id, month), count in events.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_backfill_event_days'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_event_stat, migrations.RunPython.noop),
+    ]
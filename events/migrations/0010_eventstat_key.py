@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+
+# Замороженная копия events.stats.stat_row_key на момент миграции
+def _row_key(category_id, department_id, month):
+    return f'{category_id or 0}:{department_id or 0}:{month.isoformat() if month else "-"}'
+
+
+def fill_event_stat_key(apps, schema_editor):
+    # Строки с NULL могли задвоиться: индекс по (month, category, department)
+    # их не различал. Дубли складываются в первую строку
+    EventStat = apps.get_model('events', 'EventStat')
+    rows = {}
+    duplicates = []
+    for stat in EventStat.objects.order_by('id'):
+        stat.key = _row_key(stat.category_id, stat.department_id, stat.month)
+        first = rows.setdefault(stat.key, stat)
+        if first is not stat:
+            first.events += stat.events
+            first.events_with_end_date += stat.events_with_end_date
+            duplicates.append(stat.pk)
+    EventStat.objects.filter(pk__in=duplicates).delete()
+    EventStat.objects.bulk_update(rows.values(), ['key', 'events', 'events_with_end_date'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_backfill_event_stat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventstat',
+            name='key',
+            field=models.CharField(default='', max_length=40),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_event_stat_key, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='eventstat',
+            name='event_stat_key_uniq',
+        ),
+        migrations.AlterField(
+            model_name='eventstat',
+            name='key',
+            field=models.CharField(max_length=40, unique=True),
+        ),
+    ]
@@ -1,11 +1,67 @@
+from collections import namedtuple
 from datetime import datetime
 import json
+import uuid
 from django.db import models
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 from categories.models import Category
 from departments.models import Department
 from users.models import User
 
 
+# Сводка по датам мероприятия: первая дата, число дат и отформатированный список
+EventDateSummary = namedtuple('EventDateSummary', ['first', 'count', 'formatted'])
+
+
+def format_date_range(start, end=None):
+    """Форматирует начало и (необязательно) конец в местном времени"""
+    def fmt(value):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+        return value.strftime('%d.%m.%Y %H:%M')
+
+    if end:
+        return f"{fmt(start)} — {fmt(end)}"
+    return fmt(start)
+
+
+class EventQuerySet(models.QuerySet):
+    def with_date_summary(self):
+        """Подгружает даты одним запросом в порядке начала, чтобы сводка не делала запросов"""
+        return self.prefetch_related(
+            Prefetch('event_dates', queryset=EventDate.objects.order_by('start'))
+        )
+
+    def active_between(self, first_day=None, last_day=None):
+        """Мероприятия, идущие хотя бы в один день из [first_day, last_day].
+
+        Границы — даты (местное время), любая из них может быть опущена.
+        Запрос идёт по индексу таблицы дней event_day.
+        """
+        days = EventDay.objects.all()
+        if first_day:
+            days = days.filter(day__gte=first_day)
+        if last_day:
+            days = days.filter(day__lte=last_day)
+        return self.filter(id__in=days.values('event_id'))
+
+
+class EventDateQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        """Даты мероприятий, пересекающиеся с интервалом [start, end].
+
+        Кандидаты отбираются по индексу дней event_day, затем проверяется
+        точное пересечение; дата без окончания считается точкой.
+        """
+        first_day = timezone.localdate(start)
+        last_day = timezone.localdate(end)
+        candidates = EventDay.objects.filter(day__gte=first_day, day__lte=last_day).values('event_id')
+        return self.filter(event_id__in=candidates, start__lte=end).filter(
+            Q(end__gte=start) | Q(end__isnull=True, start__gte=start)
+        )
+
+
 class Event(models.Model):
     name = models.TextField(null=True, blank=True)
     date = models.DateTimeField(null=True, blank=True)
@@ -17,46 +73,65 @@ class Event(models.Model):
     responsible = models.CharField(max_length=255, null=True, blank=True)
     comment = models.TextField(null=True, blank=True)
 
+    objects = EventQuerySet.as_manager()
+
     class Meta:
         db_table = 'event'
         managed = False
 
+    @cached_property
+    def date_summary(self):
+        """Сводка по датам из EventDate.
+
+        Использует даты, подгруженные через prefetch_related, а без них
+        делает один запрос на все методы ниже.
+        """
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('event_dates')
+        if prefetched is not None:
+            dates = sorted(prefetched, key=lambda ed: ed.start)
+        else:
+            dates = list(self.event_dates.order_by('start'))
+
+        return EventDateSummary(
+            first=dates[0] if dates else None,
+            count=len(dates),
+            formatted=[format_date_range(ed.start, ed.end) for ed in dates],
+        )
+
     def get_formatted_dates(self):
         """Возвращает список всех отформатированных дат из EventDate"""
-        dates = []
-        for ed in self.event_dates.all().order_by('start'):
-            if ed.end:
-                dates.append(f"{ed.start.strftime('%d.%m.%Y %H:%M')} — {ed.end.strftime('%d.%m.%Y %H:%M')}")
-            else:
-                dates.append(ed.start.strftime('%d.%m.%Y %H:%M'))
+        dates = list(self.date_summary.formatted)
 
         # Если нет дат в EventDate, пробуем из полей date/end_date
         if not dates and self.date:
-            if self.end_date:
-                dates.append(f"{self.date.strftime('%d.%m.%Y %H:%M')} — {self.end_date.strftime('%d.%m.%Y %H:%M')}")
-            else:
-                dates.append(self.date.strftime('%d.%m.%Y %H:%M'))
+            dates.append(format_date_range(self.date, self.end_date))
         return dates
 
     def get_first_formatted_date(self):
         """Возвращает первую отформатированную дату"""
-        first = self.event_dates.order_by('start').first()
-        if first:
-            if first.end:
-                return f"{first.start.strftime('%d.%m.%Y %H:%M')} — {first.end.strftime('%d.%m.%Y %H:%M')}"
-            return first.start.strftime('%d.%m.%Y %H:%M')
+        if self.date_summary.formatted:
+            return self.date_summary.formatted[0]
 
         # fallback на старые поля date/end_date
         if self.date:
-            if self.end_date:
-                return f"{self.date.strftime('%d.%m.%Y %H:%M')} — {self.end_date.strftime('%d.%m.%Y %H:%M')}"
-            return self.date.strftime('%d.%m.%Y %H:%M')
+            return format_date_range(self.date, self.end_date)
         return ""
 
+    def get_status(self):
+        """Возвращает статус мероприятия по отметке в комментарии"""
+        comment = self.comment or ''
+        if 'Опубликовано' in comment:
+            return 'Опубликовано'
+        if 'Одобрено' in comment:
+            return 'Одобрено'
+        if 'На согласовании' in comment:
+            return 'На согласовании'
+        return 'Черновик'
+
     @property
     def dates_count(self):
         """Возвращает количество дат"""
-        count = self.event_dates.count()
+        count = self.date_summary.count
         if count == 0 and self.date:
             return 1
         return count
@@ -67,11 +142,142 @@ class EventDate(models.Model):
     start = models.DateTimeField(verbose_name='Дата и время начала')
     end = models.DateTimeField(verbose_name='Дата и время окончания', null=True, blank=True)
 
+    objects = EventDateQuerySet.as_manager()
+
     class Meta:
         db_table = 'event_date'
         ordering = ['start']
         verbose_name = 'Дата мероприятия'
         verbose_name_plural = 'Даты мероприятий'
+        indexes = [
+            models.Index(fields=['start', 'end'], name='event_date_start_end_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.start} - {self.end}" if self.end else str(self.start)
+
+
+class EventDay(models.Model):
+    """День (местное время), в который идёт мероприятие.
+
+    Таблица — интервальный индекс: каждое мероприятие раскладывается на дни
+    своих дат EventDate (или полей date/end_date, если дат нет), так что
+    вопрос «что идёт между A и B» решается поиском по индексу ``day``.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, db_constraint=False, related_name='days')
+    day = models.DateField()
+
+    class Meta:
+        db_table = 'event_day'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'event'], name='event_day_day_event_uniq'),
+        ]
+
+
+class EventSearchToken(models.Model):
+    """Запись поискового индекса: основа слова из полей мероприятия и её вес"""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, db_constraint=False, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        db_table = 'event_search_token'
+        indexes = [
+            models.Index(fields=['token', 'event'], name='event_search_token_idx'),
+        ]
+
+
+class ExportJob(models.Model):
+    """Фоновая выгрузка в Excel: очередь для команды export_worker"""
+    KIND_PLAN = 'plan'
+    KIND_TABLE = 'table'
+    KIND_CHOICES = [
+        (KIND_PLAN, 'План мероприятий'),
+        (KIND_TABLE, 'Таблица мероприятий'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # Что выгружать: {'event_ids': [...]} или {'filter': {GET-параметры}}
+    params = models.JSONField(default=dict)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    file_path = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'export_job'
+        verbose_name = 'Выгрузка'
+        verbose_name_plural = 'Выгрузки'
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='export_job_status_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.start} - {self.end}" if self.end else str(self.start)
\ No newline at end of file
+        return f"{self.get_kind_display()} ({self.get_status_display()})"
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100 if self.status == self.STATUS_DONE else 0
+        return min(100, self.progress * 100 // self.total)
+
+
+class SelectionSnapshot(models.Model):
+    """Выбор мероприятий на сервере: фильтр плюс явные включения/исключения.
+
+    Браузер хранит только короткий токен и передаёт его в выгрузку или
+    массовое удаление вместо списка всех id.
+    """
+    token = models.CharField(max_length=32, unique=True)
+    # Все мероприятия, подходящие под фильтр (GET-параметры списка)
+    all_filtered = models.BooleanField(default=False)
+    filter_params = models.JSONField(default=dict)
+    include_ids = models.JSONField(default=list)
+    exclude_ids = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'selection_snapshot'
+        verbose_name = 'Выбор мероприятий'
+        verbose_name_plural = 'Выборы мероприятий'
+
+    def __str__(self):
+        return self.token
+
+
+class EventStat(models.Model):
+    """Сводка числа мероприятий по категории, подразделению и месяцу начала.
+
+    Каждое мероприятие учтено ровно в одной строке (месяц — по местному
+    времени поля date, без даты — NULL). Таблица поддерживается сигналами
+    записи мероприятий и пересобирается командой rebuild_event_stats.
+
+    Уникальный индекс по (month, category, department) не мешает двум
+    строкам с NULL, поэтому строку определяет ``key`` — те же три поля
+    без NULL (см. events.stats.stat_row_key).
+    """
+    key = models.CharField(max_length=40, unique=True)
+    category = models.ForeignKey(Category, models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    department = models.ForeignKey(Department, models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    month = models.DateField(null=True)
+    events = models.IntegerField(default=0)
+    events_with_end_date = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'event_stat'
@@ -0,0 +1,66 @@
+"""Поддержка интервального индекса event_day.
+
+Дни мероприятия берутся из его дат EventDate, а если их нет — из старых
+полей date/end_date. Каждый интервал раскладывается на местные календарные
+дни от начала до окончания включительно.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Event, EventDay
+
+
+# Ограничение на длину одного интервала: защищает индекс от ошибочных дат
+# окончания (например, на десять лет позже начала)
+MAX_SPAN_DAYS = 366
+
+REBUILD_BATCH_SIZE = 500
+
+
+def interval_days(start, end):
+    """Местные дни интервала от начала до окончания включительно"""
+    first = timezone.localdate(start)
+    last = timezone.localdate(end) if end else first
+    if last < first:
+        last = first
+    last = min(last, first + timedelta(days=MAX_SPAN_DAYS))
+
+    day = first
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def event_days(event):
+    """Множество дней, в которые идёт мероприятие"""
+    intervals = [(ed.start, ed.end) for ed in event.event_dates.all()]
+    if not intervals and event.date:
+        intervals = [(event.date, event.end_date)]
+
+    days = set()
+    for start, end in intervals:
+        days.update(interval_days(start, end))
+    return days
+
+
+def rebuild_event_days(event_ids):
+    """Пересобирает дни для мероприятий с указанными id"""
+    event_ids = list(event_ids)
+    if not event_ids:
+        return
+
+    events = Event.objects.filter(id__in=event_ids).with_date_summary()
+    rows = [EventDay(event_id=event.pk, day=day) for event in events for day in event_days(event)]
+    with transaction.atomic():
+        EventDay.objects.filter(event_id__in=event_ids).delete()
+        EventDay.objects.bulk_create(rows, batch_size=1000)
+
+
+def rebuild_all_event_days():
+    EventDay.objects.all().delete()
+    event_ids = list(Event.objects.order_by('id').values_list('id', flat=True))
+    for i in range(0, len(event_ids), REBUILD_BATCH_SIZE):
+        rebuild_event_days(event_ids[i:i + REBUILD_BATCH_SIZE])
+    return len(event_ids)
@@ -0,0 +1,167 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .counts import get_total_events
+from .models import Event
+
+
+class CountedPaginator(Paginator):
+    """Paginator, которому число строк передано заранее — свой COUNT он не делает."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+
+class AnnotatedListPaginator(Paginator):
+    """Paginator для списков с аннотациями-подзапросами: COUNT считается
+    по одним первичным ключам, не вычисляя аннотации для каждой строки."""
+
+    @cached_property
+    def count(self):
+        return self.object_list.values('pk').count()
+
+
+class EventAdminPaginator(Paginator):
+    """Paginator списка мероприятий в админке: без фильтров и поиска число
+    строк берётся из поддерживаемого счётчика вместо COUNT по таблице."""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where and self.object_list.model is Event:
+            return get_total_events()
+        return super().count
+
+
+class KeysetPage:
+    """Страница, полученная поиском по ключу сортировки (без OFFSET и COUNT)."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Курсорная пагинация по упорядоченному queryset.
+
+    ``ordering`` должен однозначно задавать порядок строк, поэтому последним
+    полем всегда идёт первичный ключ. Курсор — непрозрачная строка со
+    значениями ключа сортировки граничной строки и направлением перехода.
+    Стоимость любой страницы одинакова: индексный поиск и LIMIT.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        if self.ordering[-1].lstrip('-') not in ('id', 'pk'):
+            self.ordering.append('id')
+        self.per_page = per_page
+        self._fields = [name.lstrip('-') for name in self.ordering]
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по курсору; некорректный курсор даёт первую страницу."""
+        decoded = self._decode(cursor) if cursor else None
+        if decoded is None:
+            return self._build(self.queryset.order_by(*self.ordering), is_first=True)
+
+        values, backwards = decoded
+        ordering = self._reversed() if backwards else self.ordering
+        queryset = self.queryset.filter(self._seek(ordering, values)).order_by(*ordering)
+        return self._build(queryset, backwards=backwards)
+
+    def _build(self, queryset, is_first=False, backwards=False):
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = not is_first, has_more
+
+        next_cursor = self._encode(rows[-1], False) if rows and has_next else None
+        previous_cursor = self._encode(rows[0], True) if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def _reversed(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    @staticmethod
+    def _seek(ordering, values):
+        """Условие «строка идёт после курсора» для заданной сортировки.
+
+        NULL в MySQL/MariaDB и SQLite меньше любого значения: при сортировке
+        по возрастанию такие строки идут первыми, по убыванию — последними.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for name, value in zip(ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-')
+
+            if descending:
+                after = (Q(**{f'{field}__lt': value}) | Q(**{f'{field}__isnull': True})) if value is not None else None
+            else:
+                after = Q(**{f'{field}__gt': value}) if value is not None else Q(**{f'{field}__isnull': False})
+
+            if after is not None:
+                condition |= equal & after
+            equal &= Q(**{f'{field}__isnull': True}) if value is None else Q(**{field: value})
+        return condition
+
+    def _encode(self, obj, backwards):
+        values = []
+        for field in self._fields:
+            # Строки queryset.values() — словари
+            if isinstance(obj, dict):
+                value = obj[field]
+            else:
+                value = getattr(obj, 'pk' if field == 'pk' else field)
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        raw = json.dumps({'k': values, 'b': int(backwards)}, ensure_ascii=False).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def _decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            data = json.loads(raw.decode('utf-8'))
+            values = data['k']
+            if len(values) != len(self._fields):
+                return None
+
+            # Каждое значение приводится к типу поля: подделанный курсор
+            # (строка вместо id, мусор вместо даты) даёт первую страницу,
+            # а не ошибку в запросе
+            model_meta = self.queryset.model._meta
+            for i, field in enumerate(self._fields):
+                model_field = model_meta.pk if field == 'pk' else model_meta.get_field(field)
+                if values[i] is not None:
+                    values[i] = model_field.to_python(values[i])
+            return values, bool(data.get('b'))
+        except (ValidationError, ValueError, TypeError, KeyError, AttributeError):
+            return None
@@ -0,0 +1,206 @@
+"""Профилирование запросов: заголовок Server-Timing и выборочный журнал.
+
+ServerTimingMiddleware на время запроса оборачивает выполнение SQL
+(connection.execute_wrapper) и собирает число и время запросов. Отрезки
+работы — рендер шаблонов (бэкенд ProfiledDjangoTemplates) и построение
+книг Excel (profile_span('xlsx')) — считаются без SQL, выполненного
+внутри них, так что в заголовке
+
+    Server-Timing: sql;dur=..;desc="N queries", tpl;dur=.., xlsx;dur=.., view;dur=.., total;dur=..
+
+части складываются в total: view — остальной Python (представление и
+промежуточные слои). Заголовок отдаётся только при DEBUG или сотрудникам
+(is_staff). Доля SERVER_TIMING_SAMPLE_RATE запросов пишется в
+журнал events.profiling строкой JSON; запросы дольше
+SERVER_TIMING_SLOW_MS пишутся всегда, вместе с текстом и временем их SQL.
+
+Накладные расходы — вызов обёртки и perf_counter на каждый SQL-запрос и
+отрезок; параметры запросов не форматируются, текст SQL сохраняется
+ссылкой, поэтому слой можно держать включённым в рабочем режиме.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+
+logger = logging.getLogger('events.profiling')
+
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_SLOW_MS = 1000
+# Сколько SQL-запросов одного HTTP-запроса хранить для журнала
+DEFAULT_SQL_LIMIT = 200
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self, sql_limit=DEFAULT_SQL_LIMIT):
+        self.started = time.perf_counter()
+        self.sql_limit = sql_limit
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = []
+        self.spans = {}
+        self._span = None
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += duration
+            if len(self.statements) < self.sql_limit:
+                self.statements.append((duration, sql))
+
+    @contextmanager
+    def span(self, name):
+        # Вложенные отрезки (include через render_to_string и т. п.)
+        # входят во внешний
+        if self._span is not None:
+            yield
+            return
+        self._span = name
+        started = time.perf_counter()
+        sql_before = self.sql_time
+        try:
+            yield
+        finally:
+            own = time.perf_counter() - started - (self.sql_time - sql_before)
+            self.spans[name] = self.spans.get(name, 0.0) + own
+            self._span = None
+
+    def timings(self, total=None):
+        """{имя: миллисекунды}; view — всё, что не SQL и не отрезки"""
+        if total is None:
+            total = time.perf_counter() - self.started
+        timings = {'sql': self.sql_time, **self.spans}
+        timings['view'] = max(total - sum(timings.values()), 0.0)
+        timings['total'] = total
+        return {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+
+    def server_timing(self):
+        parts = []
+        for name, ms in self.timings().items():
+            desc = f';desc="{self.queries} queries"' if name == 'sql' else ''
+            parts.append(f'{name};dur={ms}{desc}')
+        return ', '.join(parts)
+
+    def record(self, request, response, total=None):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': self.queries,
+            **{f'{name}_ms': ms for name, ms in self.timings(total).items()},
+        }
+
+    def slow_details(self):
+        """Самые долгие запросы и повторы одного текста SQL (признак N+1)"""
+        slowest = sorted(self.statements, key=lambda statement: statement[0], reverse=True)
+        repeated = Counter(sql for _, sql in self.statements)
+        return {
+            'sql': [{'ms': round(duration * 1000, 2), 'sql': sql} for duration, sql in slowest],
+            'repeated_sql': [{'count': count, 'sql': sql} for sql, count in repeated.most_common(5) if count > 1],
+            'sql_truncated': self.queries > len(self.statements),
+        }
+
+    @contextmanager
+    def capture_sql(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.execute))
+            yield
+
+
+@contextmanager
+def profile_span(name):
+    """Отрезок текущего запроса в Server-Timing; вне запроса ничего не делает"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    with profile.span(name):
+        yield
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with profile_span('tpl'):
+            return super().render(context, request)
+
+
+class ProfiledDjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд DjangoTemplates, отмечающий рендер отрезком tpl"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+        self.slow_ms = getattr(settings, 'SERVER_TIMING_SLOW_MS', DEFAULT_SLOW_MS)
+        self.sql_limit = getattr(settings, 'SERVER_TIMING_SQL_LIMIT', DEFAULT_SQL_LIMIT)
+
+    def __call__(self, request):
+        profile = RequestProfile(self.sql_limit)
+        token = _current.set(profile)
+        try:
+            with profile.capture_sql():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if self._show_timing(request):
+            response['Server-Timing'] = profile.server_timing()
+        # Тело потокового ответа (кроме файлов) строится уже после
+        # возврата: его SQL и время попадают в журнал по окончании потока
+        if response.streaming and getattr(response, 'file_to_stream', None) is None:
+            response.streaming_content = self._stream(profile, request, response, response.streaming_content)
+        else:
+            self._log(profile, request, response)
+        return response
+
+    @staticmethod
+    def _show_timing(request):
+        # Заголовок раскрывает устройство запросов, поэтому виден только при
+        # отладке и сотрудникам; журнал пишется для всех запросов.
+        # request.user появляется позже, в AuthenticationMiddleware
+        if settings.DEBUG:
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_staff)
+
+    def _stream(self, profile, request, response, content):
+        try:
+            with profile.capture_sql(), profile.span('stream'):
+                yield from content
+        finally:
+            self._log(profile, request, response)
+
+    def _log(self, profile, request, response):
+        total = time.perf_counter() - profile.started
+        if self.slow_ms is not None and total * 1000 >= self.slow_ms:
+            record = profile.record(request, response, total)
+            record.update(profile.slow_details())
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        elif self.sample_rate and random.random() < self.sample_rate:
+            logger.info(json.dumps(profile.record(request, response, total), ensure_ascii=False))
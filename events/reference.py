@@ -0,0 +1,121 @@
+"""Кэш справочников: категории, подразделения и пользователи.
+
+Таблицы маленькие и меняются редко, а читаются почти в каждом запросе,
+экспорте и карточке админки. Данные хранятся в общем кэше под версией,
+которую сбрасывают сигналы сохранения/удаления. Каждый процесс держит свою
+копию и при обращении сверяет только версию — один быстрый запрос к кэшу
+вместо запросов к базе.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from categories.models import Category
+from departments.models import Department
+from users.models import User
+
+
+REFERENCE_VERSION_KEY = 'reference:version'
+# Номер формата в ключе: после изменения ReferenceData старые объекты из
+# кэша не используются
+REFERENCE_DATA_KEY = 'reference:data:2:%s'
+REFERENCE_DATA_TIMEOUT = 60 * 60 * 24
+
+# Элемент списка для <select>: в шаблонах доступны option.id и option.name
+Option = namedtuple('Option', ['id', 'name'])
+
+
+def _option_sort_key(option):
+    return (option.name or '').strip().lower()
+
+
+def _name_key(name):
+    return ' '.join(str(name or '').split()).lower().replace('ё', 'е')
+
+
+def _ids_by_name(names):
+    ids = {}
+    for pk, name in sorted(names.items()):
+        # При одинаковых названиях берётся запись с меньшим id
+        ids.setdefault(_name_key(name), pk)
+    return ids
+
+
+class ReferenceData:
+    def __init__(self, categories, departments, users):
+        self.categories = sorted((Option(*row) for row in categories), key=_option_sort_key)
+        self.departments = sorted((Option(*row) for row in departments), key=_option_sort_key)
+        self.category_names = {option.id: option.name for option in self.categories}
+        self.department_names = {option.id: option.name for option in self.departments}
+        self.user_names = {pk: displayname or name or f'User #{pk}' for pk, displayname, name in users}
+
+        # Обратные словари для импорта: название (без регистра) -> id
+        self.category_ids = _ids_by_name(self.category_names)
+        self.department_ids = _ids_by_name(self.department_names)
+        self.user_ids = _ids_by_name(self.user_names)
+
+    def category_name(self, category_id, default=''):
+        return self.category_names.get(category_id, default)
+
+    def department_name(self, department_id, default=''):
+        return self.department_names.get(department_id, default)
+
+    def user_name(self, user_id, default=''):
+        return self.user_names.get(user_id, default)
+
+    def find_category(self, name):
+        return self.category_ids.get(_name_key(name))
+
+    def find_department(self, name):
+        return self.department_ids.get(_name_key(name))
+
+    def find_user(self, name):
+        return self.user_ids.get(_name_key(name))
+
+
+_local = threading.local()
+
+
+def _load():
+    return ReferenceData(
+        categories=list(Category.objects.values_list('id', 'name')),
+        departments=list(Department.objects.values_list('id', 'name')),
+        users=list(User.objects.values_list('id', 'displayname', 'name')),
+    )
+
+
+def get_reference_version():
+    version = cache.get(REFERENCE_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(REFERENCE_VERSION_KEY, version, None):
+            version = cache.get(REFERENCE_VERSION_KEY, version)
+    return version
+
+
+def get_reference_data():
+    """Возвращает актуальные справочники (из памяти процесса, кэша или базы)"""
+    version = get_reference_version()
+    if getattr(_local, 'version', None) == version:
+        return _local.data
+
+    data = cache.get(REFERENCE_DATA_KEY % version)
+    if data is None:
+        data = _load()
+        cache.set(REFERENCE_DATA_KEY % version, data, REFERENCE_DATA_TIMEOUT)
+
+    _local.version = version
+    _local.data = data
+    return data
+
+
+def bump_reference_version():
+    """Меняет версию справочников после фиксации текущей транзакции.
+
+    Иначе другой запрос успеет прочитать старые названия и сохранить их
+    в кэше под новой версией.
+    """
+    transaction.on_commit(lambda: cache.set(REFERENCE_VERSION_KEY, time.time_ns(), None))
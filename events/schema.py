@@ -0,0 +1,122 @@
+"""Индексы, на которые рассчитаны запросы списка, выборки id и выгрузки.
+
+Таблица event перенесена из старой базы (managed = False), и миграции её
+индексами не управляют: в дампе есть только индексы внешних ключей.
+Команда ``ensure_indexes`` сверяет набор ниже с фактическими индексами
+(через интроспекцию Django), создаёт недостающие и проверяет планы
+основных запросов через EXPLAIN: полный проход по таблице считается
+регрессией.
+"""
+import re
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from .filters import EventFilter
+from .models import Event, EventDate
+
+
+# Индекс: модель, имя и поля модели в порядке столбцов индекса
+IndexSpec = namedtuple('IndexSpec', ['model', 'name', 'fields'])
+
+REQUIRED_INDEXES = [
+    # Сортировка списка и фильтр по месяцу/году
+    IndexSpec(Event, 'event_date_idx', ['date']),
+    IndexSpec(Event, 'event_end_date_idx', ['end_date']),
+    # Фильтр по категории или подразделению вместе с периодом
+    IndexSpec(Event, 'event_category_date_idx', ['category', 'date']),
+    IndexSpec(Event, 'event_department_date_idx', ['department', 'date']),
+    # Даты мероприятий по порядку (prefetch в списке и выгрузке)
+    IndexSpec(EventDate, 'event_date_event_start_idx', ['event', 'start']),
+]
+
+
+def index_columns(spec):
+    return [spec.model._meta.get_field(field).column for field in spec.fields]
+
+
+def existing_indexes(table):
+    """Списки столбцов всех индексов таблицы (включая первичный ключ)"""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [info['columns'] for info in constraints.values()
+            if (info['index'] or info['unique'] or info['primary_key']) and info['columns']]
+
+
+def is_covered(spec, indexes):
+    """Есть ли индекс, начинающийся с нужных столбцов"""
+    columns = index_columns(spec)
+    return any(index[:len(columns)] == columns for index in indexes)
+
+
+def missing_indexes():
+    indexes = {}
+    missing = []
+    for spec in REQUIRED_INDEXES:
+        table = spec.model._meta.db_table
+        if table not in indexes:
+            indexes[table] = existing_indexes(table)
+        if not is_covered(spec, indexes[table]):
+            missing.append(spec)
+    return missing
+
+
+def create_index_sql(spec):
+    quote = connection.ops.quote_name
+    table = quote(spec.model._meta.db_table)
+    columns = ', '.join(quote(column) for column in index_columns(spec))
+    if connection.vendor == 'mysql':
+        # Без блокировки записи: таблица event рабочая
+        return f'ALTER TABLE {table} ADD INDEX {quote(spec.name)} ({columns}), ALGORITHM=INPLACE, LOCK=NONE'
+    return f'CREATE INDEX {quote(spec.name)} ON {table} ({columns})'
+
+
+def create_index(spec):
+    with connection.cursor() as cursor:
+        cursor.execute(create_index_sql(spec))
+
+
+def canonical_queries():
+    """Основные запросы представлений: (описание, queryset)"""
+    today = timezone.localdate()
+    category_id = Event.objects.exclude(category=None).values_list('category_id', flat=True).first() or 0
+    department_id = Event.objects.exclude(department=None).values_list('department_id', flat=True).first() or 0
+    month = {'month': today.month, 'year': today.year}
+    window = {'start_date': today.isoformat(), 'end_date': (today + timedelta(days=30)).isoformat()}
+    event_ids = list(Event.objects.order_by('-id').values_list('id', flat=True)[:20])
+
+    return [
+        ('events_ui: месяц', EventFilter(month).filter().order_by('-date', 'name', 'id')[:21]),
+        ('events_ui: категория и месяц',
+         EventFilter({'category': category_id, **month}).filter().order_by('-date', 'name', 'id')[:21]),
+        ('events_ui: подразделение и месяц',
+         EventFilter({'department': department_id, **month}).filter().order_by('-date', 'name', 'id')[:21]),
+        ('events_ui: период', EventFilter(window).filter().order_by('-date', 'name', 'id')[:21]),
+        ('get_filtered_event_ids: категория', EventFilter({'category': category_id}).filter().values_list('id')),
+        ('get_filtered_event_ids: месяц', EventFilter(month).filter().values_list('id')),
+        ('выгрузка: даты мероприятий', EventDate.objects.filter(event_id__in=event_ids).order_by('event_id', 'start')),
+    ]
+
+
+# SQLite: «SCAN event» — полный проход; «SCAN event USING INDEX» — проход
+# по индексу (например, ради сортировки), его полным проходом не считаем
+_SQLITE_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\S+)$')
+
+
+def full_scans(queryset):
+    """Таблицы, которые план запроса читает целиком"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            details = [row[-1] for row in cursor.fetchall()]
+            return [match.group(1) for match in map(_SQLITE_SCAN.match, details) if match]
+
+        cursor.execute('EXPLAIN ' + sql, params)
+        columns = [column[0] for column in cursor.description]
+        plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    # В MySQL/MariaDB type = ALL — полный проход; производные таблицы
+    # (<derived2>, <subquery3>) строятся из уже проверенных строк
+    return [row['table'] for row in plan if row.get('type') == 'ALL' and not str(row.get('table')).startswith('<')]
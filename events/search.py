@@ -0,0 +1,209 @@
+"""Полнотекстовый поиск мероприятий по собственному инвертированному индексу.
+
+Каждое мероприятие раскладывается на нормализованные основы слов (нижний
+регистр, ё → е, русский стеммер Snowball), которые хранятся в таблице
+``event_search_token`` с весом поля. Поиск по терминам превращается в
+индексный поиск по префиксу основы вместо ``icontains`` по TEXT-колонкам.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+
+from .models import Event, EventSearchToken
+
+
+# Вес совпадения в зависимости от поля
+FIELD_WEIGHTS = (
+    ('name', 4),
+    ('place', 2),
+    ('responsible', 2),
+    ('comment', 1),
+)
+TAXONOMY_WEIGHT = 1
+
+TOKEN_MAX_LENGTH = 64
+REINDEX_BATCH_SIZE = 500
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# ---------- Русский стеммер (Snowball) ----------
+
+_VOWELS = 'аеиоуыэюя'
+
+_PERFECTIVE_GERUND = (('вшись', 'вши', 'в'), ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'))
+_ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+_PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+_REFLEXIVE = ('ся', 'сь')
+_VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+     'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+_NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+    'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+_DERIVATIONAL = ('ост', 'ость')
+_SUPERLATIVE = ('ейш', 'ейше')
+
+
+def _region_after_vowel_consonant(word, start):
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, limit, endings, after_a_ya=()):
+    """Удаляет самое длинное окончание, лежащее в регионе ``word[limit:]``.
+
+    Окончания из ``after_a_ya`` засчитываются, только если перед ними стоит
+    «а» или «я». Возвращает новое слово или None, если окончание не найдено.
+    """
+    candidates = [(e, False) for e in endings] + [(e, True) for e in after_a_ya]
+    candidates.sort(key=lambda item: len(item[0]), reverse=True)
+    for ending, needs_a_ya in candidates:
+        cut = len(word) - len(ending)
+        if cut < limit or not word.endswith(ending):
+            continue
+        if needs_a_ya and (cut - 1 < limit or word[cut - 1] not in 'ая'):
+            return None
+        return word[:cut]
+    return None
+
+
+def stem(word):
+    """Возвращает основу русского слова; прочие слова возвращаются как есть."""
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+    if rv >= len(word):
+        return word
+    r2 = _region_after_vowel_consonant(word, _region_after_vowel_consonant(word, 0))
+
+    # Шаг 1
+    result = _strip(word, rv, _PERFECTIVE_GERUND[1], _PERFECTIVE_GERUND[0])
+    if result is None:
+        word = _strip(word, rv, _REFLEXIVE) or word
+        result = _strip(word, rv, _ADJECTIVE)
+        if result is not None:
+            result = _strip(result, rv, _PARTICIPLE[1], _PARTICIPLE[0]) or result
+        else:
+            result = _strip(word, rv, _VERB[1], _VERB[0])
+            if result is None:
+                result = _strip(word, rv, _NOUN)
+    word = result if result is not None else word
+
+    # Шаг 2
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3
+    word = _strip(word, r2, _DERIVATIONAL) or word
+
+    # Шаг 4
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        return word[:-1]
+    superlative = _strip(word, rv, _SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+        return word[:-1] if word.endswith('нн') else word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+def normalize(text):
+    """Разбивает текст на нормализованные основы слов."""
+    if not text:
+        return []
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return [stem(word)[:TOKEN_MAX_LENGTH] for word in words]
+
+
+# ---------- Индексация ----------
+
+def _event_tokens(event):
+    tokens = {}
+    for field, weight in FIELD_WEIGHTS:
+        for token in normalize(getattr(event, field)):
+            tokens[token] = max(tokens.get(token, 0), weight)
+
+    for related in (event.category, event.department):
+        for token in normalize(getattr(related, 'name', None)):
+            tokens[token] = max(tokens.get(token, 0), TAXONOMY_WEIGHT)
+    return tokens
+
+
+def index_events(events):
+    """Перестраивает записи индекса для переданных мероприятий."""
+    events = list(events)
+    if not events:
+        return
+
+    rows = [
+        EventSearchToken(event_id=event.pk, token=token, weight=weight)
+        for event in events
+        for token, weight in _event_tokens(event).items()
+    ]
+    with transaction.atomic():
+        EventSearchToken.objects.filter(event_id__in=[event.pk for event in events]).delete()
+        EventSearchToken.objects.bulk_create(rows, batch_size=1000)
+
+
+def reindex_queryset(queryset):
+    """Индексирует мероприятия из queryset пачками, не держа их все в памяти."""
+    batch = []
+    count = 0
+    for event in queryset.select_related('category', 'department').iterator(chunk_size=REINDEX_BATCH_SIZE):
+        batch.append(event)
+        if len(batch) >= REINDEX_BATCH_SIZE:
+            index_events(batch)
+            count += len(batch)
+            batch = []
+    index_events(batch)
+    return count + len(batch)
+
+
+def rebuild_index():
+    EventSearchToken.objects.all().delete()
+    return reindex_queryset(Event.objects.all())
+
+
+# ---------- Поиск ----------
+
+def _terms_q(query):
+    terms = dict.fromkeys(normalize(query))
+    if not terms:
+        return None
+    condition = Q()
+    for term in terms:
+        condition |= Q(token__startswith=term)
+    return condition
+
+
+def search_events(events, query, ranked=False):
+    """Оставляет в queryset мероприятия, совпавшие хотя бы с одним термином.
+
+    При ``ranked=True`` добавляет аннотацию ``search_rank`` — сумму весов
+    совпавших основ.
+    """
+    condition = _terms_q(query)
+    if condition is None:
+        return events
+
+    matches = EventSearchToken.objects.filter(condition)
+    events = events.filter(id__in=matches.values('event_id'))
+    if ranked:
+        rank = (
+            matches.filter(event_id=OuterRef('pk'))
+            .order_by()
+            .values('event_id')
+            .annotate(rank=Sum('weight'))
+            .values('rank')
+        )
+        events = events.annotate(search_rank=Subquery(rank[:1]))
+    return events
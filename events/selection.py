@@ -0,0 +1,77 @@
+"""Выбор мероприятий, сохранённый на сервере.
+
+«Выбрать все» больше не гоняет через браузер список всех подходящих id:
+сервер сохраняет фильтр и явные включения/исключения, а клиенту отдаёт
+токен. Выгрузка и массовое удаление принимают токен и строят выборку
+подзапросом, так что размер запроса не зависит от числа мероприятий.
+"""
+import secrets
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .filters import EventFilter
+from .models import Event, SelectionSnapshot
+
+
+# Сколько живёт сохранённый выбор
+SELECTION_MAX_AGE = timedelta(days=1)
+
+
+SELECTION_EXPIRED_MESSAGE = 'Выбор устарел, выберите мероприятия заново'
+
+
+class SelectionExpired(ValueError):
+    """Токен выбора неизвестен или устарел"""
+
+
+def parse_ids(values):
+    """Список id из значений формы; допускаются значения через запятую"""
+    return [int(part) for value in values for part in str(value).split(',') if part.strip()]
+
+
+def create_selection(filter_params=None, all_filtered=False, include_ids=(), exclude_ids=()):
+    SelectionSnapshot.objects.filter(created_at__lt=timezone.now() - SELECTION_MAX_AGE).delete()
+
+    event_filter = EventFilter(filter_params or {})
+    return SelectionSnapshot.objects.create(
+        token=secrets.token_urlsafe(16),
+        all_filtered=all_filtered,
+        filter_params={key: value for key, value in event_filter.as_dict().items() if value},
+        include_ids=sorted(set(include_ids)),
+        exclude_ids=sorted(set(exclude_ids)),
+    )
+
+
+def get_selection(token):
+    return SelectionSnapshot.objects.filter(
+        token=token, created_at__gte=timezone.now() - SELECTION_MAX_AGE,
+    ).first()
+
+
+def selection_events(snapshot):
+    """Мероприятия выбора: (фильтр − исключения) ∪ включения"""
+    condition = Q(id__in=snapshot.include_ids)
+    if snapshot.all_filtered:
+        filtered = EventFilter(snapshot.filter_params).filter().values('id')
+        condition |= Q(id__in=filtered) & ~Q(id__in=snapshot.exclude_ids)
+    return Event.objects.filter(condition)
+
+
+def selected_events(data):
+    """Мероприятия из POST-данных: по токену ``selection`` или списку
+    ``selected_events``. None — выбор не передан. SelectionExpired —
+    токен устарел, ValueError — некорректный список id.
+    """
+    token = data.get('selection')
+    if token:
+        snapshot = get_selection(token)
+        if snapshot is None:
+            raise SelectionExpired(SELECTION_EXPIRED_MESSAGE)
+        return selection_events(snapshot)
+
+    event_ids = parse_ids(data.getlist('selected_events'))
+    if not event_ids:
+        return None
+    return Event.objects.filter(id__in=event_ids)
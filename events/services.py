@@ -0,0 +1,134 @@
+"""Запись мероприятия вместе с его датами.
+
+Даты из формы (``dates_json``) разбираются и проверяются до записи.
+Затем в одной транзакции мероприятие сохраняется один раз, а даты
+приводятся к новому списку по разнице со старыми: совпадающие остаются,
+изменённые обновляются одним bulk_update, лишние удаляются одним
+запросом, новые добавляются одним bulk_create. Сигналы сохранения на
+время записи отложены; кэши, поиск и дни обновляются один раз в конце.
+
+Удаление пачки мероприятий так же откладывает сигналы и обновляет
+сводку, версии и счётчик один раз на всю пачку.
+"""
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Event, EventDate
+from .signals import deferred_event_signals, refresh_deleted_events, refresh_event
+
+
+DATE_INPUT_FORMAT = '%Y-%m-%dT%H:%M'
+
+
+def _parse_datetime(value):
+    return timezone.make_aware(datetime.strptime(value, DATE_INPUT_FORMAT))
+
+
+def _format_datetime(value):
+    return timezone.localtime(value).strftime(DATE_INPUT_FORMAT)
+
+
+def event_dates_for_form(event):
+    """Даты мероприятия для формы, в местном времени — в том же виде,
+    в каком их возвращает parse_event_dates"""
+    return [
+        {'start': _format_datetime(ed.start), 'end': _format_datetime(ed.end) if ed.end else ''}
+        for ed in event.event_dates.all()
+    ]
+
+
+def parse_event_dates(dates_json):
+    """Список пар (начало, окончание) из JSON формы.
+
+    Окончание может отсутствовать. При ошибке — ValidationError с
+    номером даты, чтобы показать её в форме.
+    """
+    try:
+        items = json.loads(dates_json or '[]')
+    except ValueError:
+        raise ValidationError('Не удалось прочитать список дат')
+    if not isinstance(items, list):
+        raise ValidationError('Не удалось прочитать список дат')
+
+    dates = []
+    for number, item in enumerate(items, 1):
+        try:
+            start = _parse_datetime(item['start'])
+            end = _parse_datetime(item['end']) if item.get('end') else None
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValidationError(f'Дата №{number}: неверный формат')
+        if end is not None and end < start:
+            raise ValidationError(f'Дата №{number}: окончание раньше начала')
+        dates.append((start, end))
+    return dates
+
+
+def clean_comment(comment):
+    """Убирает из комментария старый текстовый список дат"""
+    comment = comment or ''
+    if "ДАТЫ:" in comment:
+        comment = comment.split("\n\nДАТЫ:")[0].strip()
+    return comment
+
+
+def _sync_event_dates(event, dates, existing):
+    """Приводит даты мероприятия к списку ``dates`` минимумом запросов"""
+    unmatched = list(dates)
+    leftover = []
+    for event_date in existing:
+        key = (event_date.start, event_date.end)
+        if key in unmatched:
+            unmatched.remove(key)
+        else:
+            leftover.append(event_date)
+
+    # Изменённые даты переиспользуют старые строки
+    changed = []
+    for event_date, (start, end) in zip(leftover, unmatched):
+        event_date.start, event_date.end = start, end
+        changed.append(event_date)
+    if changed:
+        EventDate.objects.bulk_update(changed, ['start', 'end'])
+
+    removed = leftover[len(changed):]
+    if removed:
+        EventDate.objects.filter(id__in=[event_date.id for event_date in removed]).delete()
+
+    added = unmatched[len(changed):]
+    if added:
+        EventDate.objects.bulk_create([EventDate(event=event, start=start, end=end) for start, end in added])
+
+
+def save_event(event, dates, comment):
+    """Сохраняет мероприятие и его даты в одной транзакции.
+
+    Первая дата копируется в старые поля date/end_date для обратной
+    совместимости, как и раньше.
+    """
+    created = event.pk is None
+    if dates:
+        event.date = dates[0][0]
+        if dates[0][1]:
+            event.end_date = dates[0][1]
+    event.comment = clean_comment(comment)
+
+    with transaction.atomic(), deferred_event_signals():
+        existing = [] if created else list(event.event_dates.all())
+        event.save()
+        _sync_event_dates(event, dates, existing)
+        refresh_event(event, created=created)
+    return event
+
+
+def delete_events(events):
+    """Удаляет мероприятия выборки ``events``; возвращает их число"""
+    with transaction.atomic(), deferred_event_signals():
+        deleted = list(events.only('id', 'category_id', 'department_id', 'date', 'end_date'))
+        if deleted:
+            Event.objects.filter(id__in=[event.pk for event in deleted]).delete()
+            refresh_deleted_events(deleted)
+    return len(deleted)
@@ -0,0 +1,119 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from categories.models import Category
+from departments.models import Department
+from users.models import User
+
+from .cache import bump_data_version, bump_event_version, bump_event_versions
+from .counts import adjust_total_events
+from .models import Event, EventDate
+from .occurrences import rebuild_event_days
+from .reference import bump_reference_version
+from .search import index_events, reindex_queryset
+from .stats import apply_stat_changes, event_stat_key, record_event_change, stored_stat_key
+
+
+# Пока флаг установлен, сигналы Event/EventDate не обрабатываются: сервис
+# записи сам вызывает refresh_event один раз после всех изменений
+_deferred = ContextVar('deferred_event_signals', default=False)
+
+
+@contextmanager
+def deferred_event_signals():
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def refresh_event(event, created=False):
+    """Обновляет всё, что зависит от мероприятия: версии, счётчик, поиск и дни"""
+    bump_event_version(event.pk)
+    bump_data_version()
+    if created:
+        adjust_total_events(1)
+    new_key = event_stat_key(event)
+    record_event_change(None if created else getattr(event, '_stat_key', None), new_key)
+    event._stat_key = new_key
+    index_events([event])
+    rebuild_event_days([event.pk])
+
+
+def refresh_deleted_events(events):
+    """То же для пачки удалённых мероприятий: одно изменение сводки и версий"""
+    bump_event_versions([event.pk for event in events])
+    bump_data_version()
+    adjust_total_events(-len(events))
+    changes = Counter()
+    for event in events:
+        changes[event_stat_key(event)] -= 1
+    apply_stat_changes(changes)
+
+
+@receiver(pre_save, sender=Event)
+def event_saving(sender, instance, **kwargs):
+    # Строка сводки до изменения; срабатывает и при отложенных сигналах
+    instance._stat_key = stored_stat_key(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, **kwargs):
+    if not _deferred.get():
+        refresh_event(instance, created=created)
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    if _deferred.get():
+        return
+    bump_event_version(instance.pk)
+    bump_data_version()
+    adjust_total_events(-1)
+    record_event_change(event_stat_key(instance), None)
+
+
+@receiver(post_save, sender=EventDate)
+@receiver(post_delete, sender=EventDate)
+def event_date_changed(sender, instance, origin=None, **kwargs):
+    if _deferred.get():
+        return
+    bump_event_version(instance.event_id)
+    bump_data_version()
+    # При удалении самого мероприятия его дни удаляются каскадом
+    if getattr(origin, 'model', type(origin)) is not Event:
+        rebuild_event_days([instance.event_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def taxonomy_changed(sender, **kwargs):
+    bump_data_version()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reference_changed(sender, **kwargs):
+    bump_reference_version()
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    # Название категории входит в поисковый индекс её мероприятий
+    reindex_queryset(Event.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Department)
+def department_saved(sender, instance, **kwargs):
+    reindex_queryset(Event.objects.filter(department=instance))
@@ -0,0 +1,169 @@
+"""Статистика мероприятий по сводной таблице EventStat.
+
+Вместо COUNT по таблице мероприятий на каждый месяц статистика читается
+одним запросом из сводки (строк в ней не больше, чем сочетаний категории,
+подразделения и месяца), а распределения по месяцам, категориям и
+подразделениям собираются из неё в Python. Сводка обновляется
+приращениями: при записи мероприятия его старая строка сводки уменьшается
+на единицу, новая — увеличивается.
+"""
+from collections import Counter, namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Event, EventStat
+from .reference import get_reference_data
+
+
+REBUILD_BATCH_SIZE = 2000
+
+# Строка сводки, в которую попадает мероприятие
+StatKey = namedtuple('StatKey', ['category_id', 'department_id', 'month', 'has_end_date'])
+
+
+def _month(value):
+    if value is None:
+        return None
+    local = timezone.localtime(value) if timezone.is_aware(value) else value
+    return local.date().replace(day=1)
+
+
+def stat_key(category_id, department_id, date, end_date):
+    return StatKey(category_id, department_id, _month(date), end_date is not None)
+
+
+def event_stat_key(event):
+    return stat_key(event.category_id, event.department_id, event.date, event.end_date)
+
+
+def stored_stat_key(event_id):
+    """Строка сводки мероприятия по данным в базе (до сохранения изменений)"""
+    row = Event.objects.filter(id=event_id).values_list('category_id', 'department_id', 'date', 'end_date').first()
+    return stat_key(*row) if row else None
+
+
+def stat_row_key(category_id, department_id, month):
+    """Ключ строки сводки без NULL: 0 — нет категории/подразделения, «-» — даты"""
+    return f'{category_id or 0}:{department_id or 0}:{month.isoformat() if month else "-"}'
+
+
+def _apply_row(row, delta, with_end):
+    category_id, department_id, month = row
+    key = stat_row_key(category_id, department_id, month)
+    rows = EventStat.objects.filter(key=key)
+    if rows.update(events=F('events') + delta, events_with_end_date=F('events_with_end_date') + with_end):
+        return
+    try:
+        with transaction.atomic():
+            EventStat.objects.create(key=key, category_id=category_id, department_id=department_id, month=month,
+                                     events=delta, events_with_end_date=with_end)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        rows.update(events=F('events') + delta, events_with_end_date=F('events_with_end_date') + with_end)
+
+
+def apply_stat_changes(changes):
+    """Применяет приращения ``{StatKey: delta}`` к сводке"""
+    deltas = Counter()
+    ends = Counter()
+    for key, delta in changes.items():
+        row = (key.category_id, key.department_id, key.month)
+        deltas[row] += delta
+        if key.has_end_date:
+            ends[row] += delta
+    rows = {row: (delta, ends[row]) for row, delta in deltas.items() if delta or ends[row]}
+
+    # Изменение одного мероприятия — не больше двух UPDATE
+    if len(rows) <= 2:
+        for row, (delta, with_end) in rows.items():
+            _apply_row(row, delta, with_end)
+        return
+
+    # Пачка (загрузка, пересчёт): один SELECT, один bulk_update, один bulk_create
+    keys = {stat_row_key(*row): row for row in rows}
+    existing = {keys[stat.key]: stat for stat in EventStat.objects.filter(key__in=list(keys))}
+
+    for row, stat in existing.items():
+        delta, with_end = rows[row]
+        stat.events = F('events') + delta
+        stat.events_with_end_date = F('events_with_end_date') + with_end
+    EventStat.objects.bulk_update(existing.values(), ['events', 'events_with_end_date'], batch_size=500)
+
+    missing = [row for row in rows if row not in existing]
+    try:
+        with transaction.atomic():
+            EventStat.objects.bulk_create([
+                EventStat(key=stat_row_key(*row), category_id=row[0], department_id=row[1], month=row[2],
+                          events=rows[row][0], events_with_end_date=rows[row][1])
+                for row in missing
+            ], batch_size=500)
+    except IntegrityError:
+        for row in missing:
+            _apply_row(row, *rows[row])
+
+
+def record_event_change(old_key, new_key):
+    """Переносит мероприятие из строки ``old_key`` в ``new_key``; None —
+    мероприятия до (создание) или после (удаление) изменения нет"""
+    if old_key == new_key:
+        return
+    changes = Counter()
+    if old_key is not None:
+        changes[old_key] -= 1
+    if new_key is not None:
+        changes[new_key] += 1
+    apply_stat_changes(changes)
+
+
+def rebuild_event_stats():
+    """Пересчитывает сводку по всей таблице мероприятий"""
+    totals = Counter()
+    rows = Event.objects.values_list('category_id', 'department_id', 'date', 'end_date')
+    for row in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        totals[stat_key(*row)] += 1
+
+    with transaction.atomic():
+        EventStat.objects.all().delete()
+        apply_stat_changes(totals)
+    return sum(totals.values())
+
+
+def event_statistics():
+    """Распределения числа мероприятий; один запрос к сводке"""
+    reference = get_reference_data()
+    by_month = Counter()
+    by_year_month = Counter()
+    by_category = Counter()
+    by_department = Counter()
+    total = with_date = with_end_date = 0
+
+    rows = EventStat.objects.filter(events__gt=0).values_list(
+        'category_id', 'department_id', 'month', 'events', 'events_with_end_date',
+    )
+    for category_id, department_id, month, events, events_with_end in rows:
+        total += events
+        with_end_date += events_with_end
+        by_category[category_id] += events
+        by_department[department_id] += events
+        if month is not None:
+            with_date += events
+            by_month[month.month] += events
+            by_year_month[month.strftime('%Y-%m')] += events
+
+    return {
+        'total_events': total,
+        'events_with_date': with_date,
+        'events_with_end_date': with_end_date,
+        'month_distribution': {month: by_month[month] for month in range(1, 13)},
+        'year_month_distribution': dict(sorted(by_year_month.items())),
+        'category_distribution': [
+            {'id': category_id, 'name': reference.category_name(category_id, None), 'count': count}
+            for category_id, count in by_category.most_common()
+        ],
+        'department_distribution': [
+            {'id': department_id, 'name': reference.department_name(department_id, None), 'count': count}
+            for department_id, count in by_department.most_common()
+        ],
+    }
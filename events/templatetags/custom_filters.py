@@ -1,5 +1,7 @@
 from django import template
 
+from events.reference import get_reference_data
+
 register = template.Library()
 
 
@@ -20,4 +22,19 @@ def pluralize_ru(number, forms):
     elif 2 <= number % 10 <= 4 and (number % 100 < 10 or number % 100 >= 20):
         return forms[1]
     else:
-        return forms[2]
\ No newline at end of file
+        return forms[2]
+
+
+@register.filter
+def category_name(category_id, default='—'):
+    return get_reference_data().category_name(category_id, default)
+
+
+@register.filter
+def department_name(department_id, default='—'):
+    return get_reference_data().department_name(department_id, default)
+
+
+@register.filter
+def user_name(user_id, default='—'):
+    return get_reference_data().user_name(user_id, default)
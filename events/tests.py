@@ -1,3 +1,817 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from categories.models import Category
+from mplan.testing import QueryBudgetMixin, seed_events, seed_reference
+
+from .admin import EventAdmin
+from .cache import get_data_version, get_event_version
+from .counts import get_total_events
+from .exports import EVENTS_TABLE_HEADERS, XLSX_CONTENT_TYPE, workbook_digest, write_events_table, write_plan
+from .imports import IMPORT_BATCH_SIZE, ImportFileError, import_events, import_events_file
+from .jobs import claim_pending_jobs, job_queryset, run_export_job, submit_export
+from .models import Event, EventDate, EventStat, ExportJob
+from .reference import get_reference_version
+from .selection import SELECTION_EXPIRED_MESSAGE, create_selection
+from .services import DATE_INPUT_FORMAT, save_event
+from .stats import event_statistics, record_event_change, stat_key, stat_row_key
+
+
+class EventsTestCase(QueryBudgetMixin, TestCase):
+    """Общие данные: 300 мероприятий 2025 года и справочники"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_reference()
+        cls.events = seed_events()
+
+    def setUp(self):
+        # Версии данных и закэшированные выборки живут в кэше
+        cache.clear()
+
+
+class EventsUiTests(EventsTestCase):
+    url = reverse('events_ui')
+
+    def test_first_page(self):
+        # Справочники (3), COUNT и страница; даты подгружаются prefetch
+        with self.assertQueryBudget(6):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['filtered_count'], 300)
+
+    def test_filters(self):
+        params = [
+            {'category': 3, 'month': 3, 'year': 2025},
+            {'department': 5},
+            {'search': 'конференция'},
+            {'start_date': '2025-03-01', 'end_date': '2025-03-31'},
+            {'search': 'конференция', 'sort_order': 'relevance'},
+        ]
+        for query in params:
+            cache.clear()
+            with self.subTest(query=query), self.assertQueryBudget(8):
+                response = self.client.get(self.url, query)
+            self.assertEqual(response.status_code, 200)
+
+    def test_keyset_pages(self):
+        response = self.client.get(reverse('api_event_list'), {'sort_order': 'asc'})
+        data = response.json()
+        with self.assertQueryBudget(4):
+            second = self.client.get(reverse('api_event_list'), {'sort_order': 'asc', 'cursor': data['next_cursor']})
+        first_ids = [event['id'] for event in data['events']]
+        second_ids = [event['id'] for event in second.json()['events']]
+        self.assertFalse(set(first_ids) & set(second_ids))
+
+    def test_out_of_range_year_is_ignored(self):
+        for params in ({'year': 99999}, {'year': 9999}, {'year': 1, 'month': 1}, {'year': 9999, 'month': 12}):
+            for url in (self.url, reverse('api_event_list')):
+                with self.subTest(url=url, params=params):
+                    self.assertEqual(self.client.get(url, params).status_code, 200)
+        response = self.client.get(self.url, {'year': 99999})
+        self.assertEqual(response.context['filtered_count'], 300)
+
+    def test_tampered_cursor_gives_first_page(self):
+        first = self.client.get(self.url).context['page_obj']
+        cursors = [
+            {'k': ['2025-03-01T07:00:00+00:00', 'Мероприятие', 'abc'], 'b': 0},
+            {'k': ['вчера', 'Мероприятие', 1], 'b': 0},
+            {'k': [[1], {'a': 1}, 1], 'b': 1},
+        ]
+        for data in cursors:
+            cursor = base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+            with self.subTest(cursor=data):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([event.pk for event in response.context['page_obj']], [event.pk for event in first])
+
+
+class CountTests(EventsTestCase):
+    """Один COUNT на запрос списка; общее число — из счётчика"""
+    url = reverse('events_ui')
+
+    def _counts(self, params):
+        with self.assertQueryBudget(8) as queries:
+            response = self.client.get(self.url, params)
+        return [query['sql'] for query in queries.captured_queries if 'COUNT(' in query['sql']], response
+
+    def test_filtered_page_counts_once(self):
+        # COUNT по фильтру считается один раз и передаётся пагинатору;
+        # первый запрос заполняет счётчик общего числа
+        self.client.get(self.url)
+        for params in ({'category': 3}, {'category': 3, 'page': 2}):
+            with self.subTest(params=params):
+                counts, response = self._counts(params)
+                self.assertEqual(len(counts), 1, counts)
+                self.assertEqual(response.context['filtered_count'],
+                                 Event.objects.filter(category_id=3).count())
+
+    def test_unfiltered_total_comes_from_counter(self):
+        self.client.get(self.url)
+        with self.assertQueryBudget(2) as queries:
+            response = self.client.get(self.url)
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+        self.assertEqual(response.context['total_events'], 300)
+
+    def test_counter_follows_writes(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(name='Новое', date=timezone.now())
+            Event.objects.filter(pk=self.events[0].pk).delete()
+            Event.objects.get(pk=self.events[1].pk).delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_events'], 299)
+        self.assertEqual(response.context['filtered_count'], 299)
+
+
+class DateSummaryTests(EventsTestCase):
+    """Даты карточек берутся из prefetch: число запросов страницы не
+    зависит от числа дат у мероприятий на ней"""
+
+    def _page_queries(self):
+        cache.clear()
+        with self.assertQueryBudget(6) as queries:
+            response = self.client.get(reverse('events_ui'), {'sort_order': 'asc'})
+            response.content
+        return len(queries), list(response.context['page_obj'])
+
+    def test_page_queries_do_not_grow_with_dates(self):
+        queries, page = self._page_queries()
+        self.assertEqual(len(page), 20)
+
+        EventDate.objects.bulk_create([
+            EventDate(event_id=event.pk, start=event.date + timedelta(days=30 * number),
+                      end=event.date + timedelta(days=30 * number, hours=1))
+            for event in page if event.date for number in range(1, 11)
+        ])
+        more_queries, page = self._page_queries()
+        self.assertEqual(more_queries, queries)
+        self.assertTrue(all(event.dates_count >= 10 for event in page if event.date))
+
+
+class FilteredIdsTests(EventsTestCase):
+    url = reverse('get_filtered_event_ids')
+
+    def test_filtered_ids(self):
+        with self.assertQueryBudget(1):
+            response = self.client.get(self.url, {'category': 2})
+        expected = set(Event.objects.filter(category_id=2).values_list('id', flat=True))
+        self.assertEqual(set(response.json()['event_ids']), expected)
+
+    def test_repeated_request_is_cached(self):
+        self.client.get(self.url, {'month': 4, 'year': 2025})
+        with self.assertQueryBudget(0):
+            response = self.client.get(self.url, {'month': 4, 'year': 2025})
+        self.assertEqual(response.json()['count'], 25)
+
+
+class CacheVersionTests(EventsTestCase):
+    def test_versions_change_after_commit(self):
+        event = self.events[0]
+        data_version, event_version = get_data_version(), get_event_version(event.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Event.objects.filter(pk=event.pk).update(name='Новое')
+            Event.objects.get(pk=event.pk).save()
+            self.assertEqual(get_data_version(), data_version)
+            self.assertEqual(get_event_version(event.pk), event_version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_data_version(), data_version)
+        self.assertNotEqual(get_event_version(event.pk), event_version)
+
+    def test_rollback_keeps_versions(self):
+        event = self.events[0]
+        data_version, event_version = get_data_version(), get_event_version(event.pk)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Event.objects.get(pk=event.pk).save()
+            raise RuntimeError
+        self.assertEqual(get_data_version(), data_version)
+        self.assertEqual(get_event_version(event.pk), event_version)
+
+
+class CheckDatabaseTests(EventsTestCase):
+    url = reverse('check_database')
+
+    def test_concurrent_first_insert_of_null_row(self):
+        key = stat_key(None, None, None, None)
+        row = EventStat.objects.filter(key=stat_row_key(None, None, None))
+        before = row.values_list('events', flat=True).first() or 0
+        record_event_change(None, key)
+
+        # Второй запрос не увидел строку и пытается создать её сам
+        update = QuerySet.update
+        calls = []
+
+        def racing_update(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            record_event_change(None, key)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(list(row.values_list('events', flat=True)), [before + 2])
+
+    def test_statistics(self):
+        # Сводка и пять примеров; справочники — ещё до трёх запросов
+        with self.assertQueryBudget(5):
+            response = self.client.get(self.url)
+        data = response.json()
+        self.assertEqual(data['total_events'], 300)
+        self.assertEqual(sum(data['month_distribution'].values()), 300)
+        self.assertEqual(len(data['sample_events']), 5)
+
+    def test_rollup_follows_writes(self):
+        event = Event.objects.get(pk=self.events[0].pk)
+        event.category_id = 30
+        event.date = event.date.replace(year=2026)
+        event.save()
+        Event.objects.filter(pk=self.events[1].pk).delete()
+        Event.objects.create(name='Новое', category_id=2, date=timezone.now())
+
+        counts = {}
+        for event in Event.objects.all():
+            month = timezone.localdate(event.date).replace(day=1) if event.date else None
+            key = (event.category_id, event.department_id, month)
+            counts[key] = counts.get(key, 0) + 1
+        rollup = {(stat.category_id, stat.department_id, stat.month): stat.events
+                  for stat in EventStat.objects.filter(events__gt=0)}
+        self.assertEqual(rollup, counts)
+        self.assertEqual(event_statistics()['total_events'], 300)
+
+
+class BulkDeleteTests(EventsTestCase):
+    url = reverse('bulk_delete_events')
+
+    def _delete_queries(self, events):
+        with self.captureOnCommitCallbacks(execute=True), self.assertQueryBudget(30) as queries:
+            response = self.client.post(self.url, {'selected_events': [event.pk for event in events]})
+        self.assertEqual(response.status_code, 302)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_events(self):
+        self.client.get(reverse('events_ui'))
+        # Мероприятия одного месяца задевают несколько строк сводки — обе
+        # пачки обновляют её одним bulk_update
+        april = [event for event in self.events if event.date and timezone.localdate(event.date).month == 4]
+        self.assertEqual(self._delete_queries(april[:5]), self._delete_queries(april[5:22]))
+
+        self.assertFalse(Event.objects.filter(pk__in=[event.pk for event in april[:22]]).exists())
+        self.assertEqual(event_statistics()['total_events'], 278)
+        self.assertEqual(get_total_events(), 278)
+
+    def test_selection_token(self):
+        snapshot = create_selection({'category': '4'}, all_filtered=True)
+        expected = Event.objects.exclude(category_id=4).count()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'selection': snapshot.token})
+        self.assertEqual(Event.objects.count(), expected)
+        self.assertEqual(event_statistics()['total_events'], expected)
+
+
+    def test_expired_selection(self):
+        response = self.client.post(self.url, {'selection': 'unknown'}, follow=True)
+        self.assertEqual([str(message) for message in response.context['messages']], [SELECTION_EXPIRED_MESSAGE])
+        self.assertEqual(Event.objects.count(), 300)
+
+
+class ExportTests(EventsTestCase):
+    url = reverse('export_selected_events')
+
+    def test_export_selected(self):
+        ids = [event.pk for event in self.events[:50]]
+        with self.assertQueryBudget(8, seconds=5):
+            response = self.client.post(self.url, {'selected_events': ids})
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        self.assertTrue(content.startswith(b'PK'))
+
+        # Та же выборка без изменений — 304 по ETag без построения книги
+        with self.assertQueryBudget(2):
+            repeated = self.client.post(self.url, {'selected_events': ids}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeated.status_code, 304)
+
+    def test_export_selection_token(self):
+        snapshot = create_selection({'category': '4'}, all_filtered=True, exclude_ids=[self.events[3].pk])
+        with self.assertQueryBudget(9, seconds=5):
+            response = self.client.post(self.url, {'selection': snapshot.token})
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+
+    def test_digest_does_not_touch_event_versions(self):
+        ids = [event.pk for event in self.events]
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add, \
+                mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many:
+            digest = workbook_digest(write_plan, ids)
+        self.assertLessEqual(add.call_count, 2)
+        set_many.assert_not_called()
+        self.assertEqual(workbook_digest(write_plan, reversed(ids)), digest)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.get(pk=ids[0]).save()
+        self.assertNotEqual(workbook_digest(write_plan, ids), digest)
+
+    def test_export_expired_selection(self):
+        response = self.client.post(self.url, {'selection': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content.decode(), SELECTION_EXPIRED_MESSAGE)
+
+    def test_export_without_selection(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportJobTests(EventsTestCase):
+    url = reverse('export_job_submit')
+
+    def _submit(self, data):
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 202)
+        return ExportJob.objects.get(pk=response.json()['job']['id'])
+
+    def test_submit(self):
+        ids = [event.pk for event in self.events[:5]]
+        job = self._submit({'selected_events': ids})
+        self.assertEqual((job.kind, job.status), (ExportJob.KIND_PLAN, ExportJob.STATUS_PENDING))
+        self.assertEqual(job.params, {'event_ids': ids})
+
+        job = self._submit({'kind': ExportJob.KIND_TABLE, 'category': '4'})
+        self.assertEqual(job.params, {'filter': {'category': 4}})
+        self.assertEqual(set(job_queryset(job)), set(Event.objects.filter(category_id=4)))
+
+        snapshot = create_selection({}, include_ids=ids[:2])
+        job = self._submit({'selection': snapshot.token})
+        self.assertEqual(list(job_queryset(job).values_list('id', flat=True)), sorted(ids[:2]))
+
+    def test_submit_validation(self):
+        cases = [
+            ({'kind': 'pdf', 'selected_events': [self.events[0].pk]}, 'Неизвестный вид выгрузки'),
+            ({'selected_events': ['abc']}, 'Некорректный список id'),
+            ({'selection': 'unknown'}, SELECTION_EXPIRED_MESSAGE),
+            ({}, 'Не выбрано ни одного мероприятия'),
+        ]
+        for data, error in cases:
+            response = self.client.post(self.url, data)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], error)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_claim_each_job_once(self):
+        jobs = [submit_export(ExportJob.KIND_PLAN, event_ids=[event.pk]) for event in self.events[:3]]
+        first = claim_pending_jobs(2)
+        second = claim_pending_jobs(2)
+        self.assertEqual((len(first), len(second)), (2, 1))
+        self.assertEqual(set(first + second), {job.pk for job in jobs})
+        self.assertEqual(claim_pending_jobs(2), [])
+        self.assertEqual(ExportJob.objects.filter(status=ExportJob.STATUS_RUNNING).count(), 3)
+
+    def test_claim_skips_job_taken_by_another_worker(self):
+        taken, free = [submit_export(ExportJob.KIND_PLAN, event_ids=[event.pk]) for event in self.events[:2]]
+        now = timezone.now
+        calls = []
+
+        def racing_now():
+            # Другой воркер захватывает задание между выборкой и первым UPDATE
+            if not calls:
+                ExportJob.objects.filter(pk=taken.pk).update(status=ExportJob.STATUS_RUNNING)
+            calls.append(1)
+            return now()
+
+        with mock.patch('events.jobs.timezone.now', side_effect=racing_now):
+            self.assertEqual(claim_pending_jobs(2), [free.pk])
+        self.assertEqual(len(calls), 2)
+
+    def test_run_job(self):
+        ids = [event.pk for event in self.events[:20]]
+        job = submit_export(ExportJob.KIND_PLAN, event_ids=ids)
+        claim_pending_jobs(1)
+        self.assertEqual(run_export_job(job.pk), str(job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_DONE)
+        self.assertEqual((job.progress, job.total), (20, 20))
+        self.assertTrue(os.path.exists(job.file_path))
+
+        status = self.client.get(reverse('export_job_status', args=[job.pk])).json()['job']
+        self.assertEqual((status['status'], status['percent']), (ExportJob.STATUS_DONE, 100))
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+    def test_failed_job(self):
+        job = submit_export(ExportJob.KIND_PLAN, event_ids=[self.events[0].pk])
+        claim_pending_jobs(1)
+        with mock.patch('events.jobs.cached_workbook', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                run_export_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_FAILED)
+        self.assertIn('disk full', job.error)
+        self.assertEqual(job.file_path, '')
+        self.assertIsNotNone(job.finished_at)
+
+        status = self.client.get(reverse('export_job_status', args=[job.pk])).json()['job']
+        self.assertEqual(status['status'], ExportJob.STATUS_FAILED)
+        self.assertNotIn('download_url', status)
+        self.assertEqual(self.client.get(reverse('export_job_download', args=[job.pk])).status_code, 404)
+
+    def test_pending_job(self):
+        job = submit_export(ExportJob.KIND_PLAN, event_ids=[self.events[0].pk])
+        response = self.client.get(reverse('export_job_status', args=[job.pk]))
+        self.assertEqual(response.json()['job']['status'], ExportJob.STATUS_PENDING)
+        self.assertEqual(self.client.get(reverse('export_job_download', args=[job.pk])).status_code, 404)
+
+        unknown = self.client.get(reverse('export_job_status', args=[uuid.uuid4()]))
+        self.assertEqual(unknown.status_code, 404)
+
+    def test_admin_cannot_add_jobs(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.assertEqual(self.client.get(reverse('admin:events_exportjob_add')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin:events_exportjob_changelist')).status_code, 200)
+
+
+class EventFormTests(EventsTestCase):
+    # Больше 50 дат: запись не должна зависеть от их числа
+    DATES_COUNT = 55
+
+    def _dates(self, first_day, count=DATES_COUNT):
+        start = timezone.make_aware(datetime.combine(first_day, datetime.min.time())) + timedelta(hours=10)
+        return [
+            {'start': (start + timedelta(days=day)).strftime(DATE_INPUT_FORMAT),
+             'end': (start + timedelta(days=day, hours=2)).strftime(DATE_INPUT_FORMAT)}
+            for day in range(count)
+        ]
+
+    def _post_queries(self, url, dates):
+        with self.assertQueryBudget(24) as queries:
+            response = self.client.post(url, self._form_data(dates))
+        self.assertEqual(response.status_code, 302)
+        return len(queries)
+
+    def _form_data(self, dates, **extra):
+        return {'name': 'Летняя школа', 'responsible': 'Иванов И.И.', 'category': 2, 'department': 3,
+                'place': 'Корпус 1', 'comment': '', 'dates_json': json.dumps(dates), **extra}
+
+    def test_create_form(self):
+        with self.assertQueryBudget(4):
+            response = self.client.get(reverse('create_event'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_create_with_many_dates(self):
+        with self.assertQueryBudget(24):
+            response = self.client.post(reverse('create_event'), self._form_data(self._dates(datetime(2025, 7, 1))))
+        self.assertEqual(response.status_code, 302)
+        event = Event.objects.get(name='Летняя школа')
+        self.assertEqual(event.event_dates.count(), self.DATES_COUNT)
+        self.assertEqual(timezone.localtime(event.date).hour, 10)
+
+    def test_edit_form_shows_local_dates(self):
+        event = self.events[1]
+        with self.assertQueryBudget(5):
+            response = self.client.get(reverse('edit_event', args=[event.pk]))
+        dates = json.loads(response.context['event_dates_json'])
+        self.assertEqual(dates[0]['start'], timezone.localtime(event.date).strftime(DATE_INPUT_FORMAT))
+
+    def test_edit_with_many_dates(self):
+        event = self.events[1]
+        self.client.post(reverse('edit_event', args=[event.pk]), self._form_data(self._dates(datetime(2025, 7, 1))))
+        # Половина дат меняется: обновление, удаление и вставка — пачками
+        dates = self._dates(datetime(2025, 7, 1))[:30] + self._dates(datetime(2025, 9, 1))[:40]
+        with self.assertQueryBudget(24):
+            response = self.client.post(reverse('edit_event', args=[event.pk]), self._form_data(dates))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(EventDate.objects.filter(event_id=event.pk).count(), 70)
+
+    def test_write_cost_does_not_grow_with_dates(self):
+        # Первое мероприятие месяца добавляет строку сводки — не в счёт
+        self._post_queries(reverse('create_event'), self._dates(datetime(2025, 7, 1), 1))
+        few = self._post_queries(reverse('create_event'), self._dates(datetime(2025, 7, 1), 5))
+        many = self._post_queries(reverse('create_event'), self._dates(datetime(2025, 7, 1)))
+        self.assertEqual(many, few)
+
+        # Правка с изменением и удалением дат: 10 → 5 против 110 → 55
+        first, second = self.events[1], self.events[4]
+        self.client.post(reverse('edit_event', args=[first.pk]), self._form_data(self._dates(datetime(2025, 7, 1), 10)))
+        self.client.post(reverse('edit_event', args=[second.pk]), self._form_data(self._dates(datetime(2025, 7, 1), 110)))
+        few = self._post_queries(reverse('edit_event', args=[first.pk]), self._dates(datetime(2025, 7, 2), 5))
+        many = self._post_queries(reverse('edit_event', args=[second.pk]), self._dates(datetime(2025, 7, 2)))
+        self.assertEqual(many, few)
+
+    def test_edit_keeps_dates_when_unchanged(self):
+        event = self.events[2]
+        url = reverse('edit_event', args=[event.pk])
+        response = self.client.get(url)
+        dates = json.loads(response.context['event_dates_json'])
+        before = list(EventDate.objects.filter(event_id=event.pk).order_by('start').values_list('id', 'start'))
+        self.client.post(url, self._form_data(dates))
+        after = list(EventDate.objects.filter(event_id=event.pk).order_by('start').values_list('id', 'start'))
+        self.assertEqual(before, after)
+
+    def test_failed_save_keeps_caches(self):
+        self.client.get(reverse('events_ui'))
+        data_version = get_data_version()
+        with mock.patch('events.signals.rebuild_event_days', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            save_event(Event(name='Летняя школа'), [(timezone.now(), None)], '')
+        self.assertFalse(Event.objects.filter(name='Летняя школа').exists())
+        self.assertEqual(get_data_version(), data_version)
+        self.assertEqual(get_total_events(), 300)
+
+    def test_invalid_dates(self):
+        response = self.client.post(reverse('create_event'), self._form_data([{'start': 'завтра'}]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Event.objects.filter(name='Летняя школа').exists())
+
+
+class ReferenceTests(EventsTestCase):
+    def test_details_follow_category_rename(self):
+        event = self.events[0]
+        url = reverse('event_details', args=[event.pk])
+        self.assertEqual(self.client.get(url).json()['event']['category'], 'Категория 1')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Category.objects.filter(pk=1).update(name='Выставки')
+            Category.objects.get(pk=1).save()
+            # До фиксации версия справочников прежняя
+            self.assertEqual(self.client.get(url).json()['event']['category'], 'Категория 1')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url).json()['event']['category'], 'Выставки')
+
+    def test_rollback_keeps_reference_version(self):
+        version = get_reference_version()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Category.objects.get(pk=1).save()
+            raise RuntimeError
+        self.assertEqual(get_reference_version(), version)
+
+    def test_details_batch(self):
+        ids = ','.join(str(event.pk) for event in self.events[:40])
+        with self.assertQueryBudget(5):
+            response = self.client.get(reverse('event_details_batch'), {'ids': ids})
+        self.assertEqual(len(response.json()['events']), 40)
+
+
+class ApiTests(EventsTestCase):
+    def test_fields_projection(self):
+        with self.assertQueryBudget(5):
+            response = self.client.get(reverse('api_event_list'), {'fields': 'id,name,category,dates', 'limit': 30})
+        events = response.json()['events']
+        self.assertEqual(len(events), 30)
+        self.assertEqual(set(events[0]), {'id', 'name', 'category', 'dates'})
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('api_event_list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_not_modified(self):
+        url = reverse('api_event_list')
+        response = self.client.get(url)
+        with self.assertQueryBudget(0):
+            repeated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeated.status_code, 304)
+
+        # Другая страница или фильтр — другой ETag
+        for params in ({'limit': 5}, {'category': 2}, {'fields': 'id'}):
+            with self.subTest(params=params):
+                other = self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(other.status_code, 200)
+                self.assertNotEqual(other['ETag'], response['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(name='Новое', date=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_detail_not_modified(self):
+        url = reverse('api_event_detail', args=[self.events[5].pk])
+        response = self.client.get(url)
+        with self.assertQueryBudget(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        missing = reverse('api_event_detail', args=[10 ** 6])
+        self.assertEqual(self.client.get(missing, HTTP_IF_NONE_MATCH='*').status_code, 404)
+        Event.objects.filter(pk=self.events[5].pk).delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 404)
+
+    def test_detail(self):
+        event = self.events[5]
+        response = self.client.get(reverse('api_event_detail', args=[event.pk]))
+        self.assertEqual(response.json()['event']['id'], event.pk)
+        self.assertEqual(self.client.get(reverse('api_event_detail', args=[10 ** 6])).status_code, 404)
+
+
+class IcsTests(EventsTestCase):
+    def test_feed(self):
+        with self.assertQueryBudget(5):
+            response = self.client.get(reverse('ics_feed_all'))
+            body = b''.join(response.streaming_content).decode('utf-8')
+        legacy = Event.objects.filter(event_dates__isnull=True).count()
+        self.assertEqual(body.count('BEGIN:VEVENT'), EventDate.objects.count() + legacy)
+        self.assertTrue(all(len(line.encode('utf-8')) <= 75 for line in body.split('\r\n')))
+
+        with self.assertQueryBudget(0):
+            repeated = self.client.get(reverse('ics_feed_all'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeated.status_code, 304)
+
+    def test_department_feed(self):
+        response = self.client.get(reverse('ics_feed_department', args=[4]))
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('Институт 4', body)
+        self.assertEqual(self.client.get(reverse('ics_feed_department', args=[999])).status_code, 404)
+
+
+class CalendarTests(EventsTestCase):
+    def test_month(self):
+        with self.assertQueryBudget(5):
+            response = self.client.get(reverse('calendar_events'), {'view': 'month', 'date': '2025-03-10'})
+        data = response.json()
+        self.assertEqual((data['first_day'], data['last_day']), ('2025-03-01', '2025-03-31'))
+        self.assertTrue(any(data['days'].values()))
+
+    def test_span_across_midnight(self):
+        event = Event.objects.create(name='Ночное', date=timezone.make_aware(datetime(2025, 6, 2, 22, 30)))
+        EventDate.objects.create(event=event, start=event.date,
+                                 end=timezone.make_aware(datetime(2025, 6, 4, 1, 0)))
+        data = self.client.get(reverse('calendar_events'), {'view': 'week', 'date': '2025-06-03'}).json()
+        spans = {day: [(entry['continues_from_previous'], entry['continues_to_next'])
+                       for entry in entries if entry['id'] == event.pk]
+                 for day, entries in data['days'].items()}
+        self.assertEqual(spans['2025-06-02'], [(False, True)])
+        self.assertEqual(spans['2025-06-03'], [(True, True)])
+        self.assertEqual(spans['2025-06-04'], [(True, False)])
+        self.assertEqual(spans['2025-06-05'], [])
+
+
+class ImportTests(EventsTestCase):
+    def test_import_rows(self):
+        rows = [EVENTS_TABLE_HEADERS] + [
+            ['', f'Загрузка {number}', f'2025-10-{number % 28 + 1:02d} 10:00', '', 'Категория 2', 'Институт 3',
+             'Иванов', 'Зал', 'Сотрудник 1', '']
+            for number in range(120)
+        ] + [['', 'Без даты', '', '', '', '', '', '', '', ''], ['', 'Чужая', '2025-10-01 10:00', '', 'Нет такой']]
+
+        # Справочники и не больше 18 запросов на пачку, независимо от её размера
+        with self.assertQueryBudget(3 + 18 * 3):
+            result = import_events(rows, batch_size=50)
+        self.assertEqual(result.created, 120)
+        self.assertEqual([row for row, _ in result.errors], [122, 123])
+        self.assertEqual(EventDate.objects.filter(event__name__startswith='Загрузка').count(), 120)
+        self.assertEqual(event_statistics()['total_events'], 420)
+
+    def test_export_round_trip(self):
+        fields = ('name', 'date', 'end_date', 'category_id', 'department_id', 'responsible', 'place')
+        exported = Event.objects.filter(pk__in=[event.pk for event in self.events[:40]]).order_by('id')
+        file = io.BytesIO()
+        write_events_table(exported, file)
+        file.seek(0)
+
+        last_id = Event.objects.order_by('-id').values_list('id', flat=True).first()
+        result = import_events_file(file, 'events.xlsx')
+        self.assertEqual((result.created, result.errors), (40, []))
+        imported = Event.objects.filter(id__gt=last_id).order_by('id')
+        self.assertEqual(list(imported.values_list(*fields)), list(exported.values_list(*fields)))
+
+    def test_import_without_returning(self):
+        rows = [EVENTS_TABLE_HEADERS] + [
+            ['', f'Загрузка {number}', f'2025-11-{number % 28 + 1:02d} 10:00', '', 'Категория 2']
+            for number in range(30)
+        ]
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            result = import_events(rows, batch_size=10)
+        self.assertEqual(result.created, 30)
+        for event in Event.objects.filter(name__startswith='Загрузка').prefetch_related('event_dates'):
+            self.assertEqual([event_date.start for event_date in event.event_dates.all()], [event.date])
+        self.assertEqual(Event.objects.filter(name__startswith='Загрузка').count(), 30)
+
+    def test_import_without_returning_ignores_concurrent_rows(self):
+        rows = [EVENTS_TABLE_HEADERS] + [['', f'Загрузка {number}', '2025-11-01 10:00'] for number in range(10)]
+        bulk_create = Event.objects.bulk_create
+
+        def concurrent_insert(events, *args, **kwargs):
+            # Строка другой транзакции между чтением последнего id и вставкой
+            Event.objects.create(name='Параллельное')
+            return bulk_create(events, *args, **kwargs)
+
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch.object(Event.objects, 'bulk_create', side_effect=concurrent_insert):
+            result = import_events(rows)
+        self.assertEqual(result.created, 10)
+        self.assertEqual(sorted(Event.objects.filter(event_dates__isnull=False, name__startswith='Загрузка')
+                                .values_list('name', flat=True)), sorted(f'Загрузка {number}' for number in range(10)))
+        self.assertFalse(EventDate.objects.filter(event__name='Параллельное').exists())
+
+    def test_failed_batch_is_reported(self):
+        rows = [EVENTS_TABLE_HEADERS] + [['', f'Загрузка {number}', '2025-11-01 10:00']
+                                         for number in range(IMPORT_BATCH_SIZE + 10)]
+        upload = io.StringIO()
+        csv.writer(upload, delimiter=';').writerows(rows)
+        upload = io.BytesIO(upload.getvalue().encode('utf-8'))
+        upload.name = 'plan.csv'
+        failure = ImportFileError('Не удалось записать пачку строк')
+        with mock.patch('events.imports._insert_batch', side_effect=[None, failure]):
+            response = self.client.post(reverse('import_events'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['error'],
+                         f'Не удалось записать пачку строк; уже загружено мероприятий: {IMPORT_BATCH_SIZE}')
+
+    def test_upload_csv(self):
+        content = 'Название;Дата начала;Категория\nЛекция;01.11.2025 12:00;Категория 1\n'.encode('utf-8-sig')
+        upload = io.BytesIO(content)
+        upload.name = 'plan.csv'
+        response = self.client.post(reverse('import_events'), {'file': upload})
+        self.assertEqual(response.context['result'].created, 1)
+
+
+class EventAdminTests(EventsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_changelist(self):
+        url = reverse('admin:events_event_changelist')
+        with mock.patch.object(EventAdmin, 'list_per_page', 30):
+            # Сессия, пользователь, справочники фильтров и страница
+            with self.assertQueryBudget(9):
+                response = self.client.get(url)
+            self.assertEqual(len(response.context['cl'].result_list), 30)
+
+            with self.assertQueryBudget(10):
+                response = self.client.get(url, {'q': 'конференция'})
+            self.assertEqual(response.status_code, 200)
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.assertChangelistQueriesConstant(EventAdmin, reverse('admin:events_event_changelist'))
+
+
+class ServerTimingTests(EventsTestCase):
+    def _timings(self, response):
+        return {part.split(';')[0]: part for part in response['Server-Timing'].split(', ')}
+
+    def _login(self, is_staff):
+        self.client.force_login(get_user_model().objects.create_user('user', is_staff=is_staff))
+
+    def test_header(self):
+        self._login(is_staff=True)
+        # Сессию и пользователя читает проверка is_staff уже после замера
+        with self.assertQueryBudget(8) as queries:
+            response = self.client.get(reverse('events_ui'))
+        timings = self._timings(response)
+        self.assertEqual(set(timings), {'sql', 'tpl', 'view', 'total'})
+        self.assertIn(f'desc="{len(queries) - 2} queries"', timings['sql'])
+
+    def test_header_hidden(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('events_ui')))
+        self._login(is_staff=False)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('events_ui')))
+
+    @override_settings(DEBUG=True)
+    def test_header_in_debug(self):
+        self.assertIn('sql', self._timings(self.client.get(reverse('events_ui'))))
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_hidden_header_still_logged(self):
+        with self.assertLogs('events.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('events_ui'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(json.loads(logs.records[-1].getMessage())['path'], reverse('events_ui'))
+
+    def test_export_span(self):
+        self._login(is_staff=True)
+        response = self.client.post(reverse('export_selected_events'), {'selected_events': [self.events[0].pk]})
+        self.assertIn('xlsx', self._timings(response))
+
+    @override_settings(SERVER_TIMING_SLOW_MS=0)
+    def test_slow_request_logs_sql(self):
+        with self.assertLogs('events.profiling', 'WARNING') as logs:
+            self.client.get(reverse('events_ui'), {'category': 2})
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('events_ui'))
+        self.assertEqual(len(record['sql']), record['queries'])
+        self.assertTrue(any('"event"' in statement['sql'] for statement in record['sql']))
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_streaming_logged_after_body(self):
+        with self.assertLogs('events.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('ics_feed_all'))
+            # Строка журнала пишется только после отдачи тела
+            self.assertEqual(logs.records, [])
+            b''.join(response.streaming_content)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertIn('stream_ms', record)
+        self.assertGreater(record['queries'], 0)
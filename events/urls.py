@@ -4,12 +4,26 @@ from django.contrib.auth import views as auth_views
 
 urlpatterns = [
     path('events/ui/', views.events_ui, name='events_ui'),
+    path('api/events/', views.api_event_list, name='api_event_list'),
+    path('api/events/<int:event_id>/', views.api_event_detail, name='api_event_detail'),
+    path('events/calendar/', views.calendar_events, name='calendar_events'),
+    path('events/ics/', views.ics_feed_all, name='ics_feed_all'),
+    path('events/ics/department/<int:department_id>/', views.ics_feed_department, name='ics_feed_department'),
+    path('events/ics/category/<int:category_id>/', views.ics_feed_category, name='ics_feed_category'),
     path('events/export/', views.export_selected_events, name='export_selected_events'),
+    path('events/export/all/', views.export_events_to_excel, name='export_events_to_excel'),
+    path('events/export/jobs/', views.export_job_submit, name='export_job_submit'),
+    path('events/export/jobs/<uuid:job_id>/', views.export_job_status, name='export_job_status'),
+    path('events/export/jobs/<uuid:job_id>/download/', views.export_job_download, name='export_job_download'),
     path('create/', views.create_event, name='create_event'),
+    path('import/', views.import_events, name='import_events'),
     path('edit/<int:event_id>/', views.edit_event, name='edit_event'),
     path('delete/<int:event_id>/', views.delete_event, name='delete_event'),
     path('bulk-delete/', views.bulk_delete_events, name='bulk_delete_events'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('check-db/', views.check_database, name='check_database'),
+    path('events/selection/', views.create_event_selection, name='create_event_selection'),
     path('get-filtered-ids/', views.get_filtered_event_ids, name='get_filtered_event_ids'),
+    path('events/<int:event_id>/details/', views.event_details, name='event_details'),
+    path('events/details/', views.event_details_batch, name='event_details_batch'),
 ]
\ No newline at end of file
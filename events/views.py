@@ -2,21 +2,39 @@ from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from .forms import EventForm
 from django.shortcuts import redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
-from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Border, Side, Font, PatternFill
-from collections import defaultdict
 from django.shortcuts import render
-from django.core.paginator import Paginator
+from django.core.paginator import Page
 from datetime import datetime as dt
-from datetime import datetime
-from django.http import JsonResponse
-from django.db.models import Q
+from django.http import FileResponse, Http404, JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+from django.core.exceptions import ValidationError
+import os
 import json
 from django.utils import timezone
-from .models import Event, EventDate
+from .models import Event, ExportJob
+from .api import (
+    DEFAULT_API_FIELDS, conditional_response, detail_validators, list_validators, parse_fields,
+    parse_page_size, serialize_rows, value_columns,
+)
+from .cache import get_cached_event_details, get_or_build
+from .calendar import CALENDAR_VIEWS, VIEW_MONTH, calendar_payload, parse_calendar_day
+from .counts import count_events, get_total_events
+from .exports import XLSX_CONTENT_TYPE, write_events_table, write_plan, xlsx_response
+from .pagination import CountedPaginator, KeysetPaginator
+from .reference import get_reference_data, get_reference_version
+from .filters import EventFilter
+from .ics import FEED_ALL, FEED_CATEGORY, FEED_DEPARTMENT, ICS_CONTENT_TYPE, feed_validators, iter_feed
+from .imports import ImportFileError, import_events_file
+from .jobs import EXPORT_FILENAMES, EXPORT_WRITERS, submit_export
+from .stats import event_statistics
+from .services import delete_events, event_dates_for_form, parse_event_dates, save_event
+from .selection import (
+    SELECTION_EXPIRED_MESSAGE, SelectionExpired, create_selection, get_selection, parse_ids, selected_events,
+    selection_events,
+)
 
 
 def event_list(request):
@@ -28,69 +46,50 @@ def create_event(request):
     if request.method == 'POST':
         form = EventForm(request.POST)
         if form.is_valid():
-            event = form.save(commit=False)
-
-            # Устанавливаем user_id
-            if request.user and hasattr(request.user, 'id'):
-                event.user_id = request.user.id
+            try:
+                dates = parse_event_dates(request.POST.get('dates_json'))
+            except ValidationError as e:
+                form.add_error(None, e)
             else:
-                event.user = None
+                event = form.save(commit=False)
 
-            # Сохраняем мероприятие, чтобы получить ID
-            event.save()
+                # Устанавливаем user_id
+                if request.user and hasattr(request.user, 'id'):
+                    event.user_id = request.user.id
+                else:
+                    event.user = None
 
-            # Получаем JSON с датами
-            dates_json = request.POST.get('dates_json', '[]')
-            try:
-                dates_data = json.loads(dates_json)
-            except:
-                dates_data = []
-
-            # Удаляем старые даты (если были)
-            event.event_dates.all().delete()
-
-            # Создаём новые даты в таблице EventDate
-            for d in dates_data:
-                try:
-                    start_dt = datetime.strptime(d['start'], '%Y-%m-%dT%H:%M')
-                    end_dt = datetime.strptime(d['end'], '%Y-%m-%dT%H:%M') if d.get('end') else None
-
-                    EventDate.objects.create(
-                        event=event,
-                        start=timezone.make_aware(start_dt) if start_dt else None,
-                        end=timezone.make_aware(end_dt) if end_dt else None
-                    )
-                except Exception as e:
-                    print(f"Ошибка создания даты: {e}")
-
-            # Устанавливаем первую дату как основную (для обратной совместимости)
-            if dates_data:
-                first_date = dates_data[0]
-                try:
-                    event.date = timezone.make_aware(
-                        datetime.strptime(first_date['start'], '%Y-%m-%dT%H:%M')
-                    )
-                    if first_date.get('end'):
-                        event.end_date = timezone.make_aware(
-                            datetime.strptime(first_date['end'], '%Y-%m-%dT%H:%M')
-                        )
-                    event.save()
-                except:
-                    pass
-
-            # Очищаем комментарий от старых дат (оставляем только чистый комментарий)
-            original_comment = form.cleaned_data.get('comment', '') or ''
-            if "ДАТЫ:" in original_comment:
-                original_comment = original_comment.split("\n\nДАТЫ:")[0].strip()
-            event.comment = original_comment
-            event.save()
-
-            return redirect('events_ui')
+                save_event(event, dates, form.cleaned_data.get('comment'))
+                return redirect('events_ui')
     else:
         form = EventForm()
-        event_dates_json = '[]'
 
-    return render(request, 'events/create_event.html', {'form': form, 'event_dates_json': event_dates_json})
+    return render(request, 'events/create_event.html', {'form': form, 'event_dates_json': '[]'})
+
+
+# Сколько ошибочных строк показывать на странице загрузки
+IMPORT_ERRORS_SHOWN = 100
+
+
+def import_events(request):
+    """Загрузка мероприятий из файла .xlsx/.csv в формате выгрузки"""
+    context = {}
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if upload is None:
+            context['error'] = 'Выберите файл'
+        else:
+            user_id = request.user.id if request.user.is_authenticated else None
+            try:
+                result = import_events_file(upload, upload.name, user_id=user_id,
+                                            dry_run=bool(request.POST.get('dry_run')))
+            except ImportFileError as e:
+                context['error'] = str(e)
+            else:
+                context.update(result=result, errors=result.errors[:IMPORT_ERRORS_SHOWN],
+                               dry_run=bool(request.POST.get('dry_run')))
+
+    return render(request, 'events/import_events.html', context)
 
 
 def delete_event(request, event_id):
@@ -103,65 +102,18 @@ def edit_event(request, event_id):
     event = get_object_or_404(Event, id=event_id)
 
     # Формируем JSON для множественных дат
-    event_dates = []
-    for ed in event.event_dates.all():
-        event_dates.append({
-            'start': ed.start.strftime('%Y-%m-%dT%H:%M'),
-            'end': ed.end.strftime('%Y-%m-%dT%H:%M') if ed.end else ''
-        })
-    event_dates_json = json.dumps(event_dates)
+    event_dates_json = json.dumps(event_dates_for_form(event))
 
     if request.method == 'POST':
         form = EventForm(request.POST, instance=event)
         if form.is_valid():
-            event = form.save(commit=False)
-
-            # Получаем JSON с датами
-            dates_json = request.POST.get('dates_json', '[]')
             try:
-                dates_data = json.loads(dates_json)
-            except:
-                dates_data = []
-
-            # Удаляем старые даты
-            event.event_dates.all().delete()
-
-            # Создаём новые даты в таблице EventDate
-            for d in dates_data:
-                try:
-                    start_dt = datetime.strptime(d['start'], '%Y-%m-%dT%H:%M')
-                    end_dt = datetime.strptime(d['end'], '%Y-%m-%dT%H:%M') if d.get('end') else None
-
-                    EventDate.objects.create(
-                        event=event,
-                        start=timezone.make_aware(start_dt) if start_dt else None,
-                        end=timezone.make_aware(end_dt) if end_dt else None
-                    )
-                except Exception as e:
-                    print(f"Ошибка создания даты: {e}")
-
-            # Устанавливаем первую дату как основную (для обратной совместимости)
-            if dates_data:
-                first_date = dates_data[0]
-                try:
-                    event.date = timezone.make_aware(
-                        datetime.strptime(first_date['start'], '%Y-%m-%dT%H:%M')
-                    )
-                    if first_date.get('end'):
-                        event.end_date = timezone.make_aware(
-                            datetime.strptime(first_date['end'], '%Y-%m-%dT%H:%M')
-                        )
-                except:
-                    pass
-
-            # Очищаем комментарий от старых дат
-            original_comment = form.cleaned_data.get('comment', '') or ''
-            if "ДАТЫ:" in original_comment:
-                original_comment = original_comment.split("\n\nДАТЫ:")[0].strip()
-            event.comment = original_comment
-            event.save()
-
-            return redirect('events_ui')
+                dates = parse_event_dates(request.POST.get('dates_json'))
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                save_event(form.save(commit=False), dates, form.cleaned_data.get('comment'))
+                return redirect('events_ui')
     else:
         form = EventForm(instance=event)
 
@@ -169,148 +121,103 @@ def edit_event(request, event_id):
 
 
 def export_events_to_excel(request):
-    from io import BytesIO
-    import openpyxl
-
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Мероприятия"
-
-    headers = [
-        "ID", "Название", "Дата начала", "Дата окончания", "Категория",
-        "Подразделение", "Ответственный", "Место", "Создатель", "Комментарий"
-    ]
-    worksheet.append(headers)
-
-    events = Event.objects.all()
-    for event in events:
-        worksheet.append([
-            event.id,
-            event.name or "",
-            event.date.strftime('%Y-%m-%d %H:%M') if event.date else "",
-            event.end_date.strftime('%Y-%m-%d %H:%M') if event.end_date else "",
-            event.category.name if event.category else "",
-            event.department.name if event.department else "",
-            event.responsible or "",
-            event.place or "",
-            event.user.username if event.user else "",
-            event.comment or "",
-        ])
-
-    output = BytesIO()
-    workbook.save(output)
-    output.seek(0)
-
-    response = HttpResponse(
-        output.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    response['Content-Disposition'] = 'attachment; filename="events_export.xlsx"'
-    return response
+    events = EventFilter.from_request(request).filter()
+    return xlsx_response(request, write_events_table, events.order_by('date', 'id'), "events_export.xlsx")
 
 
 def bulk_delete_events(request):
     if request.method == 'POST':
-        selected_events = request.POST.getlist('selected_events')
-        if selected_events:
-            try:
-                event_ids = [int(id) for id in selected_events]
-                Event.objects.filter(id__in=event_ids).delete()
-
-                from django.contrib import messages
-                count = len(selected_events)
+        from django.contrib import messages
+        try:
+            events = selected_events(request.POST)
+            if events is not None:
+                count = delete_events(events)
                 if count == 1:
                     messages.success(request, 'Мероприятие успешно удалено!')
                 else:
                     messages.success(request, f'{count} мероприятий успешно удалено!')
-            except (ValueError, Event.DoesNotExist):
-                messages.error(request, 'Ошибка при удалении мероприятий')
+        except SelectionExpired as e:
+            messages.error(request, str(e))
+        except (ValueError, Event.DoesNotExist):
+            messages.error(request, 'Ошибка при удалении мероприятий')
 
         return redirect('events_ui')
 
 
+# Размер страницы списка мероприятий
+EVENTS_PER_PAGE = 20
+
+EVENT_ORDERINGS = {
+    'asc': ('date', 'name', 'id'),
+    'desc': ('-date', 'name', 'id'),
+    'relevance': ('-search_rank', '-date', 'id'),
+}
+
+
+def _paginate_events(request, events, sort_order, count):
+    """Возвращает (режим, страница) для списка мероприятий.
+
+    По умолчанию используется курсорная пагинация; старые ссылки вида
+    ``?page=N`` продолжают работать через обычный Paginator. Страница
+    возвращается уже вычисленной, чтобы её можно было положить в кэш.
+    """
+    ordering = EVENT_ORDERINGS[sort_order]
+
+    # Ранг поиска — вычисляемое значение, по нему курсор не построить
+    page_number = request.GET.get('page')
+    if sort_order == 'relevance' or (page_number and not request.GET.get('cursor')):
+        paginator = CountedPaginator(events.order_by(*ordering), EVENTS_PER_PAGE, count=count)
+        page = paginator.get_page(page_number)
+        detached = CountedPaginator([], EVENTS_PER_PAGE, count=count)
+        return 'page', Page(list(page.object_list), page.number, detached)
+
+    paginator = KeysetPaginator(events, ordering, EVENTS_PER_PAGE)
+    return 'cursor', paginator.get_page(request.GET.get('cursor'))
+
+
+def _filter_query(request):
+    """Параметры фильтрации без параметров пагинации — для ссылок на страницы."""
+    query = request.GET.copy()
+    query.pop('page', None)
+    query.pop('cursor', None)
+    return query.urlencode()
+
+
+def _events_ui_results(request, event_filter):
+    """Страница списка и счётчики; кэшируются до следующей записи в данные"""
+    def build():
+        events = event_filter.filter(Event.objects.with_date_summary())
+        filtered_count, count_estimated = count_events(event_filter, events)
+        pagination_mode, page_obj = _paginate_events(request, events, event_filter.sort_order, filtered_count)
+        return {
+            'pagination_mode': pagination_mode,
+            'page_obj': page_obj,
+            'total_events': get_total_events(),
+            'filtered_count': filtered_count,
+            'count_estimated': count_estimated,
+        }
+
+    params = {
+        'filter': event_filter.as_dict(),
+        'sort_order': event_filter.sort_order,
+        'page': request.GET.get('page'),
+        'cursor': request.GET.get('cursor'),
+    }
+    return get_or_build('events-ui', params, build)
+
+
 def events_ui(request):
     current_year = dt.now().year
 
-    month_str = request.GET.get('month', '')
-    year_str = request.GET.get('year', '')
-    sort_order = request.GET.get('sort_order', 'desc')
+    event_filter = EventFilter.from_request(request)
     category_id = request.GET.get('category', '')
     department_id = request.GET.get('department', '')
     search_query = request.GET.get('search', '')
     start_date_str = request.GET.get('start_date', '')
     end_date_str = request.GET.get('end_date', '')
-    responsible_query = request.GET.get('responsible', '')
-
-    events = Event.objects.all().select_related('category', 'department').prefetch_related('event_dates')
-
-    if category_id and category_id != '':
-        try:
-            category_int = int(category_id)
-            events = events.filter(category_id=category_int)
-        except ValueError:
-            pass
-
-    if department_id and department_id != '':
-        try:
-            department_int = int(department_id)
-            events = events.filter(department_id=department_int)
-        except ValueError:
-            pass
-
-    if responsible_query:
-        events = events.filter(responsible__icontains=responsible_query)
-
-    if start_date_str or end_date_str:
-        if start_date_str:
-            try:
-                start_date = dt.strptime(start_date_str, '%Y-%m-%d')
-                start_datetime = timezone.make_aware(start_date)
-                events = events.filter(
-                    Q(date__gte=start_datetime) |
-                    Q(end_date__gte=start_datetime) |
-                    Q(date__lte=start_datetime, end_date__gte=start_datetime)
-                )
-            except ValueError:
-                pass
-
-        if end_date_str:
-            try:
-                end_date = dt.strptime(end_date_str, '%Y-%m-%d')
-                end_date = end_date.replace(hour=23, minute=59, second=59)
-                end_datetime = timezone.make_aware(end_date)
-                events = events.filter(
-                    Q(date__lte=end_datetime) |
-                    Q(end_date__lte=end_datetime) |
-                    Q(date__lte=end_datetime, end_date__gte=end_datetime)
-                )
-            except ValueError:
-                pass
-
-    if search_query:
-        search_terms = search_query.split()
-        search_q = Q()
-        for term in search_terms:
-            search_q |= (
-                Q(name__icontains=term) |
-                Q(place__icontains=term) |
-                Q(comment__icontains=term) |
-                Q(responsible__icontains=term) |
-                Q(category__name__icontains=term) |
-                Q(department__name__icontains=term)
-            )
-        events = events.filter(search_q)
-
-    if sort_order == 'asc':
-        events = events.order_by('date', 'name')
-    else:
-        events = events.order_by('-date', 'name')
-
-    total_events = Event.objects.count()
 
-    paginator = Paginator(events, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    results = _events_ui_results(request, event_filter)
+    page_obj = results['page_obj']
 
     for event in page_obj:
         if event.responsible:
@@ -318,184 +225,215 @@ def events_ui(request):
         else:
             event.responsible_list = []
 
-    from categories.models import Category
-    from departments.models import Department
-
-    categories = Category.objects.all().order_by('name')
-    departments = Department.objects.all().order_by('name')
-
     context = {
         'page_obj': page_obj,
-        'sort_order': sort_order,
+        'pagination_mode': results['pagination_mode'],
+        'filter_query': _filter_query(request),
+        'sort_order': event_filter.sort_order,
         'current_year': current_year,
         'search_query': search_query,
         'selected_category': category_id,
         'selected_department': department_id,
         'start_date': start_date_str,
         'end_date': end_date_str,
-        'categories': categories,
-        'departments': departments,
-        'total_events': total_events,
-        'filtered_count': events.count(),
+        'total_events': results['total_events'],
+        'filtered_count': results['filtered_count'],
+        'count_estimated': results['count_estimated'],
     }
+    reference = get_reference_data()
+    context['categories'] = reference.categories
+    context['departments'] = reference.departments
 
     return render(request, 'events/eventsUI.html', context)
 
 
+def _api_error(message, status):
+    return JsonResponse({'success': False, 'error': message}, status=status)
+
+
+def api_event_list(request):
+    """Список мероприятий: фильтры events_ui, ``fields``, ``limit`` и ``cursor``"""
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return _api_error(str(e), 400)
+
+    event_filter = EventFilter.from_request(request)
+    ordering = EVENT_ORDERINGS['asc'] if event_filter.sort_order == 'asc' else EVENT_ORDERINGS['desc']
+    params = {
+        'filter': event_filter.as_dict(),
+        'ordering': ordering,
+        'fields': fields,
+        'limit': parse_page_size(request.GET.get('limit')),
+        'cursor': request.GET.get('cursor') or '',
+        'reference': get_reference_version(),
+    }
+
+    def serialize():
+        rows = event_filter.filter().values(*value_columns(fields, ordering))
+        page = KeysetPaginator(rows, ordering, params['limit']).get_page(params['cursor'] or None)
+        return json.dumps({
+            'success': True,
+            'events': serialize_rows(page.object_list, fields),
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
+        }, cls=DjangoJSONEncoder)
+
+    def build():
+        # Готовый JSON кэшируется до следующей записи в данных
+        body = get_or_build('api-events', params, serialize)
+        return HttpResponse(body, content_type='application/json')
+
+    return conditional_response(request, list_validators(params), build)
+
+
+def api_event_detail(request, event_id):
+    """Одно мероприятие; ``fields`` — как в списке, по умолчанию с датами"""
+    try:
+        fields = parse_fields(request.GET.get('fields') or ','.join(DEFAULT_API_FIELDS + ['comment', 'dates']))
+    except ValueError as e:
+        return _api_error(str(e), 400)
+
+    # Версия заводится для любого id, поэтому без проверки на ETag
+    # несуществующего мероприятия пришёл бы 304
+    if not Event.objects.filter(id=event_id).exists():
+        return _api_error('Мероприятие не найдено', 404)
+
+    def build():
+        rows = list(Event.objects.filter(id=event_id).values(*value_columns(fields)))
+        if not rows:
+            return _api_error('Мероприятие не найдено', 404)
+        return JsonResponse({'success': True, 'event': serialize_rows(rows, fields)[0]})
+
+    return conditional_response(request, detail_validators(event_id), build)
+
+
+def calendar_events(request):
+    """Мероприятия по дням месяца или недели (``view``), содержащих ``date``;
+    фильтры — как у списка"""
+    view = request.GET.get('view')
+    if view not in CALENDAR_VIEWS:
+        view = VIEW_MONTH
+    day = parse_calendar_day(request.GET.get('date'))
+    event_filter = EventFilter.from_request(request)
+
+    def build():
+        events = None if event_filter.is_empty() else event_filter.filter()
+        return calendar_payload(view, day, events)
+
+    payload = get_or_build('calendar', {'view': view, 'date': day, 'filter': event_filter.as_dict(),
+                                        'reference': get_reference_version()}, build)
+    return JsonResponse({'success': True, **payload})
+
+
+def _ics_feed(request, scope, object_id=None):
+    def build():
+        response = StreamingHttpResponse(iter_feed(scope, object_id), content_type=ICS_CONTENT_TYPE)
+        response['Content-Disposition'] = f'inline; filename="events-{scope}.ics"'
+        return response
+
+    return conditional_response(request, feed_validators(scope, object_id), build)
+
+
+def ics_feed_all(request):
+    return _ics_feed(request, FEED_ALL)
+
+
+def ics_feed_department(request, department_id):
+    if get_reference_data().department_name(department_id, None) is None:
+        raise Http404
+    return _ics_feed(request, FEED_DEPARTMENT, department_id)
+
+
+def ics_feed_category(request, category_id):
+    if get_reference_data().category_name(category_id, None) is None:
+        raise Http404
+    return _ics_feed(request, FEED_CATEGORY, category_id)
+
+
 @csrf_exempt
 @require_POST
 def export_selected_events(request):
-    selected_events_ids = request.POST.getlist('selected_events')
-    if not selected_events_ids:
+    try:
+        queryset = selected_events(request.POST)
+    except SelectionExpired as e:
+        return HttpResponse(str(e), status=400)
+    except ValueError:
+        return HttpResponse("Некорректный список мероприятий", status=400)
+    if queryset is None:
         return HttpResponse("Не выбрано ни одного мероприятия", status=400)
 
-    queryset = Event.objects.filter(id__in=selected_events_ids)
+    return xlsx_response(request, write_plan, queryset, "План мероприятий.xlsx")
 
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = "План мероприятий"
 
-    column_widths = {
-        'A': 15,
-        'C': 40,
-        'D': 35,
-        'E': 30,
+def _export_job_payload(job):
+    payload = {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'total': job.total,
+        'percent': job.percent,
+        'error': job.error,
+        'status_url': reverse('export_job_status', args=[job.id]),
     }
+    if job.status == ExportJob.STATUS_DONE:
+        payload['download_url'] = reverse('export_job_download', args=[job.id])
+    return payload
 
-    for col, width in column_widths.items():
-        worksheet.column_dimensions[col].width = width
-
-    header_font = Font(bold=True, size=12)
-    center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    left_alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
 
-    current_row = 1
-
-    for _ in range(3):
-        current_row += 1
-
-    worksheet.merge_cells(f'D{current_row}:E{current_row}')
-    worksheet.cell(row=current_row, column=4, value='УТВЕРЖДАЮ').alignment = center_alignment
-    worksheet.cell(row=current_row, column=4).font = Font(bold=True)
-    current_row += 1
-
-    worksheet.merge_cells(f'D{current_row}:E{current_row}')
-    worksheet.cell(row=current_row, column=4, value='Ректор ВоГУ').alignment = center_alignment
-    current_row += 1
-    worksheet.merge_cells(f'D{current_row}:E{current_row}')
-    worksheet.cell(row=current_row, column=4, value='').alignment = center_alignment
-    current_row += 1
-
-    worksheet.cell(row=current_row, column=4, value='').alignment = center_alignment
-    worksheet.cell(row=current_row, column=5, value='Д. В. Дворников').alignment = center_alignment
-    current_row += 1
-
-    worksheet.cell(row=current_row, column=4, value='').alignment = center_alignment
-    worksheet.cell(row=current_row, column=5, value='2025 года').alignment = center_alignment
-    current_row += 2
-
-    worksheet.merge_cells(f'A{current_row}:E{current_row}')
-    worksheet.cell(row=current_row, column=1, value='ПЛАН МЕРОПРИЯТИЙ УНИВЕРСИТЕТА')
-    worksheet.cell(row=current_row, column=1).alignment = center_alignment
-    worksheet.cell(row=current_row, column=1).font = Font(bold=True, size=14)
-    current_row += 2
-
-    headers = [
-        "Дата, время",
-        "Наименование мероприятия",
-        "Место проведения мероприятия",
-        "Структурное подразделение",
-        "Ответственный работник"
-    ]
-
-    header_row = current_row
-    for col_num, header in enumerate(headers, 1):
-        cell = worksheet.cell(row=header_row, column=col_num, value=header)
-        cell.font = header_font
-        cell.alignment = center_alignment
-        cell.border = thin_border
-        cell.fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
-
-    current_row += 1
-
-    events_by_category = defaultdict(list)
-
-    for event in queryset.order_by('category__name', 'date'):
-        if event.category:
-            events_by_category[event.category.name].append(event)
-        else:
-            events_by_category['Без категории'].append(event)
-
-    for category_name, events in events_by_category.items():
-        if category_name and events:
-            worksheet.merge_cells(f'A{current_row}:E{current_row}')
-            category_cell = worksheet.cell(row=current_row, column=1, value=category_name.upper())
-            category_cell.font = Font(bold=True, size=11)
-            category_cell.alignment = left_alignment
-            current_row += 1
-
-            for event in events:
-                date_str = ""
-                if event.date:
-                    date_str = event.date.strftime('%Y.%m.%d %H:%M')
-                    if event.end_date:
-                        date_str += f" - {event.end_date.strftime('%H:%M' if event.date.date() == event.end_date.date() else '%Y.%m.%d %H:%M')}"
-
-                responsible_names = event.responsible or ""
-
-                worksheet.cell(row=current_row, column=1, value=date_str).alignment = left_alignment
-                worksheet.cell(row=current_row, column=2, value=event.name).alignment = left_alignment
-                worksheet.cell(row=current_row, column=3, value=event.place or "").alignment = left_alignment
-                worksheet.cell(row=current_row, column=4,
-                               value=event.department.name if event.department else "").alignment = left_alignment
-                worksheet.cell(row=current_row, column=5, value=responsible_names).alignment = left_alignment
-
-                for col_num in range(1, 6):
-                    cell = worksheet.cell(row=current_row, column=col_num)
-                    cell.border = thin_border
-                    cell.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-
-                current_row += 1
-
-    for row in worksheet.iter_rows(min_row=header_row, max_row=current_row - 1, max_col=5):
-        for cell in row:
-            if cell.value:
-                lines = str(cell.value).count('\n') + 1
-                char_count = len(str(cell.value))
-                estimated_height = min(100, max(15, lines * 15 + (char_count // 100) * 5))
-                worksheet.row_dimensions[cell.row].height = estimated_height
-
-    output = BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    response = HttpResponse(
-        output.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    response['Content-Disposition'] = 'attachment; filename="План мероприятий.xlsx"'
-    return response
+@require_POST
+def export_job_submit(request):
+    """Ставит выгрузку в очередь и сразу возвращает id задания"""
+    kind = request.POST.get('kind', ExportJob.KIND_PLAN)
+    if kind not in EXPORT_WRITERS:
+        return JsonResponse({'success': False, 'error': 'Неизвестный вид выгрузки'}, status=400)
 
+    selection_token = request.POST.get('selection')
+    selected_events_ids = request.POST.getlist('selected_events')
+    if selection_token:
+        if get_selection(selection_token) is None:
+            return JsonResponse({'success': False, 'error': SELECTION_EXPIRED_MESSAGE}, status=400)
+        job = submit_export(kind, selection=selection_token)
+    elif selected_events_ids:
+        try:
+            job = submit_export(kind, event_ids=parse_ids(selected_events_ids))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Некорректный список id'}, status=400)
+    elif kind == ExportJob.KIND_TABLE:
+        filter_params = {key: value for key, value in EventFilter(request.POST).as_dict().items() if value}
+        job = submit_export(kind, filter_params=filter_params)
+    else:
+        return JsonResponse({'success': False, 'error': 'Не выбрано ни одного мероприятия'}, status=400)
 
-def check_database(request):
-    results = {
-        'total_events': Event.objects.count(),
-        'events_with_date': Event.objects.filter(date__isnull=False).count(),
-        'events_with_end_date': Event.objects.filter(end_date__isnull=False).count(),
-        'month_distribution': {},
-        'sample_events': []
-    }
+    return JsonResponse({'success': True, 'job': _export_job_payload(job)}, status=202)
 
-    for month in range(1, 13):
-        count = Event.objects.filter(
-            Q(date__month=month) | Q(end_date__month=month)
-        ).count()
-        results['month_distribution'][month] = count
+
+def export_job_status(request, job_id):
+    job = ExportJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({'success': False, 'error': 'Выгрузка не найдена'}, status=404)
+    return JsonResponse({'success': True, 'job': _export_job_payload(job)})
+
+
+def export_job_download(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id)
+    # Файла нет, пока задание не выполнено; ход выполнения — в export_job_status
+    if job.status == ExportJob.STATUS_FAILED:
+        raise Http404("Выгрузка завершилась ошибкой")
+    if job.status != ExportJob.STATUS_DONE:
+        raise Http404("Файл ещё не готов")
+    if not os.path.exists(job.file_path):
+        raise Http404("Файл выгрузки удалён")
+    return FileResponse(open(job.file_path, 'rb'), as_attachment=True,
+                        filename=EXPORT_FILENAMES[job.kind], content_type=XLSX_CONTENT_TYPE)
+
+
+def check_database(request):
+    """Статистика мероприятий из сводной таблицы и несколько примеров"""
+    results = event_statistics()
+    results['sample_events'] = []
 
     sample = Event.objects.filter(date__isnull=False).order_by('date')[:5]
     for event in sample:
@@ -511,106 +449,40 @@ def check_database(request):
     return JsonResponse(results)
 
 
-def get_filtered_event_ids(request):
-    try:
-        month_str = request.GET.get('month', '')
-        year_str = request.GET.get('year', '')
-        category_id = request.GET.get('category', '')
-        department_id = request.GET.get('department', '')
-        search_query = request.GET.get('search', '')
-        start_date_str = request.GET.get('start_date', '')
-        end_date_str = request.GET.get('end_date', '')
-
-        events = Event.objects.all()
-
-        month_int = None
-        year_int = None
+@require_POST
+def create_event_selection(request):
+    """Сохраняет выбор мероприятий и возвращает его токен.
 
-        if month_str and month_str.strip() and month_str != 'None':
-            try:
-                month_int = int(month_str)
-                if not (1 <= month_int <= 12):
-                    month_int = None
-            except (ValueError, TypeError):
-                pass
+    ``all=1`` — все мероприятия под фильтром из тех же параметров, что и у
+    списка; ``include``/``exclude`` — id через запятую.
+    """
+    try:
+        include_ids = parse_ids(request.POST.getlist('include'))
+        exclude_ids = parse_ids(request.POST.getlist('exclude'))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Некорректный список id'}, status=400)
+
+    snapshot = create_selection(
+        filter_params=request.POST,
+        all_filtered=request.POST.get('all') == '1',
+        include_ids=include_ids,
+        exclude_ids=exclude_ids,
+    )
+    return JsonResponse({
+        'success': True,
+        'token': snapshot.token,
+        'count': selection_events(snapshot).count(),
+    })
 
-        if year_str and year_str.strip() and year_str != 'None':
-            try:
-                year_int = int(year_str)
-            except (ValueError, TypeError):
-                year_int = None
-
-        if month_int and year_int:
-            events = events.filter(
-                Q(date__month=month_int, date__year=year_int) |
-                Q(end_date__month=month_int, end_date__year=year_int)
-            )
-        elif year_int:
-            events = events.filter(
-                Q(date__year=year_int) | Q(end_date__year=year_int)
-            )
-        elif month_int:
-            current_year_for_filter = dt.now().year
-            events = events.filter(
-                Q(date__month=month_int, date__year=current_year_for_filter) |
-                Q(end_date__month=month_int, end_date__year=current_year_for_filter)
-            )
-
-        if category_id and category_id != '':
-            try:
-                category_int = int(category_id)
-                events = events.filter(category_id=category_int)
-            except ValueError:
-                pass
 
-        if department_id and department_id != '':
-            try:
-                department_int = int(department_id)
-                events = events.filter(department_id=department_int)
-            except ValueError:
-                pass
-
-        if start_date_str or end_date_str:
-            if start_date_str:
-                try:
-                    start_date = dt.strptime(start_date_str, '%Y-%m-%d')
-                    start_datetime = timezone.make_aware(start_date)
-                    events = events.filter(
-                        Q(date__gte=start_datetime) |
-                        Q(end_date__gte=start_datetime) |
-                        Q(date__lte=start_datetime, end_date__gte=start_datetime)
-                    )
-                except ValueError:
-                    pass
-
-            if end_date_str:
-                try:
-                    end_date = dt.strptime(end_date_str, '%Y-%m-%d')
-                    end_date = end_date.replace(hour=23, minute=59, second=59)
-                    end_datetime = timezone.make_aware(end_date)
-                    events = events.filter(
-                        Q(date__lte=end_datetime) |
-                        Q(end_date__lte=end_datetime) |
-                        Q(date__lte=end_datetime, end_date__gte=end_datetime)
-                    )
-                except ValueError:
-                    pass
-
-        if search_query:
-            search_terms = search_query.split()
-            search_q = Q()
-            for term in search_terms:
-                search_q |= (
-                    Q(name__icontains=term) |
-                    Q(place__icontains=term) |
-                    Q(comment__icontains=term) |
-                    Q(responsible__icontains=term) |
-                    Q(category__name__icontains=term) |
-                    Q(department__name__icontains=term)
-                )
-            events = events.filter(search_q)
-
-        event_ids = list(events.values_list('id', flat=True))
+def get_filtered_event_ids(request):
+    try:
+        event_filter = EventFilter.from_request(request)
+        event_ids = get_or_build(
+            'filtered-ids',
+            event_filter.as_dict(),
+            lambda: list(event_filter.filter().values_list('id', flat=True)),
+        )
 
         return JsonResponse({
             'event_ids': event_ids,
@@ -624,4 +496,54 @@ def get_filtered_event_ids(request):
             'count': 0,
             'success': False,
             'error': str(e)
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+# Максимум мероприятий в одном пакетном запросе деталей
+EVENT_DETAILS_BATCH_LIMIT = 200
+
+
+def _build_event_details(event_ids):
+    events = Event.objects.filter(id__in=event_ids).with_date_summary()
+    reference = get_reference_data()
+
+    details = {}
+    for event in events:
+        details[event.id] = {
+            'id': event.id,
+            'name': event.name or '',
+            'date': timezone.localtime(event.date).strftime('%Y-%m-%d') if event.date else '',
+            'place': event.place or '',
+            'category': reference.category_name(event.category_id),
+            'comment': event.comment or '',
+            'responsible': event.responsible or '',
+            'formatted_dates': event.date_summary.formatted,
+            'status': event.get_status(),
+        }
+    return details
+
+
+def event_details(request, event_id):
+    details = get_cached_event_details([event_id], _build_event_details)
+    if event_id not in details:
+        return JsonResponse({'success': False, 'error': 'Мероприятие не найдено'}, status=404)
+    return JsonResponse({'success': True, 'event': details[event_id]})
+
+
+def event_details_batch(request):
+    try:
+        event_ids = [int(id) for id in request.GET.get('ids', '').split(',') if id.strip()]
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Некорректный список id'}, status=400)
+
+    if len(event_ids) > EVENT_DETAILS_BATCH_LIMIT:
+        return JsonResponse({
+            'success': False,
+            'error': f'Не больше {EVENT_DETAILS_BATCH_LIMIT} мероприятий за запрос'
+        }, status=400)
+
+    details = get_cached_event_details(list(dict.fromkeys(event_ids)), _build_event_details)
+    return JsonResponse({
+        'success': True,
+        'events': [details[event_id] for event_id in event_ids if event_id in details],
+    })
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: время и SQL всех остальных слоёв (см. events/profiling.py)
+    'events.profiling.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,7 +60,8 @@ ROOT_URLCONF = 'mplan.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером рендера для Server-Timing
+        'BACKEND': 'events.profiling.ProfiledDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -89,6 +92,26 @@ DATABASES = {
 }
 
 
+# Cache
+# Файловый кэш общий для всех воркеров gunicorn на сервере, поэтому
+# сброс версии данных в одном воркере сразу виден остальным.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    }
+}
+
+# Для фильтров, под которые по плану запроса попадает больше строк,
+# список показывает оценку количества вместо точного COUNT (только MySQL).
+# None — всегда считать точно.
+EVENTS_COUNT_ESTIMATE_THRESHOLD = None
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -111,6 +134,33 @@ AUTH_PASSWORD_VALIDATORS = [
 # URLs
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# Файлы фоновых выгрузок (команда export_worker); отдаются только через
+# представление скачивания, поэтому лежат вне MEDIA_ROOT
+EXPORT_JOBS_DIR = BASE_DIR / "exports"
+
+# Кэш готовых книг Excel (см. events/exports.py); старые файлы удаляются
+# по возрасту и общему размеру
+EXPORT_CACHE_DIR = BASE_DIR / "export_cache"
+
+# Профилирование запросов (events/profiling.py): доля запросов, которые
+# пишутся в журнал events.profiling, и порог в мс, после которого запрос
+# пишется всегда и вместе с его SQL (None — не выделять медленные).
+# Сам заголовок Server-Timing видят только сотрудники и режим DEBUG
+SERVER_TIMING_SAMPLE_RATE = 0.01
+SERVER_TIMING_SLOW_MS = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'events.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 LOGIN_URL = '/login/'
 LOGOUT_REDIRECT_URL = '/login/login'
 LOGIN_REDIRECT_URL = '/events/ui/'
@@ -0,0 +1,38 @@
+"""Настройки для тестов: SQLite в памяти и локальный кэш.
+
+Запуск: python manage.py test --settings=mplan.test_settings
+"""
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    }
+}
+
+# Таблицы приложений проекта создаются по моделям (включая managed = False),
+# а не миграциями — см. mplan.testing.ProjectTestRunner
+MIGRATION_MODULES = {app: None for app in ('categories', 'departments', 'events', 'users')}
+TEST_RUNNER = 'mplan.testing.ProjectTestRunner'
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+EXPORT_JOBS_DIR = tempfile.mkdtemp(prefix='mplan-exports-')
+EXPORT_CACHE_DIR = tempfile.mkdtemp(prefix='mplan-export-cache-')
+
+# Журнал профилирования в тестах не нужен: заголовок Server-Timing остаётся
+SERVER_TIMING_SAMPLE_RATE = 0
+SERVER_TIMING_SLOW_MS = None
@@ -0,0 +1,125 @@
+"""Общее для тестов: запуск с таблицами старой базы, данные и бюджеты запросов.
+
+Модели category, departament, user и event перенесены из старой базы с
+managed = False, поэтому Django не создаёт для них таблицы. Тесты
+запускаются с настройками mplan.test_settings: миграции приложений
+проекта отключены, а ProjectTestRunner перед созданием тестовой базы
+помечает такие модели управляемыми — таблицы создаются по моделям.
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+PROJECT_APPS = ('categories', 'departments', 'events', 'users')
+
+# Потолок времени ответа по умолчанию, секунд: с запасом для медленных
+# машин CI, но на порядок ниже, чем при N+1 на тестовых данных
+DEFAULT_TIME_CEILING = 2.0
+
+
+class ProjectTestRunner(DiscoverRunner):
+    def setup_databases(self, **kwargs):
+        for model in apps.get_models():
+            if model._meta.app_label in PROJECT_APPS and not model._meta.managed:
+                model._meta.managed = True
+        return super().setup_databases(**kwargs)
+
+
+class QueryBudgetMixin:
+    """Проверка числа запросов и времени ответа блока кода"""
+
+    @contextmanager
+    def assertQueryBudget(self, queries, seconds=DEFAULT_TIME_CEILING):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            yield context
+            elapsed = time.perf_counter() - started
+
+        if len(context) > queries:
+            executed = '\n'.join(f'{number}. {query["sql"]}' for number, query in enumerate(context.captured_queries, 1))
+            self.fail(f'{len(context)} запросов при бюджете {queries}:\n{executed}')
+        self.assertLessEqual(elapsed, seconds, f'{elapsed:.2f} с при потолке {seconds} с')
+
+    def assertChangelistQueriesConstant(self, admin_class, url, sizes=(10, 30)):
+        """Число запросов списка админки не зависит от числа строк на странице"""
+        # Первый запрос заполняет кэш справочников и сессии
+        self.client.get(url)
+        counts = []
+        for size in sizes:
+            with mock.patch.object(admin_class, 'list_per_page', size), CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(len(response.context['cl'].result_list), size)
+            counts.append(len(context))
+        self.assertEqual(len(set(counts)), 1, f'Запросов при {sizes} строках на странице: {counts}')
+
+
+def _local(year, month, day, hour=10, minute=0):
+    return timezone.make_aware(datetime(year, month, day, hour, minute))
+
+
+def seed_reference(categories=35, departments=35, users=40):
+    """Справочники: больше строк, чем помещается на страницу админки"""
+    from categories.models import Category
+    from departments.models import Department
+    from users.models import User
+
+    Category.objects.bulk_create([Category(id=number, name=f'Категория {number}') for number in range(1, categories + 1)])
+    Department.objects.bulk_create([Department(id=number, name=f'Институт {number}') for number in range(1, departments + 1)])
+    User.objects.bulk_create([
+        User(id=number, name=f'user{number}', displayname=f'Сотрудник {number}', role='editor', password='-',
+             department_id=number % departments + 1)
+        for number in range(1, users + 1)
+    ])
+
+
+def seed_events(count=300, year=2025, categories=35, departments=35, users=40):
+    """Мероприятия года ``year`` с датами EventDate, днями, поиском и сводкой.
+
+    Каждое третье мероприятие идёт несколько дней, у каждого пятого две или
+    три даты, у каждого десятого дат EventDate нет (старые поля date/end_date).
+    """
+    from events.models import Event, EventDate
+    from events.occurrences import rebuild_all_event_days
+    from events.search import rebuild_index
+    from events.stats import rebuild_event_stats
+
+    statuses = ['', 'Опубликовано', 'Одобрено', 'На согласовании']
+    events = []
+    for number in range(count):
+        start = _local(year, number % 12 + 1, number % 28 + 1, 9 + number % 8)
+        end = start + (timedelta(days=2, hours=3) if number % 3 == 0 else timedelta(hours=2))
+        events.append(Event(
+            name=f'Мероприятие {number} {"конференция" if number % 4 == 0 else "семинар"}',
+            date=start,
+            end_date=end,
+            place=f'Аудитория {number % 15}',
+            category_id=number % categories + 1,
+            department_id=number % departments + 1,
+            user_id=number % users + 1,
+            responsible='Иванов И.И., Петров П.П.',
+            comment=statuses[number % len(statuses)],
+        ))
+    Event.objects.bulk_create(events)
+
+    dates = []
+    for number, event in enumerate(events):
+        if number % 10 == 9:
+            continue
+        repeats = 1 + (number % 5 == 0) + (number % 15 == 0)
+        for repeat in range(repeats):
+            shift = timedelta(days=7 * repeat)
+            dates.append(EventDate(event_id=event.pk, start=event.date + shift, end=event.end_date + shift))
+    EventDate.objects.bulk_create(dates)
+
+    rebuild_index()
+    rebuild_all_event_days()
+    rebuild_event_stats()
+    return events
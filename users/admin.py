@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import User
+from events.reference import get_reference_data
 
 
 @admin.register(User)
@@ -8,6 +9,7 @@ class UserAdmin(admin.ModelAdmin):
     list_display = ("card",)
     list_display_links = ("card",)
     list_per_page = 30
+    show_full_result_count = False
     search_fields = ("name", "displayname", "role",
                      "department__name")
     list_filter = ("role", "department")
@@ -39,7 +41,7 @@ class UserAdmin(admin.ModelAdmin):
             name=obj.name or "—",
             displayname=obj.displayname or "—",
             role=obj.role or "—",
-            department=(getattr(obj.department, "name", "—") if obj.department else "—"),
+            department=get_reference_data().department_name(obj.department_id, "—"),
         )
 
     card.short_description = "Пользователь"
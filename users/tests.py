@@ -1,3 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from mplan.testing import QueryBudgetMixin, seed_reference
+
+from .admin import UserAdmin
+
+
+class UserAdminTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_reference()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_changelist(self):
+        # Сессия, пользователь, варианты фильтров, COUNT, страница
+        # и справочники: подразделения в карточках не грузятся построчно
+        with self.assertQueryBudget(10):
+            response = self.client.get(reverse('admin:users_user_changelist'))
+        self.assertEqual(len(response.context['cl'].result_list), 30)
+        self.assertContains(response, 'Институт 2')
+
+    def test_filter_by_department(self):
+        with self.assertQueryBudget(10):
+            response = self.client.get(reverse('admin:users_user_changelist'), {'department__id__exact': 2})
+        self.assertEqual(response.status_code, 200)
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.assertChangelistQueriesConstant(UserAdmin, reverse('admin:users_user_changelist'))